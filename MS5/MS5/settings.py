@@ -25,6 +25,8 @@ import redis
 
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 REDIS_CLIENT = redis.from_url(REDIS_URL, decode_responses=True)
+# Binary client for claim-check blobs (zstd-compressed job sections).
+REDIS_BINARY_CLIENT = redis.from_url(REDIS_URL, decode_responses=False)
 ALLOWED_HOSTS = ['*']
 
 
@@ -194,6 +196,20 @@ MODEL_SERVICE_GRPC_URL = os.getenv('MODEL_SERVICE_GRPC_URL')
 TOOL_SERVICE_GRPC_URL = os.getenv('TOOL_SERVICE_GRPC_URL')
 DATA_SERVICE_GRPC_URL = os.getenv('DATA_SERVICE_GRPC_URL')
 
+# Claim-check offloading for large inference job sections (memory_context, tools, model_config).
+CLAIM_CHECK_THRESHOLD_BYTES = int(os.getenv('CLAIM_CHECK_THRESHOLD_BYTES', '16384'))
+CLAIM_CHECK_TTL_SECONDS = int(os.getenv('CLAIM_CHECK_TTL_SECONDS', '3600'))
+# Job messages larger than this are zstd-compressed (content_encoding='zstd').
+JOB_COMPRESSION_MIN_BYTES = int(os.getenv('JOB_COMPRESSION_MIN_BYTES', '1024'))
+# Serialization of outgoing RabbitMQ messages: 'json', 'orjson' or 'msgpack' (see messaging/codec.py).
+# Switch to 'msgpack' only once every consumer (MS6) understands it.
+MESSAGE_CODEC = os.getenv('MESSAGE_CODEC', 'json')
+# Job priority (AMQP 0-9): bursts of jobs from one tenant are published with lower priority.
+JOB_DEFAULT_PRIORITY = int(os.getenv('JOB_DEFAULT_PRIORITY', '5'))
+JOB_PRIORITY_WINDOW_SECONDS = int(os.getenv('JOB_PRIORITY_WINDOW_SECONDS', '60'))
+# How long a cancellation for a not-yet-started job waits for an MS6 instance to pick the job up.
+CANCEL_MARKER_TTL_SECONDS = int(os.getenv('CANCEL_MARKER_TTL_SECONDS', '3600'))
+
 
 
 # MS5/MS5/settings.py
@@ -0,0 +1,52 @@
+# MS5/inference_engine/claim_check.py
+
+import hashlib
+import json
+import logging
+import zstandard
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# The job sections that can be large enough to be worth offloading.
+OFFLOADABLE_SECTIONS = ("memory_context", "tools", "model_config")
+CLAIM_CHECK_FIELD = "$claim_check"
+
+
+def _inline_fields(section) -> dict:
+    """
+    Small top-level scalars (bucket_id, provider, model_id, ...) stay in the message,
+    so consumers can route and authorize without resolving the reference.
+    """
+    if not isinstance(section, dict):
+        return {}
+    return {k: v for k, v in section.items() if isinstance(v, (str, int, float, bool)) or v is None}
+
+
+def offload_large_sections(job_payload: dict) -> dict:
+    """
+    Stores every large resource section in Redis under a content-addressed key with a TTL
+    and replaces it in the payload with a reference. Returns the (modified) payload.
+    """
+    resources = job_payload.get("resources") or {}
+    compressor = zstandard.ZstdCompressor()
+
+    for name in OFFLOADABLE_SECTIONS:
+        section = resources.get(name)
+        if not section:
+            continue
+        serialized = json.dumps(section, sort_keys=True, default=str).encode()
+        if len(serialized) < settings.CLAIM_CHECK_THRESHOLD_BYTES:
+            continue
+
+        key = f"claim_check:{name}:{hashlib.sha256(serialized).hexdigest()}"
+        # Identical content maps to the same key, so re-setting only refreshes the TTL.
+        settings.REDIS_BINARY_CLIENT.set(key, compressor.compress(serialized), ex=settings.CLAIM_CHECK_TTL_SECONDS)
+
+        resources[name] = {
+            **_inline_fields(section),
+            CLAIM_CHECK_FIELD: {"key": key, "encoding": "zstd", "size": len(serialized)},
+        }
+        logger.info(f"[{job_payload.get('job_id')}] Offloaded '{name}' ({len(serialized)} bytes) to {key}.")
+
+    return job_payload
@@ -8,6 +8,7 @@ from rest_framework.exceptions import PermissionDenied, ValidationError, NotFoun
 import logging
 
 from .ticket_manager import generate_ticket
+from .claim_check import offload_large_sections
 from inference_internals.clients import (
     NodeServiceClient,
     ModelServiceClient,
@@ -90,6 +91,9 @@ class InferenceOrchestrationService:
             job_id, user_id, node_details, query_data, collected_resources
         )
         
+        # Large sections travel by reference (claim-check) instead of inline in the message.
+        job_payload = offload_large_sections(job_payload)
+        
         ws_ticket = generate_ticket(job_id=job_payload["job_id"], user_id=user_id)
 
         inference_job_publisher.publish_job(job_payload)
@@ -103,7 +103,7 @@ class JobCancellationAPIView(APIView):
             inference_job_publisher.publish_cancellation_request(job_id_str, requesting_user_id)
             # Once cancellation is requested, we can remove the ownership key.
             settings.REDIS_CLIENT.delete(job_owner_key)
-            return Response({"message": "Job cancellation request has been broadcast."}, status=status.HTTP_202_ACCEPTED)
+            return Response({"message": "Job cancellation request has been sent."}, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             print(f"CRITICAL: Could not publish cancellation event for job {job_id_str}: {e}")
             return Response({"error": "Could not send cancellation signal due to a messaging system error."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
\ No newline at end of file
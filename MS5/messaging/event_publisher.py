@@ -1,24 +1,70 @@
 # MS5/messaging/event_publisher.py
+import math
+from django.conf import settings
 from .rabbitmq_client import rabbitmq_client
 
 class InferenceJobPublisher:
+    def _job_priority(self, tenant_id: str) -> int:
+        """
+        Lowers the priority of tenants that are submitting in a burst: every doubling
+        of their submissions within JOB_PRIORITY_WINDOW_SECONDS costs one level.
+        A lone job gets JOB_DEFAULT_PRIORITY; a 500-job burst quickly sinks to 1.
+        """
+        key = f"jobs:submitted:{tenant_id}"
+        try:
+            recent = settings.REDIS_CLIENT.incr(key)
+            if recent == 1:
+                # First job of a new window.
+                settings.REDIS_CLIENT.expire(key, settings.JOB_PRIORITY_WINDOW_SECONDS)
+        except Exception as e:
+            print(f"WARN: Could not compute job priority for tenant '{tenant_id}': {e}. Using the default.")
+            return settings.JOB_DEFAULT_PRIORITY
+        return max(1, settings.JOB_DEFAULT_PRIORITY - int(math.log2(max(1, recent))))
+
     def publish_job(self, job_payload: dict):
         # This is a standard job, it goes to a 'topic' exchange. No change needed.
+        # The tenant and priority travel as AMQP properties so MS6 can schedule fairly without decoding the body.
+        tenant_id = str(job_payload.get("user_id"))
+        priority = self._job_priority(tenant_id)
         rabbitmq_client.publish(
             exchange_name='inference_exchange',
             routing_key='inference.job.start',
             body=job_payload,
-            exchange_type='topic' # Explicitly stating the default is good practice
+            exchange_type='topic', # Explicitly stating the default is good practice
+            compress=True, # Job payloads can be large; MS6 reads content_encoding
+            headers={'x-tenant-id': tenant_id},
+            priority=priority,
         )
 
     def publish_cancellation_request(self, job_id: str, user_id: str):
+        """
+        Routes a cancellation to the MS6 instance that owns the job. MS6 registers
+        'job:instance:<job_id>' in Redis when it starts a job; if that key exists the
+        message goes to that instance only. Otherwise the job hasn't started yet and
+        the cancellation is broadcast as a fallback.
+        Either way a marker is left for whichever instance picks the job up next: the
+        job hasn't started yet, or its owner may crash and the job be redelivered.
+        """
+        body = {"job_id": job_id, "user_id": user_id}
+        settings.REDIS_CLIENT.set(f"job:cancel_requested:{job_id}", user_id, ex=settings.CANCEL_MARKER_TTL_SECONDS)
+        instance_id = settings.REDIS_CLIENT.get(f"job:instance:{job_id}")
+
+        if instance_id:
+            rabbitmq_client.publish(
+                exchange_name='job_control_direct_exchange',
+                routing_key=f'job.cancel.{instance_id}',
+                body=body,
+                exchange_type='direct'
+            )
+            return
+
         # --- THE FIX IS HERE ---
         # This is a broadcast, so we explicitly tell the client to
         # declare the exchange as 'fanout'.
         rabbitmq_client.publish(
             exchange_name='job_control_fanout_exchange',
             routing_key='job.cancellation.requested', # routing_key is ignored by fanout
-            body={"job_id": job_id, "user_id": user_id},
+            body=body,
             exchange_type='fanout' # <-- THIS IS THE CRITICAL CHANGE
         )
         # --- END OF FIX ---
@@ -1,10 +1,11 @@
 # MS5/messaging/rabbitmq_client.py (Definitive Resilient & Flexible Version)
 
 import pika
-import json
 import threading
 import time
+import zstandard
 from django.conf import settings
+from . import codec
 
 class RabbitMQClient:
     """
@@ -44,17 +45,27 @@ class RabbitMQClient:
         print(f"Thread {threading.get_ident()}: Invalidated RabbitMQ connection.")
 
     # --- THE FIX IS IN THIS METHOD SIGNATURE AND THE 'exchange_declare' CALL ---
-    def publish(self, exchange_name, routing_key, body, exchange_type='topic'):
+    def publish(self, exchange_name, routing_key, body, exchange_type='topic', compress=False, headers=None, priority=None):
         """
         Publishes a message with a built-in retry mechanism.
         
         Args:
             exchange_name (str): The name of the exchange.
             routing_key (str): The routing key for the message.
-            body (dict): The message payload (will be JSON serialized).
+            body (dict): The message payload, serialized with settings.MESSAGE_CODEC.
             exchange_type (str): The type of the exchange ('topic', 'fanout', etc.).
                                  Defaults to 'topic' for backward compatibility.
+            compress (bool): zstd-compress bodies larger than JOB_COMPRESSION_MIN_BYTES
+                             and mark them with content_encoding='zstd'.
+            headers (dict): Optional AMQP headers (e.g. the job's tenant).
+            priority (int): Optional AMQP message priority (used by priority queues).
         """
+        message_body, content_type = codec.encode(body, settings.MESSAGE_CODEC)
+        content_encoding = None
+        if compress and len(message_body) >= settings.JOB_COMPRESSION_MIN_BYTES:
+            message_body = zstandard.ZstdCompressor().compress(message_body)
+            content_encoding = 'zstd'
+
         attempt = 0
         while attempt < self.max_retries:
             try:
@@ -67,17 +78,19 @@ class RabbitMQClient:
                         durable=True
                     )
                     
-                    message_body = json.dumps(body, default=str)
                     channel.basic_publish(
                         exchange=exchange_name,
                         routing_key=routing_key,
                         body=message_body,
                         properties=pika.BasicProperties(
-                            content_type='application/json',
+                            content_type=content_type,
+                            content_encoding=content_encoding,
                             delivery_mode=pika.DeliveryMode.Persistent,
+                            headers=headers,
+                            priority=priority,
                         )
                     )
-                    print(f" [x] Sent '{routing_key}':'{message_body}' to '{exchange_name}' ({exchange_type}) on attempt {attempt + 1}")
+                    print(f" [x] Sent '{routing_key}' ({len(message_body)} bytes, encoding={content_encoding}) to '{exchange_name}' ({exchange_type}) on attempt {attempt + 1}")
                     return # --- SUCCESS, exit the loop ---
 
             except (pika.exceptions.AMQPError, OSError) as e:
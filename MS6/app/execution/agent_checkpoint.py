@@ -0,0 +1,129 @@
+# MS6/app/execution/agent_checkpoint.py
+
+import json
+from typing import Any, AsyncIterator
+import redis.asyncio as redis
+from langchain.agents import AgentExecutor
+from langchain.agents.output_parsers.tools import ToolAgentAction
+from langchain_core.agents import AgentAction, AgentActionMessageLog, AgentFinish, AgentStep
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from pydantic import Field
+from app import config
+from app.logging_config import logger
+from app.metrics import AGENT_STEPS_RESTORED_TOTAL
+
+# Redis list of the job's completed agent steps, one JSON entry per (action, observation).
+CHECKPOINT_KEY = "job:agent_steps:{job_id}"
+
+
+def serialize_step(action: AgentAction, observation) -> str:
+    """One (action, observation) pair as JSON, keeping what the agent's scratchpad is rebuilt from."""
+    entry = {
+        "tool": action.tool,
+        "tool_input": action.tool_input,
+        "log": action.log,
+        "observation": observation if isinstance(observation, str) else json.dumps(observation, default=str),
+    }
+    if isinstance(action, AgentActionMessageLog):
+        # The model's tool-calling message: the scratchpad replays it before each tool result.
+        entry["message_log"] = messages_to_dict(action.message_log)
+    if isinstance(action, ToolAgentAction):
+        entry["tool_call_id"] = action.tool_call_id
+    return json.dumps(entry)
+
+
+def deserialize_step(data: str | bytes) -> tuple[AgentAction, str]:
+    entry = json.loads(data)
+    fields = {"tool": entry["tool"], "tool_input": entry["tool_input"], "log": entry["log"]}
+    if "tool_call_id" in entry:
+        action = ToolAgentAction(**fields, message_log=messages_from_dict(entry["message_log"]),
+                                 tool_call_id=entry["tool_call_id"])
+    elif "message_log" in entry:
+        action = AgentActionMessageLog(**fields, message_log=messages_from_dict(entry["message_log"]))
+    else:
+        action = AgentAction(**fields)
+    return action, entry["observation"]
+
+
+class AgentCheckpointStore:
+    """
+    Keeps the completed steps of running agent jobs in Redis (with a TTL), so a job
+    that is redelivered after a crash or scheduled for a retry continues from its last
+    completed step instead of calling the model and the tools again from the start.
+    Checkpointing is best effort: when Redis is unavailable the job simply runs without it.
+    """
+    def __init__(self, redis_url: str, ttl_seconds: int):
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self._redis = None
+
+    def _client(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    async def load(self, job_id: str) -> list[tuple[AgentAction, str]]:
+        """The steps an earlier attempt of the job completed, oldest first ([] if none)."""
+        try:
+            entries = await self._client().lrange(CHECKPOINT_KEY.format(job_id=job_id), 0, -1)
+            return [deserialize_step(entry) for entry in entries]
+        except Exception as e:
+            logger.warning(f"[{job_id}] Could not load the agent checkpoint, starting from the first step: {e}")
+            return []
+
+    async def append(self, job_id: str, steps: list[tuple[AgentAction, str]]):
+        """Records one completed step (all of its tool calls at once) and refreshes the TTL."""
+        key = CHECKPOINT_KEY.format(job_id=job_id)
+        try:
+            async with self._client().pipeline(transaction=True) as pipe:
+                pipe.rpush(key, *(serialize_step(action, observation) for action, observation in steps))
+                pipe.expire(key, self.ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"[{job_id}] Could not checkpoint an agent step: {e}")
+
+    async def clear(self, job_id: str):
+        try:
+            await self._client().delete(CHECKPOINT_KEY.format(job_id=job_id))
+        except Exception as e:
+            logger.warning(f"[{job_id}] Could not remove the agent checkpoint: {e}")
+
+
+class CheckpointedAgentExecutor(AgentExecutor):
+    """
+    An AgentExecutor that checkpoints every completed step and starts from the steps
+    of an earlier attempt. Both `ainvoke` and the event stream drive the loop through
+    `_aiter_next_step` with the run's own intermediate_steps list, so restoring into
+    that list on the first step rebuilds the scratchpad for the rest of the run.
+    """
+    job_id: str = ""
+    checkpoint_store: Any = None
+    # Structure: [ (AgentAction, observation) ] completed by an earlier attempt of the job
+    restored_steps: list = Field(default_factory=list)
+
+    async def _aiter_next_step(
+        self,
+        name_to_tool_map,
+        color_mapping,
+        inputs,
+        intermediate_steps,
+        run_manager=None,
+    ) -> AsyncIterator[AgentFinish | AgentAction | AgentStep]:
+        if self.restored_steps and not intermediate_steps:
+            intermediate_steps.extend(self.restored_steps)
+            AGENT_STEPS_RESTORED_TOTAL.inc(len(self.restored_steps))
+            logger.info(f"[{self.job_id}] Resuming the agent after {len(self.restored_steps)} checkpointed tool call(s).")
+
+        completed = []
+        async for output in super()._aiter_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager,
+        ):
+            if isinstance(output, AgentStep):
+                completed.append((output.action, output.observation))
+            yield output
+
+        if completed and self.checkpoint_store is not None:
+            await self.checkpoint_store.append(self.job_id, completed)
+
+
+agent_checkpoints = AgentCheckpointStore(config.REDIS_URL, config.AGENT_CHECKPOINT_TTL_SECONDS)
@@ -4,6 +4,7 @@ from langchain_core.memory import BaseMemory
 from langchain_core.tools import BaseTool
 from langchain_core.prompts import ChatPromptTemplate
 from app.execution.job import Job
+from app.execution.direct_providers import DirectModelSpec
 
 @dataclass
 class BuildContext:
@@ -14,4 +15,17 @@ class BuildContext:
     tools: list[BaseTool] = field(default_factory=list)
     prompt_template: ChatPromptTemplate = None
     on_the_fly_data: list[dict] = field(default_factory=list)
-    final_input: dict = field(default_factory=dict)
\ No newline at end of file
+    final_input: dict = field(default_factory=dict)
+    # Content hashes of the job-independent parts of the chain ("llm", "tools", "prompt"),
+    # used to look up cached schemas, templates and agent graphs.
+    cache_keys: dict = field(default_factory=dict)
+    # (provider, base_url or model) — selects the adaptive concurrency limiter for this job.
+    provider_key: tuple = None
+    # How to call the same model without LangChain; None when the provider or a parameter isn't supported.
+    direct_model: DirectModelSpec = None
+    # Wall-clock seconds spent in each builder, keyed by builder class name.
+    stage_timings: dict = field(default_factory=dict)
+    # What the context packer kept, truncated and dropped; published with the final result.
+    packing_report: dict = field(default_factory=dict)
+    # Callback handlers a builder needs on the LangChain run (besides the executor's own).
+    run_callbacks: list = field(default_factory=list)
\ No newline at end of file
@@ -3,7 +3,14 @@ from abc import ABC, abstractmethod
 from app.execution.build_context import BuildContext
 
 class BaseBuilder(ABC):
-    """Abstract base class for all components in the chain construction pipeline."""
+    """
+    Abstract base class for all components in the chain construction pipeline.
+    Each builder declares the BuildContext fields it reads (`requires`) and the
+    fields it populates (`provides`); the pipeline uses these to run independent
+    builders concurrently.
+    """
+    requires: tuple[str, ...] = ()
+    provides: tuple[str, ...] = ()
     
     @abstractmethod
     async def build(self, context: BuildContext) -> BuildContext:
@@ -11,6 +11,9 @@ class DataBuilder(BaseBuilder):
     Fetches and prepares on-the-fly data (e.g., user-uploaded files) for the prompt.
     This now uses a gRPC client to call the Data Service (MS10).
     """
+    requires = ()
+    provides = ("on_the_fly_data",)
+
     def __init__(self):
         self.data_client = DataServiceClient()
 
@@ -11,8 +11,12 @@ class MemoryBuilder(BaseBuilder):
     into a list of LangChain message objects. This version correctly and
     safely parses the rich message format.
     """
+    requires = ()
+    provides = ("memory",)
+
     async def build(self, context: BuildContext) -> BuildContext:
         job = context.job
+        await job.resolve("memory_context")
         memory_context = job.memory_context
         
         if not memory_context or not memory_context.get("history"):
@@ -2,7 +2,14 @@
 
 from .base_builder import BaseBuilder
 from app.execution.build_context import BuildContext
+from app.execution.job import InvalidJobError
 from app.logging_config import logger
+from app.execution.model_pool import chat_model_pool, ChatModelPool
+from app.execution.runnable_cache import content_hash
+from app.execution.fake_model import FakeChatModel
+from app.execution.direct_providers import direct_spec_for
+from app.execution.ollama_models import ollama_models, OllamaLoadObserver
+from app import config
 import json
 
 # Text model imports
@@ -22,6 +29,8 @@ class ModelBuilder(BaseBuilder):
     parses the nested schema structure for credentials and parameters and uses
     the modern, safe API for Google Gemini.
     """
+    requires = ()
+    provides = ("llm", "provider_key", "direct_model")
     
     def _get_value_from_schema(self, schema_block: dict, key: str, value_field: str = 'default') -> any:
         """
@@ -33,8 +42,33 @@ class ModelBuilder(BaseBuilder):
             return properties[key].get(value_field)
         return None
 
+    def _split_overrides(self, model_cls, base_params: dict, overrides: dict) -> dict:
+        """
+        Separates overrides that map onto plain model fields (temperature, top_p, ...)
+        from anything the constructor has to interpret itself. The latter are folded
+        into `base_params` so they become part of the pooled client's identity.
+        """
+        field_overrides = {}
+        for key, value in overrides.items():
+            if key in model_cls.model_fields:
+                field_overrides[key] = value
+            else:
+                base_params[key] = value
+        return field_overrides
+
+    def _apply_overrides(self, llm, overrides: dict):
+        """
+        Applies per-job parameter overrides to a pooled client without rebuilding it.
+        A shallow copy keeps the pooled client's HTTP clients and connection pools,
+        and unlike `bind()` it stays a chat model, so `bind_tools()` still works.
+        """
+        if not overrides:
+            return llm
+        return llm.model_copy(update=overrides)
+
     async def build(self, context: BuildContext) -> BuildContext:
         job = context.job
+        await job.resolve("model_config")
         model_data = job.model_config
         
         provider = model_data.get("provider")
@@ -42,25 +76,32 @@ class ModelBuilder(BaseBuilder):
         # from the user-configured model.
         full_config = model_data.get("configuration", {})
         
-        final_params = {**job.default_params, **job.param_overrides}
+        # Base parameters are part of the pooled client's identity; per-job overrides are not.
+        base_params = dict(job.default_params)
+        overrides = dict(job.param_overrides)
+        schema_model_name = self._get_value_from_schema(full_config.get("parameters", {}), "model_name")
+        model_name = overrides.pop("model_name", base_params.pop("model_name", schema_model_name))
+        if provider == "ollama":
+            # A stable num_ctx and a long keep_alive, so Ollama keeps the loaded runner between jobs.
+            base_params.update(ollama_models.residency_params(job, {**base_params, **overrides}))
+        # The direct path takes the effective parameters as one set (no pooled client to share).
+        direct_params = {**base_params, **overrides}
         
         logger.info(f"[{job.id}] Building model for provider: '{provider}' using definitive schema parser.")
         logger.debug(f"[{job.id}] Full configuration received:\n{json.dumps(full_config, indent=2)}")
 
         if provider == "google":
             credentials_schema = full_config.get("credentials", {})
-            parameters_schema = full_config.get("parameters", {})
 
             # 1. Extract the API key from the 'default' field of the credentials schema
             api_key = self._get_value_from_schema(credentials_schema, "api_key", value_field='default')
             
             if not api_key:
-                raise ValueError("Could not extract 'api_key' from the model configuration's 'credentials.properties.api_key.default' field.")
+                raise InvalidJobError("Could not extract 'api_key' from the model configuration's 'credentials.properties.api_key.default' field.")
 
-            # 2. Get model_name, prioritizing user override, then the schema default.
-            model_name = final_params.pop("model_name", self._get_value_from_schema(parameters_schema, "model_name"))
+            # 2. model_name was resolved above, prioritizing user override, then the schema default.
             if not model_name:
-                raise ValueError("Could not determine 'model_name'.")
+                raise InvalidJobError("Could not determine 'model_name'.")
             
             # 3. Define the mandatory safety settings for the modern API
             #safety_settings = {
@@ -70,29 +111,65 @@ class ModelBuilder(BaseBuilder):
             #    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
             #}
 
-            context.llm = ChatGoogleGenerativeAI(
+            overrides = self._split_overrides(ChatGoogleGenerativeAI, base_params, overrides)
+            pool_key = ChatModelPool.make_key(provider, model_name, api_key=api_key, params=base_params)
+            llm = chat_model_pool.get_or_create(pool_key, lambda: ChatGoogleGenerativeAI(
                 google_api_key=api_key, 
                 model=model_name, 
                 #safety_settings=safety_settings,
-                **final_params
-            )
+                **base_params
+            ))
+            context.llm = self._apply_overrides(llm, overrides)
+            context.cache_keys["llm"] = content_hash([pool_key, overrides])
+            context.provider_key = (provider, model_name)
+            context.direct_model = direct_spec_for(provider, model_name, direct_params, api_key=api_key)
             logger.info(f"[{job.id}] Successfully built Google Gemini model '{model_name}'.")
 
         elif provider == "ollama":
             credentials_schema = full_config.get("credentials", {})
-            parameters_schema = full_config.get("parameters", {})
             
             base_url = self._get_value_from_schema(credentials_schema, "base_url")
             if not base_url:
-                raise ValueError("Could not extract 'base_url' from the Ollama model configuration.")
+                raise InvalidJobError("Could not extract 'base_url' from the Ollama model configuration.")
             
-            model_name = final_params.pop("model_name", self._get_value_from_schema(parameters_schema, "model_name"))
             if not model_name:
-                raise ValueError("Could not determine 'model_name' for Ollama.")
+                raise InvalidJobError("Could not determine 'model_name' for Ollama.")
                 
-            context.llm = ChatOllama(base_url=base_url, model=model_name, **final_params)
+            overrides = self._split_overrides(ChatOllama, base_params, overrides)
+            pool_key = ChatModelPool.make_key(provider, model_name, base_url=base_url, params=base_params)
+            llm = chat_model_pool.get_or_create(
+                pool_key, lambda: ChatOllama(
+                    base_url=base_url, model=model_name, callbacks=[OllamaLoadObserver(model_name)], **base_params
+                )
+            )
+            context.llm = self._apply_overrides(llm, overrides)
+            context.cache_keys["llm"] = content_hash([pool_key, overrides])
+            context.provider_key = (provider, base_url)
+            context.direct_model = direct_spec_for(provider, model_name, direct_params, base_url=base_url)
+            await ollama_models.record_use(base_url, model_name, direct_params)
             logger.info(f"[{job.id}] Successfully built Ollama model '{model_name}' on '{base_url}'.")
 
+        elif provider == "fake":
+            # Deterministic local model for benchmarks; never reachable unless explicitly enabled.
+            if not config.FAKE_PROVIDER_ENABLED:
+                raise InvalidJobError("The 'fake' provider is disabled. Set FAKE_PROVIDER_ENABLED=true to use it.")
+
+            schema_defaults = {
+                key: self._get_value_from_schema(full_config.get("parameters", {}), key)
+                for key in FakeChatModel.model_fields
+            }
+            fake_params = {
+                key: value
+                for key, value in {**schema_defaults, **base_params, **overrides}.items()
+                if key in FakeChatModel.model_fields and value is not None
+            }
+            fake_params["model_name"] = model_name or "fake"
+            pool_key = ChatModelPool.make_key(provider, fake_params["model_name"], params=fake_params)
+            context.llm = chat_model_pool.get_or_create(pool_key, lambda: FakeChatModel(**fake_params))
+            context.cache_keys["llm"] = content_hash([pool_key])
+            context.provider_key = (provider, fake_params["model_name"])
+            logger.info(f"[{job.id}] Built fake model '{fake_params['model_name']}' ({fake_params}).")
+
         # Your image generation logic is preserved.
         # elif provider == "huggingface_diffusers":
         #    ...
@@ -100,7 +177,7 @@ class ModelBuilder(BaseBuilder):
         else:
             # Added a check to avoid trying to build an image model as a text model
             if provider != "huggingface_diffusers":
-                 raise ValueError(f"Unsupported text model provider: '{provider}'")
+                 raise InvalidJobError(f"Unsupported text model provider: '{provider}'")
         
         logger.info(f"[{job.id}] Model building complete.")
         return context
\ No newline at end of file
@@ -1,24 +1,108 @@
 from .base_builder import BaseBuilder
 from app.execution.build_context import BuildContext
 from app.logging_config import logger # <-- Correct import
+from app import config
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from app.execution.runnable_cache import runnable_cache, content_hash
+from app.execution.context_packer import ContextPacker, PackItem, declared_context_window, estimate_tokens, resolve_context_window
+import json
+
+SYSTEM_PROMPT = "You are a helpful and intelligent AI assistant."
 
 class PromptBuilder(BaseBuilder):
     """Assembles the final prompt template and input variables."""
+    requires = ("memory", "tools", "on_the_fly_data")
+    provides = ("prompt_template", "final_input")
+
+    @staticmethod
+    def _build_template(has_memory: bool, has_tools: bool) -> ChatPromptTemplate:
+        """Builds the template for one prompt shape. Only the shape matters, not the job."""
+        messages = [("system", SYSTEM_PROMPT)]
+        if has_memory:
+            messages.append(MessagesPlaceholder(variable_name="chat_history"))
+        messages.append(("user", "{input}"))
+        if has_tools:
+            messages.append(MessagesPlaceholder(variable_name="agent_scratchpad"))
+        return ChatPromptTemplate.from_messages(messages)
+
+    @staticmethod
+    def _packing_applies(job) -> bool:
+        # Map-reduce jobs are packed too: MapReduceExecutor runs when their files didn't fit.
+        strategy = job.execution_strategy or config.DEFAULT_EXECUTION_STRATEGY
+        return config.CONTEXT_PACKING_ENABLED or strategy == "map_reduce" or declared_context_window(job) is not None
+
+    def _pack_context(self, context: BuildContext) -> tuple[list, list, list]:
+        """
+        Fits history, file content and RAG documents into the model's context window.
+        Returns the kept (history messages, file contents, RAG contents) and stores
+        a report of what was truncated or dropped on the context. Without a known
+        window (see CONTEXT_PACKING_ENABLED) everything is kept.
+        """
+        job = context.job
+        if not self._packing_applies(job):
+            return (
+                list(context.memory or []),
+                [data.get("content") for data in context.on_the_fly_data],
+                [str(doc.get("content")) for doc in job.rag_docs],
+            )
+
+        context_window, reserved_output = resolve_context_window(job)
+        fixed_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(job.prompt_text)
+        if job.tool_definitions:
+            fixed_tokens += estimate_tokens(json.dumps(job.tool_definitions, default=str))
+        budget = context_window - reserved_output - fixed_tokens - config.CONTEXT_TEMPLATE_OVERHEAD_TOKENS
+
+        sources = {
+            "history": [
+                PackItem("history", str(i), str(message.content), splittable=False, payload=message)
+                for i, message in enumerate(context.memory or [])
+            ],
+            "files": [
+                PackItem("files", str(i), data.get("content"), payload=data)
+                for i, data in enumerate(context.on_the_fly_data) if isinstance(data.get("content"), str)
+            ],
+            "rag": [
+                PackItem("rag", str(doc.get("id", i)), str(doc.get("content")), payload=doc)
+                for i, doc in enumerate(job.rag_docs)
+            ],
+        }
+        packed, report = ContextPacker(budget).pack(sources, job.prompt_text)
+        report["context_window"] = context_window
+        report["reserved_output"] = reserved_output
+        context.packing_report = report
+
+        if report["dropped"] or report["truncated"]:
+            logger.warning(f"[{job.id}] Context exceeded its budget of {budget} tokens. "
+                           f"Dropped {len(report['dropped'])} item(s), truncated {len(report['truncated'])}.")
+
+        # Non-text file content (e.g. image references) doesn't compete for the text budget.
+        non_text_files = [data.get("content") for data in context.on_the_fly_data if not isinstance(data.get("content"), str)]
+        return (
+            [item.payload for item in packed["history"]],
+            [item.text for item in packed["files"]] + non_text_files,
+            [item.text for item in packed["rag"]],
+        )
+
     async def build(self, context: BuildContext) -> BuildContext:
         job = context.job
         logger.info(f"[{job.id}] Assembling final prompt.")
+        # The context window lives in the model configuration, which may have been offloaded.
+        await job.resolve("model_config")
         
+        history, file_contents, rag_contents = self._pack_context(context)
+        if context.memory:
+            context.memory = history
+
         context_str = ""
-        if job.rag_docs:
+        if rag_contents:
             context_str += "--- Context from Knowledge Base ---\n"
-            for doc in job.rag_docs:
-                context_str += f"Content: {doc.get('content')}\n\n"
+            for content in rag_contents:
+                context_str += f"Content: {content}\n\n"
         
-        if context.on_the_fly_data:
+        if file_contents:
             context_str += "--- Context from Provided Files ---\n"
-            for data in context.on_the_fly_data:
-                context_str += f"Content: {data.get('content')}\n\n"
+            for content in file_contents:
+                context_str += f"Content: {content}\n\n"
 
         if context_str:
             final_prompt_text = f"{context_str}Based on the context above, please respond to the following:\n\n{job.prompt_text}"
@@ -27,13 +111,11 @@ class PromptBuilder(BaseBuilder):
             
         context.final_input = {"input": final_prompt_text}
 
-        messages = [("system", "You are a helpful and intelligent AI assistant.")]
-        if context.memory:
-            messages.append(MessagesPlaceholder(variable_name="chat_history"))
-        messages.append(("user", "{input}"))
-        if context.tools:
-            messages.append(MessagesPlaceholder(variable_name="agent_scratchpad"))
-
-        context.prompt_template = ChatPromptTemplate.from_messages(messages)
+        has_memory, has_tools = bool(context.memory), bool(context.tools)
+        prompt_key = content_hash([SYSTEM_PROMPT, has_memory, has_tools])
+        context.prompt_template = runnable_cache.get_or_create(
+            "prompt_template", prompt_key, lambda: self._build_template(has_memory, has_tools)
+        )
+        context.cache_keys["prompt"] = prompt_key
         logger.info(f"[{job.id}] Prompt assembly complete.")
         return context
\ No newline at end of file
@@ -4,8 +4,15 @@ from .base_builder import BaseBuilder
 from app.execution.build_context import BuildContext
 from app.logging_config import logger
 from app.internals.clients import ToolServiceClient
+from app.internals.tool_batcher import ToolCallBatcher, ToolStepCallback
+from app.execution.runnable_cache import runnable_cache, content_hash
+from app.execution.tool_output import (
+    OutputBudget, ToolOutputLimiter, PAGER_TOOL_NAME, build_pager_tool, tool_output_artifacts,
+)
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field, create_model
+from app.metrics import TOOL_CALL_SECONDS, tool_label
+import time
 import uuid
 
 # --- NEW: A dedicated class to encapsulate a single tool's execution ---
@@ -14,11 +21,15 @@ class MicroserviceToolExecutor:
     A callable class that encapsulates the state and logic needed to execute
     a single tool via a gRPC microservice.
     """
-    def __init__(self, client: ToolServiceClient, job_id: str, tool_name: str, required_params: list[str]):
+    def __init__(self, client: ToolServiceClient | ToolCallBatcher, job_id: str, tool_name: str, required_params: list[str],
+                 output_budget: OutputBudget = None, output_limiter: ToolOutputLimiter = None):
         self.client = client
         self.job_id = job_id
         self.tool_name = tool_name
         self.required_params = required_params
+        # Bounds what the result may add to the agent scratchpad (None = unbounded).
+        self.output_budget = output_budget
+        self.output_limiter = output_limiter
 
     async def __call__(self, **kwargs):
         """
@@ -39,6 +50,7 @@ class MicroserviceToolExecutor:
         tool_call_payload = [{"id": tool_call_id, "name": self.tool_name, "arguments": arguments}]
         
         logger.info(f"[{self.job_id}] Agent requested to execute tool '{self.tool_name}' with args: {arguments}")
+        started = time.perf_counter()
         results = await self.client.execute_tools(tool_call_payload)
         
         output = f"Error: No result from tool '{self.tool_name}'."
@@ -46,6 +58,10 @@ class MicroserviceToolExecutor:
             output = results[0]["output"]
         elif results:
             output = f"Error from tool '{self.tool_name}': {results[0]['output']}"
+        status = results[0]['status'] if results else "error"
+        TOOL_CALL_SECONDS.labels(tool=tool_label(self.tool_name), status=status).observe(time.perf_counter() - started)
+        if self.output_limiter and self.output_budget:
+            output = await self.output_limiter.apply(self.tool_name, output, self.output_budget)
 
         logger.info(f"[{self.job_id}] Tool '{self.tool_name}' returned: {output[:100]}...")
         return output
@@ -58,46 +74,86 @@ class ToolBuilder(BaseBuilder):
     This definitive version uses a callable class for execution, providing
     clarity, state encapsulation, and intelligent session_id injection.
     """
+    requires = ()
+    provides = ("tools",)
+
     def __init__(self):
         self.tool_service_client = ToolServiceClient()
 
+    def _build_tool_shell(self, definition: dict) -> StructuredTool:
+        """
+        Builds the job-independent part of a tool: its pydantic args schema and a
+        StructuredTool without a coroutine. The result is cached by definition hash.
+        """
+        tool_name = definition["name"]
+        tool_params = definition.get("parameters", {}).get("properties", {})
+
+        fields_for_model = {
+            param_name: (str, Field(..., description=schema.get("description")))
+            for param_name, schema in tool_params.items()
+        }
+
+        DynamicArgsSchema = create_model(f"{tool_name}ArgsSchema", **fields_for_model)
+
+        return StructuredTool(
+            name=tool_name,
+            description=definition["description"],
+            args_schema=DynamicArgsSchema,
+            verbose=True
+        )
+
     async def build(self, context: BuildContext) -> BuildContext:
         if not context.job.tool_definitions:
             return context
+        await context.job.resolve("tools")
         
         logger.info(f"[{context.job.id}] Building {len(context.job.tool_definitions)} tools.")
         
+        # One batcher per job: the tool calls of an agent step go to MS7 in a single RPC.
+        tool_batcher = ToolCallBatcher(self.tool_service_client, job=context.job)
+        tool_names = {definition["name"] for definition in context.job.tool_definitions}
+        context.run_callbacks.append(ToolStepCallback(tool_batcher, tool_names))
+        output_limiter = ToolOutputLimiter(context, tool_output_artifacts)
+        definition_hashes = []
+        has_budget = False
         for definition in context.job.tool_definitions:
             tool_name = definition["name"]
-            tool_params = definition.get("parameters", {}).get("properties", {})
             required_params = definition.get("parameters", {}).get("required", [])
-            
-            fields_for_model = {
-                param_name: (str, Field(..., description=schema.get("description")))
-                for param_name, schema in tool_params.items()
-            }
-            
-            DynamicArgsSchema = create_model(f"{tool_name}ArgsSchema", **fields_for_model)
+
+            definition_hash = content_hash(definition)
+            definition_hashes.append(definition_hash)
+            tool_shell = runnable_cache.get_or_create(
+                "tool_shell", definition_hash, lambda: self._build_tool_shell(definition)
+            )
+
+            output_budget = OutputBudget.from_definition(definition)
+            has_budget = has_budget or output_budget.max_tokens > 0
 
             # --- THE FIX: Instantiate our executor class for each tool ---
             tool_executor = MicroserviceToolExecutor(
-                client=self.tool_service_client,
+                client=tool_batcher,
                 job_id=context.job.id,
                 tool_name=tool_name,
-                required_params=required_params
+                required_params=required_params,
+                output_budget=output_budget,
+                output_limiter=output_limiter,
             )
             # --- END OF FIX ---
 
-            # The 'coroutine' is now an instance of our callable class.
-            dynamic_tool = StructuredTool.from_function(
-                name=tool_name,
-                description=definition["description"],
-                args_schema=DynamicArgsSchema,
-                coroutine=tool_executor, # <-- Pass the class instance
-                verbose=True
-            )
+            # Only the per-job executor is bound here; the cached shell is never mutated.
+            dynamic_tool = tool_shell.model_copy(update={"coroutine": tool_executor})
             
             context.tools.append(dynamic_tool)
 
+        # Only jobs with a tool output budget get the pager (and a different tools cache key).
+        if has_budget:
+            if PAGER_TOOL_NAME in tool_names:
+                logger.warning(f"[{context.job.id}] A tool named '{PAGER_TOOL_NAME}' exists; stored tool outputs can't be paged.")
+            else:
+                # Lets the agent read the full text of outputs that were cut to their budget.
+                context.tools.append(build_pager_tool(context.job.id, tool_output_artifacts))
+                definition_hashes.append(PAGER_TOOL_NAME)
+
+        context.cache_keys["tools"] = content_hash(definition_hashes)
         logger.info(f"[{context.job.id}] Tools built successfully.")
         return context
\ No newline at end of file
@@ -0,0 +1,241 @@
+# MS6/app/execution/concurrency.py
+
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from langchain_core.callbacks import AsyncCallbackHandler
+from app import config
+from app.logging_config import logger
+
+
+# Provider SDK exceptions that mean "slow down" or "the provider is failing", for SDKs
+# that don't expose an HTTP status (e.g. google.api_core's ResourceExhausted).
+THROTTLED_ERROR_TYPES = {"RateLimitError", "ResourceExhausted", "TooManyRequests"}
+SERVER_ERROR_TYPES = {"InternalServerError", "ServiceUnavailable", "BadGateway", "GatewayTimeout"}
+
+
+def _http_status(error: BaseException) -> int | None:
+    """The HTTP status of a provider error, wherever its SDK keeps it."""
+    response = getattr(error, "response", None)
+    for status in (getattr(error, "status_code", None), getattr(error, "code", None), getattr(response, "status_code", None)):
+        if isinstance(status, int) and not isinstance(status, bool):
+            return status
+    return None
+
+
+def classify_provider_error(error: BaseException) -> str:
+    """
+    Maps an exception raised while talking to an LLM provider onto an outcome the
+    limiter understands: "throttled" (429 / quota), "server_error" (5xx) or "error".
+    Only the HTTP status and the SDK's exception type count, never the message text
+    (which may contain any number). Wrappers such as LangChain's are followed to the
+    exception they were raised from.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status, name = _http_status(error), type(error).__name__
+        if status == 429 or name in THROTTLED_ERROR_TYPES:
+            return "throttled"
+        if (status is not None and 500 <= status < 600) or name in SERVER_ERROR_TYPES:
+            return "server_error"
+        error = error.__cause__ or error.__context__
+    return "error"
+
+
+class LimiterSlot:
+    """
+    Handed to the code running inside a limiter slot (one LLM call) so it can report
+    when the first token arrived and provider errors it swallows.
+    """
+    def __init__(self):
+        self.outcome = "success"
+        self.started = time.monotonic()
+        self.first_token_at = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+    def record_error(self, error: BaseException):
+        self.outcome = classify_provider_error(error)
+
+    @property
+    def latency(self) -> float:
+        """Time to first token when the call streamed, else the duration of the call."""
+        return (self.first_token_at or time.monotonic()) - self.started
+
+
+class AdaptiveLimiter:
+    """
+    A concurrency limiter for ONE provider endpoint whose limit adapts with AIMD:
+    - every successful call adds 1/limit (so roughly +1 per window of calls),
+    - a 429, a 5xx or a latency well above the running average multiplies the
+      limit by `backoff_ratio`, at most once per window: calls that started before
+      the last decrease saw the old load, so their slow or throttled results don't
+      lower the limit again (a burst of 429s halves it once, like TCP congestion control).
+    A slot covers one LLM call and its latency is the time to first token, so tool
+    execution and answer length don't read as provider congestion.
+    """
+    def __init__(self, name: str, initial_limit: float, min_limit: float, max_limit: float,
+                 backoff_ratio: float = 0.5, latency_tolerance: float = 2.0):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = float(max(1, min_limit))
+        self.max_limit = float(max_limit)
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.latency_ewma = None
+        self.counts = {"success": 0, "throttled": 0, "server_error": 0, "error": 0, "cancelled": 0}
+        self._condition = asyncio.Condition()
+        # Every acquired slot gets the next ticket; results of tickets below the barrier
+        # (calls started before the last decrease) can't decrease the limit again.
+        self._tickets = itertools.count()
+        self._backoff_barrier = 0
+
+    async def acquire(self) -> int:
+        """Waits for a free slot. Returns the call's ticket, to be passed to `release`."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            return next(self._tickets)
+
+    async def release(self, ticket: int, latency: float, outcome: str):
+        async with self._condition:
+            self.in_flight -= 1
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            self._adjust(ticket, latency, outcome)
+            self._condition.notify_all()
+
+    def _adjust(self, ticket: int, latency: float, outcome: str):
+        if outcome in ("throttled", "server_error"):
+            self._decrease(ticket, f"provider returned '{outcome}'")
+            return
+        if outcome != "success":
+            # Client-side errors and cancellations say nothing about provider capacity.
+            return
+
+        if self.latency_ewma is not None and latency > self.latency_tolerance * self.latency_ewma:
+            self._decrease(ticket, f"latency {latency:.2f}s exceeded {self.latency_tolerance}x the average")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+    def _decrease(self, ticket: int, reason: str):
+        if ticket < self._backoff_barrier:
+            # Already backed off for the window this call belongs to.
+            return
+        # The next ticket: only calls that start from now on reflect the new limit.
+        self._backoff_barrier = next(self._tickets)
+        previous = self.limit
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        logger.warning(f"Limiter '{self.name}' backing off from {previous:.1f} to {self.limit:.1f}: {reason}.")
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            **self.counts,
+        }
+
+
+class ProviderLimiterRegistry:
+    """Holds one AdaptiveLimiter per (provider, base_url/model) key."""
+    def __init__(self):
+        # Structure: { ("provider", "base_url or model"): AdaptiveLimiter }
+        self._limiters = {}
+
+    def get(self, key: tuple) -> AdaptiveLimiter:
+        key = key or ("default",)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = AdaptiveLimiter(
+                name="/".join(str(part) for part in key),
+                initial_limit=config.LIMITER_INITIAL_LIMIT,
+                min_limit=config.LIMITER_MIN_LIMIT,
+                max_limit=config.LIMITER_MAX_LIMIT,
+                backoff_ratio=config.LIMITER_BACKOFF_RATIO,
+                latency_tolerance=config.LIMITER_LATENCY_TOLERANCE,
+            )
+            self._limiters[key] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, key: tuple):
+        """
+        Holds a slot of the limiter for `key` for the duration of the block (one LLM
+        call) and feeds its latency (see `LimiterSlot.first_token`) and outcome back into it.
+        """
+        limiter = self.get(key)
+        ticket = await limiter.acquire()
+        slot = LimiterSlot()
+        try:
+            yield slot
+        except asyncio.CancelledError:
+            slot.outcome = "cancelled"
+            raise
+        except Exception as e:
+            slot.record_error(e)
+            raise
+        finally:
+            await limiter.release(ticket, slot.latency, slot.outcome)
+
+    def total_capacity(self) -> int:
+        return sum(int(limiter.limit) for limiter in self._limiters.values())
+
+    def snapshot(self) -> dict:
+        return {limiter.name: limiter.snapshot() for limiter in self._limiters.values()}
+
+
+class LimiterCallback(AsyncCallbackHandler):
+    """
+    Takes a limiter slot for every chat model call of a LangChain run (an agent calls
+    the model once per step) and releases it when the call ends, so the slot is not
+    held while tools run. Async handlers are awaited before the model is called, so
+    the call waits for the slot. One instance serves one job.
+    """
+    raise_error = True
+
+    def __init__(self, registry: "ProviderLimiterRegistry", key: tuple):
+        self.registry = registry
+        self.key = key
+        # Structure: { run_id: (AdaptiveLimiter, ticket, LimiterSlot) }
+        self._slots = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        limiter = self.registry.get(self.key)
+        ticket = await limiter.acquire()
+        self._slots[run_id] = (limiter, ticket, LimiterSlot())
+
+    async def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id in self._slots:
+            self._slots[run_id][2].first_token()
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        await self._release(run_id)
+
+    async def on_llm_error(self, error, *, run_id, **kwargs):
+        await self._release(run_id, error)
+
+    async def _release(self, run_id, error: BaseException = None):
+        entry = self._slots.pop(run_id, None)
+        if entry is None:
+            return
+        limiter, ticket, slot = entry
+        if isinstance(error, asyncio.CancelledError):
+            slot.outcome = "cancelled"
+        elif error is not None:
+            slot.record_error(error)
+        await limiter.release(ticket, slot.latency, slot.outcome)
+
+    async def release_all(self):
+        """Releases slots whose calls never reported an end (e.g. the run was cancelled mid-call)."""
+        for run_id in list(self._slots):
+            await self._release(run_id, asyncio.CancelledError())
+
+
+# A single, process-wide registry shared by the worker and the Executor.
+provider_limiters = ProviderLimiterRegistry()
@@ -0,0 +1,204 @@
+# MS6/app/execution/context_packer.py
+
+import math
+import re
+from dataclasses import dataclass, replace
+from typing import Any, Callable
+from app import config
+from app.execution.job import Job
+
+
+def estimate_tokens(text: str) -> int:
+    """A cheap, provider-agnostic token estimate (characters / CONTEXT_CHARS_PER_TOKEN)."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / config.CONTEXT_CHARS_PER_TOKEN)
+
+
+def _chars_for_tokens(tokens: int) -> int:
+    return max(0, int(tokens * config.CONTEXT_CHARS_PER_TOKEN))
+
+
+# Schema keys (in the MS3 'parameters' block or the job parameters) that may carry a model's window.
+CONTEXT_WINDOW_KEYS = ("context_window", "num_ctx", "max_context_tokens", "max_input_tokens")
+OUTPUT_TOKEN_KEYS = ("max_output_tokens", "max_tokens", "num_predict")
+
+
+def _find_param(job: Job, keys: tuple) -> int | None:
+    """Looks for the first of `keys` in the job parameters, then in the MS3 schema defaults."""
+    params = {**job.default_params, **job.param_overrides}
+    properties = (job.model_config.get("configuration", {}).get("parameters", {}) or {}).get("properties", {})
+    for key in keys:
+        value = params.get(key)
+        if value is None and isinstance(properties.get(key), dict):
+            value = properties[key].get("default")
+        try:
+            if value is not None and int(value) > 0:
+                return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def declared_context_window(job: Job) -> int | None:
+    """The context window the job parameters or the MS3 schema declare for the model, if any."""
+    return _find_param(job, CONTEXT_WINDOW_KEYS)
+
+
+def resolve_context_window(job: Job) -> tuple[int, int]:
+    """Returns (context_window, reserved_output_tokens) for the job's model."""
+    provider = job.model_config.get("provider")
+    context_window = declared_context_window(job) or config.CONTEXT_WINDOW_DEFAULTS.get(
+        provider, config.CONTEXT_WINDOW_DEFAULTS["default"]
+    )
+    reserved_output = _find_param(job, OUTPUT_TOKEN_KEYS) or config.CONTEXT_RESERVED_OUTPUT_TOKENS
+    return context_window, min(reserved_output, context_window // 2)
+
+
+@dataclass
+class PackItem:
+    """One unit of context competing for the budget (a message, a file or a RAG document)."""
+    source: str
+    key: str
+    text: str
+    splittable: bool = True
+    payload: Any = None
+    truncated: bool = False
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+# --- Packing policies ---
+# A policy receives the items of one source, its token budget and the user's query,
+# and returns the items to keep (possibly truncated), in the order they should appear.
+
+def head_policy(items: list[PackItem], budget: int, query: str) -> list[PackItem]:
+    """Keeps items from the start; the first one that doesn't fit is cut at its end."""
+    kept, remaining = [], budget
+    for item in items:
+        if item.tokens <= remaining:
+            kept.append(item)
+            remaining -= item.tokens
+            continue
+        if item.splittable and remaining > 0:
+            kept.append(replace(item, text=item.text[:_chars_for_tokens(remaining)], truncated=True))
+        break
+    return kept
+
+
+def tail_policy(items: list[PackItem], budget: int, query: str) -> list[PackItem]:
+    """Keeps items from the end (e.g. the most recent history); the first that doesn't fit is cut at its start."""
+    kept, remaining = [], budget
+    for item in reversed(items):
+        if item.tokens <= remaining:
+            kept.append(item)
+            remaining -= item.tokens
+            continue
+        if item.splittable and remaining > 0:
+            kept.append(replace(item, text=item.text[-_chars_for_tokens(remaining):], truncated=True))
+        break
+    return list(reversed(kept))
+
+
+def _terms(text: str) -> set[str]:
+    return {term for term in re.findall(r"\w+", text.lower()) if len(term) > 2}
+
+
+def relevance_policy(items: list[PackItem], budget: int, query: str) -> list[PackItem]:
+    """Ranks items by term overlap with the query and greedily keeps the best ones that fit."""
+    query_terms = _terms(query)
+
+    def score(item: PackItem) -> float:
+        item_terms = _terms(item.text)
+        if not item_terms or not query_terms:
+            return 0.0
+        return len(item_terms & query_terms) / math.sqrt(len(item_terms))
+
+    kept, remaining = [], budget
+    for item in sorted(items, key=score, reverse=True):
+        if item.tokens <= remaining:
+            kept.append(item)
+            remaining -= item.tokens
+    return kept
+
+
+PACKING_POLICIES: dict[str, Callable[[list[PackItem], int, str], list[PackItem]]] = {
+    "head": head_policy,
+    "tail": tail_policy,
+    "relevance": relevance_policy,
+}
+
+
+class ContextPacker:
+    """
+    Fits history, file content and RAG documents into a model's context window.
+    The available budget is split across sources by `quotas`; whatever a source
+    doesn't need is handed to the sources that still want more. Each source is then
+    packed with its own policy, and a report of what was kept, truncated and
+    dropped is produced for the job's metadata.
+    """
+    def __init__(self, budget: int, quotas: dict[str, float] = None, policies: dict[str, str] = None):
+        self.budget = max(0, budget)
+        self.quotas = quotas or config.CONTEXT_SOURCE_QUOTAS
+        self.policies = policies or config.CONTEXT_SOURCE_POLICIES
+
+    def _allocate(self, demands: dict[str, int]) -> dict[str, int]:
+        allocation = {source: 0 for source in demands}
+        remaining = self.budget
+        wanting = {source for source, demand in demands.items() if demand > 0}
+        # Water-filling: share by quota, cap at demand, redistribute the leftovers.
+        while remaining > 0 and wanting:
+            weights = {source: self.quotas.get(source, 1.0) or 1.0 for source in wanting}
+            total_weight = sum(weights.values())
+            distributed = 0
+            for source in list(wanting):
+                grant = min(demands[source] - allocation[source], int(remaining * weights[source] / total_weight))
+                allocation[source] += grant
+                distributed += grant
+                if allocation[source] >= demands[source]:
+                    wanting.discard(source)
+            if distributed == 0:
+                # Rounding left a few tokens that no share could claim; give them to one source.
+                source = next(iter(wanting))
+                distributed = min(remaining, demands[source] - allocation[source])
+                allocation[source] += distributed
+                wanting.discard(source)
+            remaining -= distributed
+        return allocation
+
+    def pack(self, sources: dict[str, list[PackItem]], query: str) -> tuple[dict[str, list[PackItem]], dict]:
+        demands = {source: sum(item.tokens for item in items) for source, items in sources.items()}
+        allocation = self._allocate(demands)
+
+        packed, report = {}, {"budget": self.budget, "allocated": allocation, "used": {}, "dropped": [], "truncated": []}
+        for source, items in sources.items():
+            policy = PACKING_POLICIES[self.policies.get(source, "head")]
+            kept = policy(items, allocation[source], query) if items else []
+            packed[source] = kept
+
+            kept_keys = {item.key for item in kept}
+            report["used"][source] = sum(item.tokens for item in kept)
+            report["dropped"] += [{"source": source, "key": i.key, "tokens": i.tokens} for i in items if i.key not in kept_keys]
+            report["truncated"] += [{"source": source, "key": i.key} for i in kept if i.truncated]
+        return packed, report
+
+
+def packing_warnings(report: dict, ignore_sources: tuple = ()) -> list[str]:
+    """
+    Tells the caller, in the final result, that context was cut to fit the model:
+    one line naming how many items of each source were dropped or truncated.
+    """
+    counts = {}
+    for kind in ("dropped", "truncated"):
+        for entry in report.get(kind, []):
+            if entry["source"] not in ignore_sources:
+                counts.setdefault(entry["source"], {"dropped": 0, "truncated": 0})[kind] += 1
+    if not counts:
+        return []
+    details = "; ".join(
+        f"{source}: " + ", ".join(f"{count} {kind}" for kind, count in kinds.items() if count)
+        for source, kinds in counts.items()
+    )
+    return [f"The context did not fit the model's window of {report.get('context_window')} tokens and was cut ({details})."]
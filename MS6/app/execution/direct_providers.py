@@ -0,0 +1,209 @@
+# MS6/app/execution/direct_providers.py
+
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+import httpx
+from app import config
+from app.logging_config import logger
+from app.execution.ollama_models import OllamaModelManager
+
+# ChatOllama parameters that Ollama expects inside the request's "options" object.
+OLLAMA_OPTIONS = {
+    "mirostat", "mirostat_eta", "mirostat_tau", "num_ctx", "num_gpu", "num_thread", "num_predict",
+    "repeat_last_n", "repeat_penalty", "temperature", "stop", "tfs_z", "top_k", "top_p", "seed",
+}
+# ChatOllama parameters that are top-level request fields.
+OLLAMA_REQUEST_FIELDS = {"format", "keep_alive"}
+
+# ChatGoogleGenerativeAI parameter -> Gemini REST generationConfig field.
+GEMINI_GENERATION_FIELDS = {
+    "temperature": "temperature",
+    "top_p": "topP",
+    "top_k": "topK",
+    "max_output_tokens": "maxOutputTokens",
+    "max_tokens": "maxOutputTokens",
+    "stop": "stopSequences",
+}
+# ChatGoogleGenerativeAI samples at 0.7 unless told otherwise; the direct path does the same.
+GEMINI_DEFAULT_TEMPERATURE = 0.7
+
+# LangChain message type -> provider role.
+OLLAMA_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+GEMINI_ROLES = {"human": "user", "ai": "model"}
+
+
+class DirectProviderError(Exception):
+    """A provider call on the direct path failed. `status_code` lets the adaptive limiter classify it."""
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class DirectModelSpec:
+    """Everything the direct path needs to call a model: set by the ModelBuilder next to `context.llm`."""
+    provider: str
+    model: str
+    base_url: str = None
+    api_key: str = None
+    # Provider-native request parameters, already translated from the LangChain names.
+    params: dict = field(default_factory=dict)
+
+
+def direct_spec_for(provider: str, model: str, params: dict, base_url: str = None, api_key: str = None) -> DirectModelSpec | None:
+    """
+    Translates a job's model parameters for the direct path. Returns None when the
+    provider isn't supported or a parameter has no direct equivalent, in which case
+    the job keeps using the LangChain runnable (so it behaves exactly as before).
+    """
+    if provider == "ollama":
+        options = {key: value for key, value in params.items() if key in OLLAMA_OPTIONS}
+        request_fields = {key: value for key, value in params.items() if key in OLLAMA_REQUEST_FIELDS}
+        if len(options) + len(request_fields) != len(params):
+            return None
+        return DirectModelSpec(provider, model, base_url=base_url.rstrip("/"), params={**request_fields, "options": options})
+
+    if provider == "google":
+        if any(key not in GEMINI_GENERATION_FIELDS for key in params):
+            return None
+        generation_config = {"temperature": GEMINI_DEFAULT_TEMPERATURE}
+        for key, value in params.items():
+            if key == "stop" and isinstance(value, str):
+                value = [value]
+            generation_config[GEMINI_GENERATION_FIELDS[key]] = value
+        model = model if model.startswith("models/") else f"models/{model}"
+        return DirectModelSpec(provider, model, api_key=api_key, params={"generationConfig": generation_config})
+
+    return None
+
+
+class DirectHttpClient:
+    """
+    Owns the pooled httpx.AsyncClient used by the direct provider adapters. It is
+    opened lazily on the worker's event loop and shared by every job, so calls to
+    the same provider reuse warm keep-alive connections.
+    """
+    def __init__(self):
+        self._client = None
+
+    def get(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=config.DIRECT_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.DIRECT_HTTP_MAX_KEEPALIVE,
+                ),
+                timeout=httpx.Timeout(
+                    config.DIRECT_HTTP_READ_TIMEOUT_SECONDS, connect=config.DIRECT_HTTP_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        """Closes the pooled connections. Called once when the worker shuts down."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Closed the direct provider HTTP client.")
+        self._client = None
+
+
+class DirectAdapter(ABC):
+    """
+    Calls one provider's chat API without LangChain. Messages are plain
+    {"role": "system" | "human" | "ai", "content": str} dicts (LangChain's message types,
+    so a rendered ChatPromptTemplate converts one-to-one); `stream` yields text deltas.
+    """
+    def __init__(self, http: DirectHttpClient):
+        self.http = http
+
+    @abstractmethod
+    def stream(self, spec: DirectModelSpec, messages: list[dict]) -> AsyncIterator[str]:
+        """Sends `messages` to the provider and yields the answer's text deltas as they arrive."""
+        pass
+
+    async def complete(self, spec: DirectModelSpec, messages: list[dict]) -> str:
+        return "".join([text async for text in self.stream(spec, messages)])
+
+    @staticmethod
+    async def _raise_for_status(response: httpx.Response, provider: str):
+        if response.status_code >= 400:
+            detail = (await response.aread()).decode(errors="replace")[:500]
+            raise DirectProviderError(f"{provider} returned HTTP {response.status_code}: {detail}", response.status_code)
+
+
+class OllamaAdapter(DirectAdapter):
+    """Ollama's /api/chat, which streams one JSON object per line (NDJSON)."""
+
+    async def stream(self, spec: DirectModelSpec, messages: list[dict]) -> AsyncIterator[str]:
+        payload = {
+            "model": spec.model,
+            "messages": [{"role": OLLAMA_ROLES[m["role"]], "content": m["content"]} for m in messages],
+            "stream": True,
+            **spec.params,
+        }
+        async with self.http.get().stream("POST", f"{spec.base_url}/api/chat", json=payload) as response:
+            await self._raise_for_status(response, "Ollama")
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if "error" in data:
+                    raise DirectProviderError(f"Ollama error: {data['error']}")
+                text = data.get("message", {}).get("content")
+                if text:
+                    yield text
+                if data.get("done"):
+                    OllamaModelManager.observe_load(spec.model, data.get("load_duration"))
+                    return
+
+
+class GeminiAdapter(DirectAdapter):
+    """Gemini's REST streamGenerateContent endpoint, as server-sent events."""
+
+    @staticmethod
+    def _contents(messages: list[dict]) -> tuple[dict | None, list[dict]]:
+        """Splits off the system instruction and merges consecutive turns of the same role (Gemini requires alternation)."""
+        system_parts = [{"text": m["content"]} for m in messages if m["role"] == "system"]
+        contents = []
+        for message in messages:
+            if message["role"] == "system":
+                continue
+            role = GEMINI_ROLES[message["role"]]
+            if contents and contents[-1]["role"] == role:
+                contents[-1]["parts"].append({"text": message["content"]})
+            else:
+                contents.append({"role": role, "parts": [{"text": message["content"]}]})
+        return ({"parts": system_parts} if system_parts else None), contents
+
+    async def stream(self, spec: DirectModelSpec, messages: list[dict]) -> AsyncIterator[str]:
+        system_instruction, contents = self._contents(messages)
+        payload = {"contents": contents, **spec.params}
+        if system_instruction:
+            payload["systemInstruction"] = system_instruction
+        url = f"{config.GEMINI_API_BASE_URL}/{spec.model}:streamGenerateContent"
+        async with self.http.get().stream(
+            "POST", url, params={"alt": "sse"}, headers={"x-goog-api-key": spec.api_key}, json=payload,
+        ) as response:
+            await self._raise_for_status(response, "Gemini")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = json.loads(line[5:])
+                if "error" in data:
+                    error = data["error"]
+                    raise DirectProviderError(f"Gemini error: {error.get('message')}", error.get("code"))
+                for candidate in data.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+
+
+# A single, process-wide HTTP client shared by every adapter.
+direct_http_client = DirectHttpClient()
+
+DIRECT_ADAPTERS = {
+    "ollama": OllamaAdapter(direct_http_client),
+    "google": GeminiAdapter(direct_http_client),
+}
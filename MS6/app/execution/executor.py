@@ -1,11 +1,22 @@
 # MS6/app/execution/executor.py
 
+import asyncio
+import time
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.messages import AIMessage, AIMessageChunk
 
 from app.logging_config import logger
 from app.execution.build_context import BuildContext
 from app.messaging.publisher import ResultPublisher
+from app.messaging.stream_buffer import StreamChunkBuffer
+from app.execution.runnable_cache import runnable_cache, content_hash
+from app.execution.concurrency import LimiterCallback, provider_limiters
+from app.execution.context_packer import estimate_tokens, packing_warnings
+from app.execution.direct_providers import DIRECT_ADAPTERS
+from app.execution.agent_checkpoint import CheckpointedAgentExecutor, agent_checkpoints
+from app.execution.tool_output import SUMMARY_RUN_TAG
+from app.metrics import TIME_TO_FIRST_TOKEN_SECONDS, TOKENS_PER_SECOND, EXECUTION_PATH_TOTAL
+from app import config
 
 class Executor:
     """
@@ -18,6 +29,12 @@ class Executor:
         self.context = context
         self.job = context.job
         self.publisher = publisher
+        # Takes a provider limiter slot for each LLM call of the chain or agent, and
+        # releases it when the call ends, so no slot is held while tools run.
+        self.limiter_callback = LimiterCallback(provider_limiters, context.provider_key)
+        self.run_config = {"callbacks": [self.limiter_callback, *context.run_callbacks]}
+        self.provider = (context.provider_key or ("unknown",))[0]
+        self._started = None
 
     def _get_final_content(self, result) -> str:
         """
@@ -32,70 +49,211 @@ class Executor:
             return result.content
         return str(result)
 
-    async def run(self):
+    def _result_metadata(self) -> dict:
+        """Job metadata attached to the final result."""
+        metadata = {}
+        if self.context.packing_report:
+            metadata["context_packing"] = self.context.packing_report
+        return metadata
+
+    def _result_warnings(self) -> list[str]:
+        """What the caller should know about how the job was run, sent with the final result."""
+        return packing_warnings(self.context.packing_report)
+
+    def _get_agent(self):
+        """
+        Returns the tool-calling agent graph for this node configuration.
+        The graph only depends on the model, the tool schemas and the prompt shape,
+        so it is cached; the per-job tool executors live on the AgentExecutor.
+        """
+        keys = self.context.cache_keys
+        if not all(keys.get(name) for name in ("llm", "tools", "prompt")):
+            return create_tool_calling_agent(self.context.llm, self.context.tools, self.context.prompt_template)
+
+        agent_key = content_hash([keys["llm"], keys["tools"], keys["prompt"]])
+        return runnable_cache.get_or_create(
+            "agent",
+            agent_key,
+            lambda: create_tool_calling_agent(self.context.llm, self.context.tools, self.context.prompt_template),
+        )
+
+    def _direct_call(self) -> tuple | None:
+        """
+        Returns (adapter, spec, messages) when this plain chat job can call its provider
+        directly, skipping LangChain's message objects and callback machinery per token.
+        The prompt is still rendered by the job's template, so both paths send the same
+        conversation; anything the adapters can't express keeps the runnable path.
+        """
+        spec = self.context.direct_model
+        if not config.DIRECT_PROVIDER_ENABLED or spec is None or spec.provider not in DIRECT_ADAPTERS:
+            return None
+        messages = []
+        for message in self.context.prompt_template.format_messages(**self.context.final_input):
+            if message.type not in ("system", "human", "ai") or not isinstance(message.content, str):
+                return None
+            messages.append({"role": message.type, "content": message.content})
+        return DIRECT_ADAPTERS[spec.provider], spec, messages
+
+    async def run(self) -> str:
         """
         The main execution method. It assembles the final runnable,
         invokes it, and handles publishing the results and feedback.
+        Returns the final text ("" if the run failed and an error was published).
         """
         logger.info(f"[{self.job.id}] Starting final chain execution.")
         final_result = ""
 
         # 1. Determine the core runnable: an agent if tools exist, otherwise a simple chain.
+        runnable, direct = None, None
         if self.context.tools:
             logger.info(f"[{self.job.id}] Assembling AgentExecutor with {len(self.context.tools)} tools.")
-            agent = create_tool_calling_agent(self.context.llm, self.context.tools, self.context.prompt_template)
-            runnable = AgentExecutor(agent=agent, tools=self.context.tools, verbose=True)
-        else:
-            logger.info(f"[{self.job.id}] Assembling a simple LLM chain (no tools).")
-            runnable = self.context.prompt_template | self.context.llm
+            agent = self._get_agent()
+            if config.AGENT_CHECKPOINT_ENABLED:
+                runnable = CheckpointedAgentExecutor(
+                    agent=agent, tools=self.context.tools, verbose=True, job_id=self.job.id,
+                    checkpoint_store=agent_checkpoints, restored_steps=await agent_checkpoints.load(self.job.id),
+                )
+            else:
+                runnable = AgentExecutor(agent=agent, tools=self.context.tools, verbose=True)
 
         # 2. Add the pre-formatted chat history directly to the input payload.
         #    This makes the execution completely stateless.
         if self.context.memory:
             self.context.final_input["chat_history"] = self.context.memory
             logger.info(f"[{self.job.id}] Added {len(self.context.memory)} messages from history to the input.")
+
+        if not self.context.tools:
+            direct = self._direct_call()
+            if direct is not None:
+                logger.info(f"[{self.job.id}] Calling '{self.context.direct_model.provider}' directly (no tools).")
+            else:
+                logger.info(f"[{self.job.id}] Assembling a simple LLM chain (no tools).")
+                runnable = self.context.prompt_template | self.context.llm
+        EXECUTION_PATH_TOTAL.labels(path="agent" if self.context.tools else "direct" if direct else "runnable").inc()
         
         # 3. Execute the chain and handle the output.
-        if self.job.is_streaming:
-            final_result = await self._stream_and_publish(runnable, self.context.final_input)
-        else:
-            result = await runnable.ainvoke(self.context.final_input)
-            final_result = self._get_final_content(result)
-            logger.info(f"[{self.job.id}] FINAL BLOCKING RESPONSE:\n---\n{final_result}\n---")
-            await self.publisher.publish_final_result(self.job.id, final_result)
+        self._started = time.perf_counter()
+        try:
+            if self.job.is_streaming:
+                final_result = await self._stream_and_publish(runnable, self.context.final_input, direct)
+            else:
+                if direct is not None:
+                    adapter, spec, messages = direct
+                    async with provider_limiters.slot(self.context.provider_key):
+                        final_result = await adapter.complete(spec, messages)
+                else:
+                    result = await runnable.ainvoke(self.context.final_input, config=self.run_config)
+                    final_result = self._get_final_content(result)
+                logger.info(f"[{self.job.id}] FINAL BLOCKING RESPONSE:\n---\n{final_result}\n---")
+                await self.publisher.publish_final_result(self.job.id, final_result, self._result_metadata(), self._result_warnings())
+        finally:
+            await self.limiter_callback.release_all()
         
+        elapsed = time.perf_counter() - self._started
+        if final_result and elapsed > 0:
+            TOKENS_PER_SECOND.labels(provider=self.provider).observe(estimate_tokens(final_result) / elapsed)
+
         # 4. Trigger the memory feedback loop after the job is fully complete.
         await self.publisher.publish_memory_update(self.job, final_result, self.context.final_input) # new update 
+        return final_result
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """The text of a streamed message chunk (Gemini may send a list of content parts)."""
+        content = getattr(chunk, "content", None)
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return "".join(
+                part if isinstance(part, str) else part.get("text", "")
+                for part in content if isinstance(part, (str, dict))
+            )
+        return ""
 
-    async def _stream_and_publish(self, chain, input_data: dict) -> str:
+    async def _forward_token(self, stream_buffer: StreamChunkBuffer, text: str):
+        if not stream_buffer.has_output:
+            TIME_TO_FIRST_TOKEN_SECONDS.labels(provider=self.provider).observe(time.perf_counter() - self._started)
+        await stream_buffer.add(text)
+
+    async def _stream_agent_events(self, agent_executor, input_data: dict, stream_buffer: StreamChunkBuffer) -> str | None:
+        """
+        Streams an agent run at token level. `AgentExecutor.astream` only yields whole
+        steps, so nothing would reach the user until the agent loop ended; the event
+        stream instead exposes every LLM token of every step, plus tool boundaries,
+        which are sent as compact progress events. Returns the agent's final output.
+        """
+        final_output = None
+        # Structure: { tool_run_id: perf_counter() at start }
+        tool_started = {}
+        async for event in agent_executor.astream_events(input_data, config=self.run_config, version="v2"):
+            kind = event["event"]
+            if SUMMARY_RUN_TAG in event.get("tags", ()):
+                # A tool output being summarized inside a tool call, not part of the answer.
+                continue
+            if kind == "on_chat_model_stream":
+                text = self._chunk_text(event["data"].get("chunk"))
+                if text:
+                    await self._forward_token(stream_buffer, text)
+            elif kind == "on_tool_start":
+                tool_started[event["run_id"]] = time.perf_counter()
+                await stream_buffer.publish_event({"type": "tool", "event": "started", "tool": event["name"]})
+            elif kind in ("on_tool_end", "on_tool_error"):
+                started = tool_started.pop(event["run_id"], None)
+                await stream_buffer.publish_event({
+                    "type": "tool",
+                    "event": "finished" if kind == "on_tool_end" else "failed",
+                    "tool": event["name"],
+                    "duration_ms": round((time.perf_counter() - started) * 1000) if started else None,
+                })
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # The top-level AgentExecutor finished; its output is the final answer.
+                output = event["data"].get("output")
+                if isinstance(output, dict):
+                    final_output = output.get("output")
+        return final_output
+
+    async def _stream_and_publish(self, chain, input_data: dict, direct: tuple = None) -> str:
         """
         Handles streaming the output and publishing chunks. This is stateless.
+        Tokens are coalesced by a StreamChunkBuffer so a long answer produces a
+        handful of broker messages instead of one per token. `direct` is the
+        (adapter, spec, messages) of a direct provider call, used instead of `chain`.
         """
-        final_result = ""
         logger.info(f"[{self.job.id}] Executing in streaming mode.")
+        stream_buffer = StreamChunkBuffer(self.publisher, self.job.id)
         
         try:
-            async for chunk in chain.astream(input_data):
-                output_chunk = ""
-                if isinstance(chunk, dict):
-                    # AgentExecutor yields dicts. The content is in the 'messages' key for streaming.
-                    # We look for the content of the last AIMessageChunk.
-                    messages = chunk.get('messages', [])
-                    if messages and isinstance(messages[-1], AIMessageChunk):
-                        output_chunk = messages[-1].content
-                elif isinstance(chunk, AIMessageChunk):
+            if direct is not None:
+                adapter, spec, messages = direct
+                async with provider_limiters.slot(self.context.provider_key) as slot:
+                    async for text in adapter.stream(spec, messages):
+                        slot.first_token()
+                        await self._forward_token(stream_buffer, text)
+                final_result = await stream_buffer.close()
+            elif self.context.tools:
+                agent_output = await self._stream_agent_events(chain, input_data, stream_buffer)
+                streamed_text = await stream_buffer.close()
+                # The final result keeps the AgentExecutor contract (its 'output'); the streamed
+                # text can also contain what the model said before calling a tool.
+                final_result = agent_output if isinstance(agent_output, str) and agent_output else streamed_text
+            else:
+                async for chunk in chain.astream(input_data, config=self.run_config):
                     # Simple chains yield AIMessageChunk objects directly.
-                    output_chunk = chunk.content
-
-                if isinstance(output_chunk, str) and output_chunk:
-                    await self.publisher.publish_stream_chunk(self.job.id, output_chunk)
-                    final_result += output_chunk
+                    if isinstance(chunk, AIMessageChunk):
+                        output_chunk = self._chunk_text(chunk)
+                        if output_chunk:
+                            await self._forward_token(stream_buffer, output_chunk)
+                final_result = await stream_buffer.close()
+        except asyncio.CancelledError:
+            stream_buffer.discard()
+            raise
         except Exception as e:
+            stream_buffer.discard()
             logger.error(f"[{self.job.id}] An error occurred during streaming: {e}", exc_info=True)
             await self.publisher.publish_error_result(self.job.id, f"An error occurred during streaming: {e}")
             return ""
         
         logger.info(f"[{self.job.id}] FINAL STREAMED RESPONSE (concatenated):\n---\n{final_result}\n---")
-        await self.publisher.publish_final_result(self.job.id, final_result)
+        await self.publisher.publish_final_result(self.job.id, final_result, self._result_metadata(), self._result_warnings())
         
-        return final_result
\ No newline at end of file
+        return final_result
@@ -0,0 +1,118 @@
+# MS6/app/execution/fake_model.py
+
+import asyncio
+import json
+import random
+import time
+import zlib
+from typing import Any, AsyncIterator, Iterator
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Words the fake answers are made of; one word (plus a space) is one streamed token.
+VOCABULARY = (
+    "the model answers with deterministic synthetic text so that throughput and latency "
+    "can be measured without a paid provider or a local gpu every run produces the same output"
+).split()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    A deterministic chat model for load tests and local development (provider "fake").
+    It waits `ttft_ms` before the first token and then emits `output_tokens` tokens at
+    `tokens_per_second`. The text only depends on `seed` and the last human message.
+
+    `tool_call_script` makes it behave like a tool-calling model: entry N is the list of
+    tool calls ({"name": ..., "args": {...}}) returned on the N-th agent step. Once the
+    script is exhausted it returns its final text answer.
+    """
+    model_name: str = "fake"
+    ttft_ms: float = 200.0
+    tokens_per_second: float = 50.0
+    output_tokens: int = 100
+    tool_call_script: list = []
+    seed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "ttft_ms": self.ttft_ms, "tokens_per_second": self.tokens_per_second,
+                "output_tokens": self.output_tokens, "seed": self.seed}
+
+    def bind_tools(self, tools: list, **kwargs: Any):
+        # The tool schemas are only carried along (like a real provider call); the script decides the calls.
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _tool_calls_for(self, messages: list[BaseMessage]) -> list[dict] | None:
+        """Returns the scripted tool calls for this agent step, or None when it's time to answer."""
+        step = sum(1 for message in messages if isinstance(message, AIMessage) and message.tool_calls)
+        if step >= len(self.tool_call_script):
+            return None
+        return [
+            {"name": call["name"], "args": call.get("args", {}), "id": f"call_{step}_{index}"}
+            for index, call in enumerate(self.tool_call_script[step])
+        ]
+
+    def _tokens_for(self, messages: list[BaseMessage]) -> list[str]:
+        prompt = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        rng = random.Random(self.seed * 1_000_003 + zlib.crc32(prompt.encode()))
+        return [rng.choice(VOCABULARY) + " " for _ in range(self.output_tokens)]
+
+    def _token_due(self, started: float, index: int) -> float:
+        """Monotonic time at which token `index` is due (token 0 arrives after the TTFT)."""
+        rate = self.tokens_per_second if self.tokens_per_second > 0 else float("inf")
+        return started + self.ttft_ms / 1000.0 + index / rate
+
+    def _result(self, messages: list[BaseMessage]) -> ChatResult:
+        tool_calls = self._tool_calls_for(messages)
+        if tool_calls is not None:
+            message = AIMessage(content="", tool_calls=tool_calls)
+        else:
+            message = AIMessage(content="".join(self._tokens_for(messages)).rstrip())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _duration(self, messages: list[BaseMessage]) -> float:
+        tokens = 0 if self._tool_calls_for(messages) is not None else self.output_tokens
+        return max(0.0, self._token_due(0.0, max(tokens - 1, 0)))
+
+    def _generate(self, messages: list[BaseMessage], stop: list[str] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._duration(messages))
+        return self._result(messages)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: list[str] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._duration(messages))
+        return self._result(messages)
+
+    def _tool_call_chunk(self, tool_calls: list[dict]) -> ChatGenerationChunk:
+        return ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+            for index, call in enumerate(tool_calls)
+        ]))
+
+    def _stream(self, messages: list[BaseMessage], stop: list[str] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        started = time.monotonic()
+        tool_calls = self._tool_calls_for(messages)
+        if tool_calls is not None:
+            time.sleep(self.ttft_ms / 1000.0)
+            yield self._tool_call_chunk(tool_calls)
+            return
+        for index, token in enumerate(self._tokens_for(messages)):
+            time.sleep(max(0.0, self._token_due(started, index) - time.monotonic()))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: list[BaseMessage], stop: list[str] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        started = time.monotonic()
+        tool_calls = self._tool_calls_for(messages)
+        if tool_calls is not None:
+            await asyncio.sleep(self.ttft_ms / 1000.0)
+            yield self._tool_call_chunk(tool_calls)
+            return
+        for index, token in enumerate(self._tokens_for(messages)):
+            # Sleeping until each token's due time (rather than a fixed interval) avoids drift under load.
+            await asyncio.sleep(max(0.0, self._token_due(started, index) - time.monotonic()))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
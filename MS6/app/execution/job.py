@@ -1,12 +1,28 @@
+import asyncio
 import uuid
+from app.internals.claim_check import claim_check_store, is_reference
+
+
+class InvalidJobError(ValueError):
+    """
+    The job can't run as it was sent (malformed payload, unusable model configuration,
+    missing resources): every attempt would fail the same way, so it is not retried.
+    """
+
+
 class Job:
-    """A data class providing a clean, validated, and DEFENSIVE interface to the raw job payload."""
+    """
+    A data class providing a clean, validated, and DEFENSIVE interface to the raw job payload.
+    Large resource sections may arrive as claim-check references; they are only fetched
+    when a builder first needs them (see `resolve`).
+    """
     def __init__(self, payload: dict):
         if not isinstance(payload, dict):
-            raise TypeError("Job payload must be a dictionary.")
+            raise InvalidJobError("Job payload must be a dictionary.")
         
         self.id = payload.get("job_id", str(uuid.uuid4()))
         self.user_id = payload.get("user_id")
+        self.timestamp = payload.get("timestamp") # ISO-8601 (UTC) time MS5 published the job
         self.query = payload.get("query", {})
         self.prompt_text = self.query.get("prompt", "")
         self.inputs = self.query.get("inputs", [])
@@ -15,17 +31,46 @@ class Job:
         self.output_config = self.query.get("output_config", {})
         self.is_streaming = self.output_config.get("mode") == "streaming"
         self.persist_inputs_in_memory = self.output_config.get("persist_inputs_in_memory", False)
+        # "standard" or "map_reduce" (for files larger than the context window); None = the service default.
+        self.execution_strategy = self.output_config.get("execution_strategy")
 
         # --- THE DEFENSIVE FIX IS HERE ---
         # Get the resources dictionary, defaulting to an empty dict if it's missing or None.
         self.resources = payload.get("resources") or {}
         # --- END OF FIX ---
-        
+        # time.monotonic() at which a user cancellation of this job was received (None = not cancelled).
+        self.cancel_requested_at = None
+        # Structure: { "section_name": asyncio.Task fetching the offloaded section }
+        self._resolving = {}
+        self._load_resources()
+
+    def _load_resources(self):
+        """(Re)derives the resource attributes from `self.resources`."""
         self.model_config = self.resources.get("model_config", {})
         self.tool_definitions = self.resources.get("tools")
         self.rag_docs = (self.resources.get("rag_context") or {}).get("documents", [])
         self.memory_context = self.resources.get("memory_context") or {}
     
+    async def resolve(self, *sections: str):
+        """
+        Replaces claim-check references for `sections` with their content from Redis.
+        Concurrent callers for the same section share one fetch.
+        """
+        pending = []
+        for name in sections:
+            if not is_reference(self.resources.get(name)):
+                continue
+            if name not in self._resolving:
+                self._resolving[name] = asyncio.create_task(claim_check_store.fetch(self.resources[name]))
+            pending.append(name)
+        if not pending:
+            return
+
+        values = await asyncio.gather(*(self._resolving[name] for name in pending))
+        for name, value in zip(pending, values):
+            self.resources[name] = value
+        self._load_resources()
+
     @property
     def feedback_ids(self):
         return {
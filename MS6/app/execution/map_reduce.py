@@ -0,0 +1,250 @@
+# MS6/app/execution/map_reduce.py
+
+import asyncio
+import time
+from langchain_core.messages import AIMessageChunk, HumanMessage, SystemMessage
+from app import config
+from app.logging_config import logger
+from app.execution.build_context import BuildContext
+from app.execution.builders.prompt_builder import SYSTEM_PROMPT
+from app.execution.concurrency import provider_limiters
+from app.execution.job import InvalidJobError
+from app.execution.context_packer import PackItem, estimate_tokens, packing_warnings, relevance_policy, resolve_context_window
+from app.messaging.publisher import ResultPublisher
+from app.messaging.stream_buffer import StreamChunkBuffer
+from app.metrics import TIME_TO_FIRST_TOKEN_SECONDS
+
+MAP_INSTRUCTION = (
+    "Below is part {index} of {total} of the document '{name}'.\n\n{chunk}\n\n"
+    "Using only this part, write down everything that helps to answer the request below: "
+    "facts, figures, quotes and where they appear. If this part contains nothing relevant, "
+    "reply with exactly {nothing}.\n\nRequest: {question}"
+)
+REDUCE_INSTRUCTION = (
+    "The notes below were extracted from different parts of the provided documents.\n\n{notes}\n\n"
+    "Combine them into one set of notes for the request below. Keep every relevant fact, "
+    "merge duplicates and resolve contradictions where you can.\n\nRequest: {question}"
+)
+FINAL_INSTRUCTION = (
+    "{knowledge_base}The notes below were extracted from the provided documents, which were too long to read at once.\n\n"
+    "{notes}\n\nBased on the context above, please respond to the following:\n\n{question}"
+)
+NOTHING_RELEVANT = "NO RELEVANT INFORMATION"
+NOTES_SEPARATOR = "\n\n---\n\n"
+
+
+def split_text(text: str, chunk_chars: int, overlap_chars: int) -> list[str]:
+    """
+    Splits `text` into chunks of at most `chunk_chars`, preferring to cut at a paragraph,
+    line or sentence end in the second half of the window. Consecutive chunks overlap by
+    about `overlap_chars` so a fact straddling a cut is seen whole at least once.
+    """
+    chunks, start = [], 0
+    overlap_chars = min(overlap_chars, chunk_chars // 4)
+    while start < len(text):
+        end = min(len(text), start + chunk_chars)
+        if end < len(text):
+            for separator in ("\n\n", "\n", ". "):
+                cut = text.rfind(separator, start + chunk_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunks.append(text[start:end])
+        if end >= len(text):
+            break
+        start = max(end - overlap_chars, start + 1)
+    return chunks
+
+
+class MapReduceExecutor:
+    """
+    Answers a job whose files don't fit the model's context window (opt-in with
+    `output_config.execution_strategy = "map_reduce"`). Instead of truncating them, the
+    files are split into window-sized chunks and the prompt is run over every chunk
+    concurrently ("map"), each call holding its own provider limiter slot. The partial
+    answers are then merged group by group until they fit one prompt ("reduce"), and
+    that last call produces the answer, streamed like any other job. Progress events
+    are published between the stages for streaming jobs.
+    """
+    def __init__(self, context: BuildContext, publisher: ResultPublisher):
+        self.context = context
+        self.job = context.job
+        self.publisher = publisher
+        self.provider = (context.provider_key or ("unknown",))[0]
+        self.question = self.job.prompt_text
+        context_window, reserved_output = resolve_context_window(self.job)
+        # What one map or reduce prompt may use for document text or notes.
+        self.budget = (context_window - reserved_output - estimate_tokens(SYSTEM_PROMPT)
+                       - estimate_tokens(self.question) - estimate_tokens(MAP_INSTRUCTION)
+                       - config.CONTEXT_TEMPLATE_OVERHEAD_TOKENS)
+        if config.MAP_REDUCE_CHUNK_TOKENS > 0:
+            self.budget = min(self.budget, config.MAP_REDUCE_CHUNK_TOKENS)
+        self._call_slots = asyncio.Semaphore(config.MAP_REDUCE_MAX_CONCURRENCY)
+        self._stream_buffer = StreamChunkBuffer(publisher, self.job.id) if self.job.is_streaming else None
+
+    @staticmethod
+    def applies(context: BuildContext) -> bool:
+        """True for opted-in jobs whose file content had to be cut to fit (and that don't use tools)."""
+        strategy = context.job.execution_strategy or config.DEFAULT_EXECUTION_STRATEGY
+        if strategy != "map_reduce" or context.tools:
+            return False
+        report = context.packing_report or {}
+        return any(entry["source"] == "files" for entry in report.get("truncated", []) + report.get("dropped", []))
+
+    def _documents(self) -> list[tuple[str, str]]:
+        """(name, text) of every text file of the job, in full."""
+        return [
+            (f"file {index + 1}", data["content"])
+            for index, data in enumerate(self.context.on_the_fly_data)
+            if data.get("type") == "text_content" and isinstance(data.get("content"), str) and data["content"]
+        ]
+
+    async def _progress(self, stage: str, completed: int, total: int):
+        if self._stream_buffer is not None:
+            await self._stream_buffer.publish_event(
+                {"type": "progress", "stage": stage, "completed": completed, "total": total}
+            )
+
+    async def _call(self, prompt: str) -> str:
+        """One map or reduce call, within the job's fan-out limit and a provider limiter slot."""
+        messages = [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=prompt)]
+        async with self._call_slots:
+            async with provider_limiters.slot(self.context.provider_key):
+                result = await self.context.llm.ainvoke(messages)
+        return result.content if isinstance(result.content, str) else str(result.content)
+
+    async def _run_all(self, stage: str, prompts: list[str]) -> list[str]:
+        """Runs `prompts` concurrently, reporting progress; the first failure cancels the rest."""
+        completed = 0
+
+        async def run(prompt: str) -> str:
+            nonlocal completed
+            answer = await self._call(prompt)
+            completed += 1
+            await self._progress(stage, completed, len(prompts))
+            return answer
+
+        tasks = [asyncio.create_task(run(prompt)) for prompt in prompts]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _map(self) -> tuple[list[str], int]:
+        chunk_chars = int(self.budget * config.CONTEXT_CHARS_PER_TOKEN)
+        overlap_chars = int(config.MAP_REDUCE_CHUNK_OVERLAP_TOKENS * config.CONTEXT_CHARS_PER_TOKEN)
+        prompts = []
+        for name, text in self._documents():
+            chunks = split_text(text, chunk_chars, overlap_chars)
+            prompts += [
+                MAP_INSTRUCTION.format(index=i + 1, total=len(chunks), name=name, chunk=chunk,
+                                       nothing=NOTHING_RELEVANT, question=self.question)
+                for i, chunk in enumerate(chunks)
+            ]
+        if len(prompts) > config.MAP_REDUCE_MAX_CHUNKS:
+            raise InvalidJobError(f"The documents split into {len(prompts)} chunks, more than MAP_REDUCE_MAX_CHUNKS "
+                             f"({config.MAP_REDUCE_MAX_CHUNKS}).")
+        logger.info(f"[{self.job.id}] Map-reduce: mapping {len(prompts)} chunk(s) of up to {self.budget} tokens.")
+        notes = await self._run_all("map", prompts)
+        return [note for note in notes if not note.strip().upper().startswith(NOTHING_RELEVANT)], len(prompts)
+
+    def _group(self, notes: list[str]) -> list[list[str]]:
+        """
+        Packs consecutive notes into groups that fit one prompt. A group always takes at
+        least two notes, so every level shrinks the count even when single notes are long
+        (a note is one model answer, so two of them stay well within the window).
+        """
+        groups, current, used = [], [], 0
+        for note in notes:
+            tokens = estimate_tokens(note) + estimate_tokens(NOTES_SEPARATOR)
+            if len(current) >= 2 and used + tokens > self.budget:
+                groups.append(current)
+                current, used = [], 0
+            current.append(note)
+            used += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _reduce(self, notes: list[str]) -> tuple[list[str], int]:
+        """Merges notes level by level until they fit a single prompt. Returns (notes, levels)."""
+        levels = 0
+        while len(groups := self._group(notes)) > 1:
+            levels += 1
+            if levels > config.MAP_REDUCE_MAX_REDUCE_LEVELS:
+                raise ValueError(f"The notes didn't converge after {config.MAP_REDUCE_MAX_REDUCE_LEVELS} reduce levels.")
+            logger.info(f"[{self.job.id}] Map-reduce: reduce level {levels}, {len(notes)} note(s) in {len(groups)} group(s).")
+            notes = await self._run_all(f"reduce_{levels}", [
+                REDUCE_INSTRUCTION.format(notes=NOTES_SEPARATOR.join(group), question=self.question)
+                for group in groups
+            ])
+        return notes, levels
+
+    def _knowledge_base(self, notes_text: str) -> str:
+        """The job's RAG documents that fit next to the notes, most relevant first (as PromptBuilder formats them)."""
+        items = [PackItem("rag", str(doc.get("id", i)), str(doc.get("content"))) for i, doc in enumerate(self.job.rag_docs)]
+        budget = self.budget - estimate_tokens(notes_text)
+        kept = relevance_policy(items, budget, self.question) if items and budget > 0 else []
+        if not kept:
+            return ""
+        return "--- Context from Knowledge Base ---\n" + "".join(f"Content: {item.text}\n\n" for item in kept)
+
+    async def _answer(self, notes: list[str], started: float) -> str:
+        """The final call: the job's own prompt template (so chat history still applies) over the notes."""
+        notes_text = NOTES_SEPARATOR.join(notes) or f"({NOTHING_RELEVANT} was found in the documents.)"
+        final_input = {
+            **self.context.final_input,
+            "input": FINAL_INSTRUCTION.format(
+                knowledge_base=self._knowledge_base(notes_text), notes=notes_text, question=self.question,
+            ),
+        }
+        if self.context.memory:
+            final_input["chat_history"] = self.context.memory
+        messages = self.context.prompt_template.format_messages(**final_input)
+
+        async with provider_limiters.slot(self.context.provider_key):
+            if self._stream_buffer is None:
+                result = await self.context.llm.ainvoke(messages)
+                return result.content if isinstance(result.content, str) else str(result.content)
+            async for chunk in self.context.llm.astream(messages):
+                if isinstance(chunk, AIMessageChunk) and isinstance(chunk.content, str) and chunk.content:
+                    if not self._stream_buffer.has_output:
+                        TIME_TO_FIRST_TOKEN_SECONDS.labels(provider=self.provider).observe(time.perf_counter() - started)
+                    await self._stream_buffer.add(chunk.content)
+            return await self._stream_buffer.close()
+
+    async def run(self) -> str:
+        logger.info(f"[{self.job.id}] Files exceed the context window; running the map-reduce strategy.")
+        if self.budget < config.MAP_REDUCE_MIN_CHUNK_TOKENS:
+            raise InvalidJobError(f"The model's context window leaves only {self.budget} tokens per chunk; "
+                             f"map-reduce needs at least {config.MAP_REDUCE_MIN_CHUNK_TOKENS}.")
+        started = time.perf_counter()
+        try:
+            notes, chunk_count = await self._map()
+            map_seconds, relevant_chunks = time.perf_counter() - started, len(notes)
+            notes, levels = await self._reduce(notes)
+            await self._progress("answer", 0, 1)
+            final_result = await self._answer(notes, started)
+        except BaseException:
+            if self._stream_buffer is not None:
+                self._stream_buffer.discard()
+            raise
+
+        metadata = {"map_reduce": {
+            "chunks": chunk_count,
+            "relevant_chunks": relevant_chunks,
+            "reduce_levels": levels,
+            "chunk_budget_tokens": self.budget,
+            "map_seconds": round(map_seconds, 3),
+            "total_seconds": round(time.perf_counter() - started, 3),
+        }}
+        if self.context.packing_report:
+            metadata["context_packing"] = self.context.packing_report
+        # The files were read in full; only cut history or RAG documents are worth a warning.
+        warnings = packing_warnings(self.context.packing_report, ignore_sources=("files",))
+        await self.publisher.publish_final_result(self.job.id, final_result, metadata, warnings)
+        await self.publisher.publish_memory_update(self.job, final_result, self.context.final_input)
+        return final_result
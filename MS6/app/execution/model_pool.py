@@ -0,0 +1,68 @@
+# MS6/app/execution/model_pool.py
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Callable
+from langchain_core.language_models import BaseChatModel
+from app import config
+from app.logging_config import logger
+
+
+class ChatModelPool:
+    """
+    A bounded LRU pool of ready-to-use chat model clients.
+    Building a provider client is not free: it creates HTTP connection pools and
+    validates the whole pydantic model. Jobs that target the same model with the
+    same credentials and base parameters share one client instead.
+    """
+    def __init__(self, max_size: int = 32, idle_ttl_seconds: float = 600.0):
+        self.max_size = max_size
+        self.idle_ttl_seconds = idle_ttl_seconds
+        # Structure: { key: {"client": BaseChatModel, "last_used": float} }
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def make_key(provider: str, model_name: str, base_url: str = None, api_key: str = None, params: dict = None) -> str:
+        """
+        Builds the pool key. The API key is only ever stored as a hash, and the
+        parameters are normalized so that dict ordering doesn't create duplicates.
+        """
+        api_key_hash = hashlib.sha256(api_key.encode()).hexdigest() if api_key else ""
+        normalized_params = json.dumps(params or {}, sort_keys=True, default=str)
+        return "|".join([provider or "", model_name or "", base_url or "", api_key_hash, normalized_params])
+
+    def _evict_idle(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry["last_used"] > self.idle_ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            logger.info(f"Evicted {len(expired)} idle chat model client(s) from the pool.")
+
+    def get_or_create(self, key: str, factory: Callable[[], BaseChatModel]) -> BaseChatModel:
+        """Returns the pooled client for `key`, building it with `factory` on a miss."""
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["last_used"] = now
+            self._entries.move_to_end(key)
+            return entry["client"]
+
+        client = factory()
+        self._entries[key] = {"client": client, "last_used": now}
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return client
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# A single, process-wide pool shared by every ModelBuilder.
+chat_model_pool = ChatModelPool(
+    max_size=config.LLM_POOL_MAX_SIZE,
+    idle_ttl_seconds=config.LLM_POOL_IDLE_TTL_SECONDS,
+)
@@ -0,0 +1,181 @@
+# MS6/app/execution/ollama_models.py
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+import httpx
+import redis.asyncio as redis
+from langchain_core.callbacks import BaseCallbackHandler
+from app import config
+from app.logging_config import logger
+from app.execution.context_packer import resolve_context_window
+from app.execution.job import Job
+from app.metrics import OLLAMA_COLD_STARTS_TOTAL, OLLAMA_LOAD_SECONDS, OLLAMA_PRELOADS_TOTAL, model_label
+
+# Redis hash shared by every MS6 process. Structure: { json([base_url, model]): json(HotModel fields) }
+USAGE_KEY = "ollama:model_usage"
+# A model's usage is written to Redis at most this often per process.
+USAGE_WRITE_INTERVAL_SECONDS = 60.0
+
+
+@dataclass
+class HotModel:
+    """A model recently used on an Ollama server, with the settings its runner was loaded with."""
+    base_url: str
+    model: str
+    num_ctx: int = None
+    keep_alive: str | int = None
+    last_used: float = 0.0
+
+
+class OllamaModelManager:
+    """
+    Keeps the Ollama models MS6 uses loaded. Ollama unloads a model after `keep_alive`
+    of inactivity and reloads its runner whenever a request asks for a different
+    `num_ctx`, and either way the next request waits seconds for the load. So:
+    - every request carries the same `num_ctx` for a model (the context window the
+      packer assumes for the job) and a generous `keep_alive`,
+    - the models used recently on each server are recorded in Redis and loaded
+      again, with those same settings, when a worker starts,
+    - load times Ollama reports are turned into cold-start metrics.
+    """
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._redis = None
+        # Structure: { (base_url, model): time.time() of the last write to Redis }
+        self._written = {}
+
+    def _client(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    @staticmethod
+    def residency_params(job: Job, params: dict) -> dict:
+        """The `num_ctx` and `keep_alive` to add to an Ollama job's parameters (ones it sets itself are kept)."""
+        added = {}
+        if "num_ctx" not in params:
+            added["num_ctx"] = resolve_context_window(job)[0]
+        if "keep_alive" not in params and config.OLLAMA_KEEP_ALIVE:
+            added["keep_alive"] = config.OLLAMA_KEEP_ALIVE
+        return added
+
+    async def record_use(self, base_url: str, model: str, params: dict):
+        """Remembers that `model` is in use on `base_url` (throttled; best effort)."""
+        now = time.time()
+        if now - self._written.get((base_url, model), 0.0) < USAGE_WRITE_INTERVAL_SECONDS:
+            return
+        self._written[(base_url, model)] = now
+        entry = {"num_ctx": params.get("num_ctx"), "keep_alive": params.get("keep_alive"), "last_used": now}
+        try:
+            await self._client().hset(USAGE_KEY, json.dumps([base_url, model]), json.dumps(entry))
+        except Exception as e:
+            logger.warning(f"Could not record the use of Ollama model '{model}' on '{base_url}': {e}")
+
+    async def hot_models(self) -> list[HotModel]:
+        """
+        The models used within OLLAMA_HOT_MODEL_WINDOW_SECONDS, most recent first, at most
+        OLLAMA_PRELOAD_MAX_MODELS per server. Older entries are removed from Redis.
+        """
+        entries = await self._client().hgetall(USAGE_KEY)
+        cutoff = time.time() - config.OLLAMA_HOT_MODEL_WINDOW_SECONDS
+        models, stale = [], []
+        for field_name, value in entries.items():
+            base_url, model = json.loads(field_name)
+            hot = HotModel(base_url, model, **json.loads(value))
+            if hot.last_used < cutoff:
+                stale.append(field_name)
+            else:
+                models.append(hot)
+        if stale:
+            await self._client().hdel(USAGE_KEY, *stale)
+
+        models.sort(key=lambda hot: hot.last_used, reverse=True)
+        per_server = {}
+        for hot in models:
+            per_server.setdefault(hot.base_url, [])
+            if len(per_server[hot.base_url]) < config.OLLAMA_PRELOAD_MAX_MODELS:
+                per_server[hot.base_url].append(hot)
+        return [hot for server_models in per_server.values() for hot in server_models]
+
+    async def preload(self, models: list[HotModel]):
+        """
+        Loads `models` with an empty /api/generate request, the documented way to load
+        a model without generating. Models of one server load one after another (they
+        compete for its memory); different servers load concurrently.
+        """
+        per_server = {}
+        for hot in models:
+            per_server.setdefault(hot.base_url, []).append(hot)
+
+        timeout = httpx.Timeout(config.DIRECT_HTTP_READ_TIMEOUT_SECONDS, connect=config.DIRECT_HTTP_CONNECT_TIMEOUT_SECONDS)
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            async def load_all(server_models: list[HotModel]):
+                for hot in server_models:
+                    await self._preload_one(client, hot)
+            await asyncio.gather(*(load_all(server_models) for server_models in per_server.values()))
+
+    async def _preload_one(self, client: httpx.AsyncClient, hot: HotModel):
+        payload = {"model": hot.model, "keep_alive": hot.keep_alive or config.OLLAMA_KEEP_ALIVE or None}
+        if hot.num_ctx:
+            payload["options"] = {"num_ctx": hot.num_ctx}
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{hot.base_url.rstrip('/')}/api/generate", json=payload)
+            response.raise_for_status()
+            load_seconds = (response.json().get("load_duration") or 0) / 1e9
+        except Exception as e:
+            OLLAMA_PRELOADS_TOTAL.labels(outcome="error").inc()
+            logger.warning(f"Could not preload Ollama model '{hot.model}' on '{hot.base_url}': {e}")
+            return
+        OLLAMA_PRELOADS_TOTAL.labels(outcome="loaded").inc()
+        OLLAMA_LOAD_SECONDS.labels(trigger="preload").observe(load_seconds)
+        logger.info(f"Preloaded Ollama model '{hot.model}' on '{hot.base_url}' (num_ctx={hot.num_ctx}) "
+                    f"in {time.perf_counter() - started:.2f}s.")
+
+    async def preload_hot_models(self):
+        """Run once at worker startup, in the background: jobs don't wait for it."""
+        if not config.OLLAMA_PRELOAD_ENABLED:
+            return
+        try:
+            models = await self.hot_models()
+        except Exception as e:
+            logger.warning(f"Could not read recently used Ollama models; nothing preloaded: {e}")
+            return
+        if models:
+            logger.info(f"Preloading {len(models)} recently used Ollama model(s).")
+            await self.preload(models)
+
+    @staticmethod
+    def observe_load(model: str, load_duration_ns) -> bool:
+        """
+        Records the `load_duration` Ollama reported for a job's request. Returns True (a cold
+        start) when the request waited for the model to load rather than finding it resident.
+        """
+        if not load_duration_ns:
+            return False
+        load_seconds = load_duration_ns / 1e9
+        if load_seconds < config.OLLAMA_COLD_START_THRESHOLD_SECONDS:
+            return False
+        OLLAMA_COLD_STARTS_TOTAL.labels(model=model_label(model)).inc()
+        OLLAMA_LOAD_SECONDS.labels(trigger="job").observe(load_seconds)
+        logger.info(f"Ollama model '{model}' was loaded for this request ({load_seconds:.2f}s cold start).")
+        return True
+
+
+class OllamaLoadObserver(BaseCallbackHandler):
+    """Passes the load time Ollama reports at the end of each ChatOllama call to `observe_load`."""
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                OllamaModelManager.observe_load(self.model, (generation.generation_info or {}).get("load_duration"))
+
+
+# A single, process-wide manager shared by the ModelBuilder, the direct path and the worker.
+ollama_models = OllamaModelManager(config.REDIS_URL)
@@ -1,15 +1,23 @@
+import asyncio
+import time
 from app.execution.build_context import BuildContext
 from app.execution.builders.data_builder import DataBuilder
 from app.execution.builders.model_builder import ModelBuilder
 from app.execution.builders.memory_builder import MemoryBuilder
 from app.execution.builders.tool_builder import ToolBuilder
 from app.execution.builders.prompt_builder import PromptBuilder
+from app.logging_config import logger
+from app.metrics import BUILDER_STAGE_SECONDS
 
 class ChainConstructionPipeline:
-    """Orchestrates the step-by-step construction of a runnable LangChain chain."""
+    """
+    Orchestrates the construction of a runnable LangChain chain.
+    Builders are scheduled as a small DAG: each one starts as soon as every field
+    it `requires` has been provided, so independent stages (e.g. MS10 file fetches,
+    tool construction and history formatting) overlap.
+    """
     def __init__(self, context: BuildContext):
         self.context = context
-        # The order of builders is critical
         self.pipeline = [
             DataBuilder(),
             ModelBuilder(),
@@ -17,8 +25,40 @@ class ChainConstructionPipeline:
             ToolBuilder(), # Now included
             PromptBuilder(),
         ]
+        self._validate()
 
-    async def run(self) -> BuildContext:
+    def _validate(self):
+        """Fails fast if a builder requires a field that no other builder provides."""
+        provided = {name for builder in self.pipeline for name in builder.provides}
         for builder in self.pipeline:
-            self.context = await builder.build(self.context)
-        return self.context
\ No newline at end of file
+            missing = set(builder.requires) - provided
+            if missing:
+                raise ValueError(f"{type(builder).__name__} requires {sorted(missing)}, which no builder provides.")
+
+    async def _run_stage(self, builder, ready_events: dict):
+        for name in builder.requires:
+            await ready_events[name].wait()
+
+        started = time.perf_counter()
+        self.context = await builder.build(self.context)
+        elapsed = time.perf_counter() - started
+        self.context.stage_timings[type(builder).__name__] = elapsed
+        BUILDER_STAGE_SECONDS.labels(stage=type(builder).__name__).observe(elapsed)
+
+        for name in builder.provides:
+            ready_events[name].set()
+
+    async def run(self) -> BuildContext:
+        ready_events = {name: asyncio.Event() for builder in self.pipeline for name in builder.provides}
+        tasks = [asyncio.create_task(self._run_stage(builder, ready_events)) for builder in self.pipeline]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # One stage failed (or the job was cancelled): don't leave the others running.
+            for task in tasks:
+                task.cancel()
+            raise
+
+        timings = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.context.stage_timings.items())
+        logger.info(f"[{self.context.job.id}] Chain construction stage timings: {timings}")
+        return self.context
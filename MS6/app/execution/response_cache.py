@@ -0,0 +1,139 @@
+# MS6/app/execution/response_cache.py
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+import redis.asyncio as redis
+from app import config
+from app.logging_config import logger
+from app.execution.job import Job
+from app.execution.runnable_cache import content_hash
+
+
+class ResponseCache:
+    """
+    An opt-in, exact-match cache for deterministic inference jobs, backed by Redis.
+    Only jobs that are stateless repeats are eligible: temperature 0, no memory,
+    no tools. Identical eligible jobs running at the same time in this process
+    share one execution; the result is then fanned out to every job_id.
+    """
+    KEY_PREFIX = "ms6:response_cache:"
+    INDEX_KEY = "ms6:response_cache:index"
+
+    def __init__(self, redis_url: str, ttl_seconds: int, max_entries: int, max_entry_bytes: int):
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self._redis = None
+        # Structure: { cache_key: asyncio.Future resolved with the leader's result }
+        self._in_flight = {}
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def _client(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def key_for(self, job: Job) -> str | None:
+        """Returns the canonical cache key for `job`, or None if the job isn't eligible."""
+        if not config.RESPONSE_CACHE_ENABLED:
+            return None
+        params = {**job.default_params, **job.param_overrides}
+        try:
+            deterministic = float(params.get("temperature", 1)) == 0
+        except (TypeError, ValueError):
+            deterministic = False
+        if not deterministic or job.tool_definitions or job.memory_context.get("history") or job.feedback_ids.get("memory_bucket_id"):
+            return None
+
+        return self.KEY_PREFIX + content_hash({
+            "model_config": job.model_config,
+            "parameters": params,
+            "prompt": job.prompt_text,
+            "inputs": job.inputs,
+            "rag_docs": job.rag_docs,
+        })
+
+    async def get(self, key: str) -> str | None:
+        try:
+            return await self._client().get(key)
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Response cache lookup failed, continuing without cache: {e}")
+            return None
+
+    async def set(self, key: str, value: str):
+        if len(value.encode()) > self.max_entry_bytes:
+            return
+        try:
+            client = self._client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(key, value, ex=self.ttl_seconds)
+                pipe.zadd(self.INDEX_KEY, {key: time.time()})
+                pipe.zcard(self.INDEX_KEY)
+                *_, size = await pipe.execute()
+            if size > self.max_entries:
+                # Enforce the size cap by evicting the oldest entries.
+                evicted = await client.zpopmin(self.INDEX_KEY, size - self.max_entries)
+                if evicted:
+                    await client.delete(*[member for member, _ in evicted])
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Response cache store failed: {e}")
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[str]]) -> tuple[str, str]:
+        """
+        Returns (result, source) where source is "hit", "coalesced" or "miss".
+        On a miss this coroutine becomes the leader and runs `compute`; concurrent
+        callers with the same key wait for its result instead of running their own.
+        If the leader fails, waiting callers fall back to computing for themselves.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            self.counters["hits"] += 1
+            return cached, "hit"
+
+        leader = self._in_flight.get(key)
+        if leader is not None:
+            try:
+                result = await asyncio.shield(leader)
+                self.counters["coalesced"] += 1
+                return result, "coalesced"
+            except Exception:
+                logger.info("Shared execution failed; running this job independently.")
+                self.counters["misses"] += 1
+                return await compute(), "miss"
+
+        self.counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute()
+        except BaseException as e:
+            future.set_exception(RuntimeError(f"Shared execution failed: {type(e).__name__}"))
+            # Mark the exception as retrieved in case nobody was waiting on it.
+            future.exception()
+            self._in_flight.pop(key, None)
+            raise
+
+        if result:
+            future.set_result(result)
+            await self.set(key, result)
+        else:
+            # An empty result means the job failed and already reported it; don't share or cache it.
+            future.set_exception(RuntimeError("Execution produced no result to share."))
+            future.exception()
+        self._in_flight.pop(key, None)
+        return result, "miss"
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._in_flight)}
+
+
+response_cache = ResponseCache(
+    redis_url=config.REDIS_URL,
+    ttl_seconds=config.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    max_entry_bytes=config.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+)
@@ -0,0 +1,47 @@
+# MS6/app/execution/runnable_cache.py
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable
+from app import config
+
+
+def content_hash(value: Any) -> str:
+    """A stable SHA-256 of any JSON-serializable value (dict ordering is ignored)."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RunnableCache:
+    """
+    A small LRU cache for the "static" half of a chain: tool argument schemas,
+    StructuredTool shells, prompt templates and agent graphs. Everything stored
+    here must be job-independent; per-job values (job_id, inputs, history) are
+    bound at run time by the builders and the Executor.
+    """
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, namespace: str, key: str, factory: Callable[[], Any]) -> Any:
+        cache_key = (namespace, key)
+        if cache_key in self._entries:
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return self._entries[cache_key]
+
+        self.misses += 1
+        value = factory()
+        self._entries[cache_key] = value
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# A single, process-wide cache shared by the builders and the Executor.
+runnable_cache = RunnableCache(max_size=config.RUNNABLE_CACHE_MAX_SIZE)
@@ -0,0 +1,203 @@
+# MS6/app/execution/tool_output.py
+
+import math
+import uuid
+from dataclasses import dataclass
+import redis.asyncio as redis
+import zstandard
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+from app import config
+from app.logging_config import logger
+from app.execution.context_packer import estimate_tokens
+from app.metrics import TOOL_OUTPUT_OVERSIZED_TOTAL, tool_label
+
+# The job-local tool the agent uses to page through a stored oversized output.
+PAGER_TOOL_NAME = "read_tool_output"
+ARTIFACT_KEY = "job:tool_output:{job_id}:{artifact_id}"
+STRATEGIES = ("truncate", "summarize")
+# Tags the summarizer's model calls, whose tokens must not be streamed as part of the answer.
+SUMMARY_RUN_TAG = "tool_output_summary"
+
+SUMMARY_INSTRUCTION = (
+    "The tool '{tool}' returned the output below{partial}. Summarize it for an assistant working on this "
+    "request: {question}\n\nKeep every fact, figure, identifier, path and error message that may matter "
+    "for the request, and use at most about {words} words.\n\n--- Tool output ---\n{output}"
+)
+
+
+@dataclass
+class OutputBudget:
+    """How much of a tool's output may enter the agent scratchpad, and how to shrink the rest."""
+    max_tokens: int
+    strategy: str = "truncate"
+
+    @classmethod
+    def from_definition(cls, definition: dict) -> "OutputBudget":
+        """
+        Reads the optional `output_budget` block of a tool definition, e.g.
+        {"max_tokens": 1500, "strategy": "summarize"}; missing values use the service defaults.
+        A max_tokens of 0 lets the tool's output through unchanged.
+        """
+        declared = definition.get("output_budget") or {}
+        # Definitions travel from MS7 as protobuf Structs, so numbers arrive as floats.
+        max_tokens = int(declared.get("max_tokens", config.TOOL_OUTPUT_MAX_TOKENS))
+        strategy = declared.get("strategy") or config.TOOL_OUTPUT_DEFAULT_STRATEGY
+        if strategy not in STRATEGIES:
+            logger.warning(f"Unknown output budget strategy '{strategy}' for tool '{definition.get('name')}'; truncating.")
+            strategy = "truncate"
+        return cls(max(0, max_tokens), strategy)
+
+
+class ToolOutputArtifacts:
+    """
+    Stores the full text of oversized tool outputs in Redis (compressed, with a TTL),
+    scoped to the job, and serves it back page by page.
+    """
+    def __init__(self, redis_url: str, ttl_seconds: int):
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self._redis = None
+
+    def _client(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.from_url(self.redis_url, decode_responses=False)
+        return self._redis
+
+    async def put(self, job_id: str, text: str) -> str | None:
+        """Stores `text` and returns its artifact id, or None if Redis is unavailable."""
+        artifact_id = uuid.uuid4().hex[:12]
+        blob = zstandard.ZstdCompressor().compress(text.encode())
+        try:
+            await self._client().set(ARTIFACT_KEY.format(job_id=job_id, artifact_id=artifact_id), blob, ex=self.ttl_seconds)
+            return artifact_id
+        except Exception as e:
+            logger.warning(f"[{job_id}] Could not store an oversized tool output: {e}")
+            return None
+
+    async def get(self, job_id: str, artifact_id: str) -> str | None:
+        blob = await self._client().get(ARTIFACT_KEY.format(job_id=job_id, artifact_id=artifact_id))
+        if blob is None:
+            return None
+        return zstandard.ZstdDecompressor().decompress(blob).decode()
+
+
+def page_chars() -> int:
+    return int(config.TOOL_OUTPUT_PAGE_TOKENS * config.CONTEXT_CHARS_PER_TOKEN)
+
+
+def page_count(text: str) -> int:
+    return max(1, math.ceil(len(text) / page_chars()))
+
+
+def cut_at_boundary(text: str, max_chars: int) -> str:
+    """The first `max_chars` of `text`, ending at a line break when one is in the second half."""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", max_chars // 2, max_chars)
+    return text[:cut if cut != -1 else max_chars]
+
+
+class ToolOutputLimiter:
+    """
+    Keeps each tool result within its tool's output budget before it reaches the
+    agent scratchpad, where it would otherwise be re-sent with every later LLM call
+    of the loop. An oversized result is stored as an artifact and replaced by its
+    beginning ("truncate") or by a model-written summary ("summarize"), followed by
+    a note telling the agent how to page through the full text with `read_tool_output`.
+
+    One limiter serves one job. It reads the job's model from the build context
+    only when a summary is needed, i.e. after the pipeline has finished.
+    """
+    def __init__(self, context, artifacts: "ToolOutputArtifacts"):
+        self.context = context
+        self.job_id = context.job.id
+        self.artifacts = artifacts
+
+    async def apply(self, tool_name: str, output: str, budget: OutputBudget) -> str:
+        tokens = estimate_tokens(output)
+        if not budget.max_tokens or tokens <= budget.max_tokens:
+            return output
+
+        artifact_id = await self.artifacts.put(self.job_id, output)
+        strategy = budget.strategy
+        shrunk = None
+        if strategy == "summarize":
+            shrunk = await self._summarize(tool_name, output, budget.max_tokens)
+        if shrunk is None:
+            strategy = "truncate"
+            shrunk = cut_at_boundary(output, int(budget.max_tokens * config.CONTEXT_CHARS_PER_TOKEN))
+        TOOL_OUTPUT_OVERSIZED_TOTAL.labels(tool=tool_label(tool_name), strategy=strategy).inc()
+        logger.info(f"[{self.job_id}] Output of tool '{tool_name}' (~{tokens} tokens) exceeded its budget of "
+                    f"{budget.max_tokens} tokens; {strategy}d it (artifact: {artifact_id}).")
+        return shrunk + self._note(strategy, tokens, output, artifact_id)
+
+    async def _summarize(self, tool_name: str, output: str, max_tokens: int) -> str | None:
+        """A summary of (the beginning of) `output` within `max_tokens`, or None if the model call fails."""
+        max_input_chars = int(config.TOOL_OUTPUT_SUMMARY_INPUT_TOKENS * config.CONTEXT_CHARS_PER_TOKEN)
+        partial = len(output) > max_input_chars
+        prompt = SUMMARY_INSTRUCTION.format(
+            tool=tool_name,
+            partial=f" (only its first ~{config.TOOL_OUTPUT_SUMMARY_INPUT_TOKENS} tokens are shown)" if partial else "",
+            question=self.context.job.prompt_text,
+            words=int(max_tokens * 0.75),
+            output=cut_at_boundary(output, max_input_chars),
+        )
+        try:
+            # Runs within the tool's callbacks, so the job's limiter callback gives it a provider slot.
+            result = await self.context.llm.with_config(tags=[SUMMARY_RUN_TAG]).ainvoke([
+                SystemMessage(content="You condense tool outputs without losing relevant details."),
+                HumanMessage(content=prompt),
+            ])
+        except Exception as e:
+            logger.warning(f"[{self.job_id}] Could not summarize the output of tool '{tool_name}', truncating it: {e}")
+            return None
+        summary = result.content if isinstance(result.content, str) else str(result.content)
+        # The model may overrun the requested length; the budget still holds.
+        return cut_at_boundary(summary, int(max_tokens * config.CONTEXT_CHARS_PER_TOKEN))
+
+    @staticmethod
+    def _note(strategy: str, tokens: int, output: str, artifact_id: str | None) -> str:
+        shown = "the beginning" if strategy == "truncate" else "a summary"
+        if artifact_id is None:
+            return f"\n\n[The output (~{tokens} tokens) was too long; this is {shown} of it. The full output is not available.]"
+        return (
+            f"\n\n[The output (~{tokens} tokens) was too long; this is {shown} of it. The full output is stored as "
+            f"artifact '{artifact_id}' in {page_count(output)} page(s). To read more, call {PAGER_TOOL_NAME} with "
+            f"artifact_id='{artifact_id}' and a page number.]"
+        )
+
+
+class ReadToolOutputArgs(BaseModel):
+    artifact_id: str = Field(..., description="The artifact id given in the truncated tool output.")
+    page: int = Field(1, description="The page to read, starting at 1.")
+
+
+def build_pager_tool(job_id: str, artifacts: ToolOutputArtifacts) -> StructuredTool:
+    """The `read_tool_output` tool of one job. It runs in MS6 and can only read that job's artifacts."""
+    async def read_tool_output(artifact_id: str, page: int = 1) -> str:
+        try:
+            text = await artifacts.get(job_id, artifact_id)
+        except Exception as e:
+            return f"Error: could not read artifact '{artifact_id}': {e}"
+        if text is None:
+            return f"Error: artifact '{artifact_id}' does not exist or has expired."
+        pages = page_count(text)
+        if not 1 <= page <= pages:
+            return f"Error: artifact '{artifact_id}' has pages 1 to {pages}."
+        size = page_chars()
+        return f"[Artifact '{artifact_id}', page {page} of {pages}]\n" + text[(page - 1) * size:page * size]
+
+    return StructuredTool(
+        name=PAGER_TOOL_NAME,
+        description=(
+            "Reads one page of a tool output that was too long to show in full. "
+            "Use the artifact_id from the note at the end of the shortened output."
+        ),
+        args_schema=ReadToolOutputArgs,
+        coroutine=read_tool_output,
+    )
+
+
+tool_output_artifacts = ToolOutputArtifacts(config.REDIS_URL, config.TOOL_OUTPUT_ARTIFACT_TTL_SECONDS)
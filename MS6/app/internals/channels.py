@@ -0,0 +1,79 @@
+# MS6/app/internals/channels.py
+
+import asyncio
+import itertools
+import grpc
+from app import config
+from app.logging_config import logger
+
+
+class GrpcChannelManager:
+    """
+    Owns the long-lived gRPC channels used by the executor's internal clients.
+    One channel is opened lazily per replica address and then shared by every job
+    handled by this worker process. When a service is configured with several
+    comma-separated addresses, calls are balanced across them round-robin.
+    """
+    def __init__(self, options: list[tuple] = None):
+        self.options = options or [
+            ("grpc.keepalive_time_ms", config.GRPC_KEEPALIVE_TIME_MS),
+            ("grpc.keepalive_timeout_ms", config.GRPC_KEEPALIVE_TIMEOUT_MS),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.max_pings_without_data", 0),
+        ]
+        # Structure: { "address": grpc.aio.Channel }
+        self._channels = {}
+        # Structure: { "comma,separated,targets": itertools.cycle }
+        self._cursors = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _split_targets(targets: str) -> list[str]:
+        return [t.strip() for t in (targets or "").split(",") if t.strip()]
+
+    async def get_channel(self, targets: str) -> grpc.aio.Channel:
+        """
+        Returns a shared channel for the next replica in `targets`.
+        Closed or shut-down channels are transparently replaced.
+        """
+        addresses = self._split_targets(targets)
+        if not addresses:
+            raise ValueError("No gRPC target address configured.")
+
+        if targets not in self._cursors:
+            self._cursors[targets] = itertools.cycle(addresses)
+        address = next(self._cursors[targets])
+
+        channel = self._channels.get(address)
+        if channel is not None and channel.get_state() != grpc.ChannelConnectivity.SHUTDOWN:
+            return channel
+
+        async with self._lock:
+            # Another coroutine may have opened it while we were waiting for the lock.
+            channel = self._channels.get(address)
+            if channel is None or channel.get_state() == grpc.ChannelConnectivity.SHUTDOWN:
+                logger.info(f"Opening persistent gRPC channel to '{address}'.")
+                channel = grpc.aio.insecure_channel(address, options=self.options)
+                self._channels[address] = channel
+        return channel
+
+    async def get_all_channels(self, targets: str) -> list[grpc.aio.Channel]:
+        """Returns a shared channel for every replica in `targets`, e.g. to broadcast a request."""
+        return [await self.get_channel(address) for address in self._split_targets(targets)]
+
+    async def close(self):
+        """Gracefully closes every channel. Called once when the worker shuts down."""
+        async with self._lock:
+            channels = list(self._channels.items())
+            self._channels.clear()
+            self._cursors.clear()
+        for address, channel in channels:
+            try:
+                await channel.close(grace=config.GRPC_CLOSE_GRACE_SECONDS)
+                logger.info(f"Closed gRPC channel to '{address}'.")
+            except Exception as e:
+                logger.warning(f"Error while closing gRPC channel to '{address}': {e}")
+
+
+# A single, process-wide channel manager shared by all internal clients.
+channel_manager = GrpcChannelManager()
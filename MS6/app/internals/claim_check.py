@@ -0,0 +1,41 @@
+# MS6/app/internals/claim_check.py
+
+import json
+import redis.asyncio as redis
+import zstandard
+from app import config
+
+CLAIM_CHECK_FIELD = "$claim_check"
+
+
+def is_reference(section) -> bool:
+    """True if a job section was offloaded by MS5 and only a reference travelled in the message."""
+    return isinstance(section, dict) and CLAIM_CHECK_FIELD in section
+
+
+class ClaimCheckExpiredError(LookupError):
+    """The offloaded section is no longer in Redis; fetching it again won't bring it back."""
+
+
+class ClaimCheckStore:
+    """Fetches job sections that MS5 offloaded to Redis under content-addressed keys."""
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._redis = None
+
+    def _client(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.from_url(self.redis_url, decode_responses=False)
+        return self._redis
+
+    async def fetch(self, reference: dict):
+        claim = reference[CLAIM_CHECK_FIELD]
+        blob = await self._client().get(claim["key"])
+        if blob is None:
+            raise ClaimCheckExpiredError(f"Claim-check '{claim['key']}' has expired or does not exist.")
+        if claim.get("encoding") == "zstd":
+            blob = zstandard.ZstdDecompressor().decompress(blob)
+        return json.loads(blob)
+
+
+claim_check_store = ClaimCheckStore(config.REDIS_URL)
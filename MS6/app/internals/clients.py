@@ -12,52 +12,57 @@ from app.logging_config import logging
 
 from app.internals.generated import tool_pb2, tool_pb2_grpc
 from app.internals.generated import data_pb2, data_pb2_grpc
+from app.internals.channels import channel_manager
 from app.logging_config import logger # Use the correct logger import
 
 class ToolServiceClient:
-    """A client for interacting with the gRPC Tool Service (MS7)."""
-    
-    async def execute_tools(self, tool_calls: list[dict]) -> list[dict]:
+    """
+    A client for interacting with the gRPC Tool Service (MS7).
+    Uses the worker's shared channels instead of opening one per call.
+    """
+    def __init__(self, channels=channel_manager):
+        self.channels = channels
+
+    async def execute_tools(self, tool_calls: list[dict], job_id: str = "") -> list[dict]:
         """
         Executes one or more tools in parallel by calling the Tool Service.
+        `job_id` lets a later `cancel_tools` stop them.
         """
         if not config.TOOL_SERVICE_GRPC_URL:
             logger.error("TOOL_SERVICE_GRPC_URL is not set. Cannot execute tools.")
             return [{"status": "error", "output": "Tool Service is not configured."}]
 
         try:
-            async with grpc.aio.insecure_channel(config.TOOL_SERVICE_GRPC_URL) as channel:
-                # --- THIS IS THE CRITICAL FIX: UNCOMMENT THE LOGIC ---
-                stub = tool_pb2_grpc.ToolServiceStub(channel)
-                
-                proto_tool_calls = []
-                for call in tool_calls:
-                    arguments = Struct()
-                    args_data = call.get("arguments", {})
-                    if isinstance(args_data, dict):
-                        arguments.update(args_data)
-                    
-                    proto_tool_calls.append(tool_pb2.ToolCall(
-                        id=call.get("id"),
-                        name=call.get("name"),
-                        arguments=arguments
-                    ))
-
-                request = tool_pb2.ExecuteMultipleToolsRequest(tool_calls=proto_tool_calls)
-                logger.info(f"Sending gRPC request to ToolService: ExecuteMultipleTools for {len(proto_tool_calls)} tool(s).")
-                response = await stub.ExecuteMultipleTools(request, timeout=30.0)
-                
-                # Convert the Protobuf response back to a Python list of dicts
-                return [
-                    {
-                        "tool_call_id": res.tool_call_id,
-                        "name": res.name,
-                        "status": res.status,
-                        "output": res.output
-                    }
-                    for res in response.results
-                ]
-                # --- END OF FIX ---
+            channel = await self.channels.get_channel(config.TOOL_SERVICE_GRPC_URL)
+            stub = tool_pb2_grpc.ToolServiceStub(channel)
+
+            proto_tool_calls = []
+            for call in tool_calls:
+                arguments = Struct()
+                args_data = call.get("arguments", {})
+                if isinstance(args_data, dict):
+                    arguments.update(args_data)
+
+                proto_tool_calls.append(tool_pb2.ToolCall(
+                    id=call.get("id"),
+                    name=call.get("name"),
+                    arguments=arguments
+                ))
+
+            request = tool_pb2.ExecuteMultipleToolsRequest(tool_calls=proto_tool_calls, job_id=job_id or "")
+            logger.info(f"Sending gRPC request to ToolService: ExecuteMultipleTools for {len(proto_tool_calls)} tool(s).")
+            response = await stub.ExecuteMultipleTools(request, timeout=30.0)
+
+            # Convert the Protobuf response back to a Python list of dicts
+            return [
+                {
+                    "tool_call_id": res.tool_call_id,
+                    "name": res.name,
+                    "status": res.status,
+                    "output": res.output
+                }
+                for res in response.results
+            ]
         except grpc.aio.AioRpcError as e:
             logger.error(f"gRPC error executing tools: {e.details()}", exc_info=True)
             # Return an error structure that the agent can understand
@@ -71,23 +76,53 @@ class ToolServiceClient:
             ]
 
 
+    async def cancel_tools(self, job_id: str, tool_call_ids: list[str] = None) -> tuple[int, int]:
+        """
+        Asks the Tool Service to stop running tool calls of a cancelled job (all of them
+        when no ids are given). The calls may run on any replica, so every replica is
+        asked. Returns (cancelled, released): MS7 answers once the calls' resources
+        (Docker execs, webhook requests) were freed, or its own wait timed out.
+        """
+        if not config.TOOL_SERVICE_GRPC_URL:
+            return 0, 0
+        request = tool_pb2.CancelToolCallsRequest(job_id=job_id, tool_call_ids=tool_call_ids or [])
+        channels = await self.channels.get_all_channels(config.TOOL_SERVICE_GRPC_URL)
+        responses = await asyncio.gather(
+            *(tool_pb2_grpc.ToolServiceStub(channel).CancelToolCalls(request, timeout=config.TOOL_CANCEL_TIMEOUT_SECONDS)
+              for channel in channels),
+            return_exceptions=True,
+        )
+        cancelled = released = 0
+        for response in responses:
+            if isinstance(response, grpc.aio.AioRpcError):
+                logger.warning(f"[{job_id}] CancelToolCalls failed on a Tool Service replica: {response.details()}")
+            elif isinstance(response, BaseException):
+                logger.warning(f"[{job_id}] CancelToolCalls failed on a Tool Service replica: {response}")
+            else:
+                cancelled += response.cancelled
+                released += response.released
+        return cancelled, released
+
+
 class DataServiceClient:
     """A client for fetching the parsed content of on-the-fly files."""
-    
+    def __init__(self, channels=channel_manager):
+        self.channels = channels
+
     async def get_file_content(self, file_id: str, user_id: str) -> dict:
         """
         Fetches and returns the parsed content of a single file from MS10.
         """
         logger.info(f"Fetching content for file_id: {file_id}")
         try:
-            async with grpc.aio.insecure_channel(config.DATA_SERVICE_GRPC_URL) as channel:
-                stub = data_pb2_grpc.DataServiceStub(channel)
-                request = data_pb2.GetFileContentRequest(file_id=file_id, user_id=user_id)
-                response = await stub.GetFileContent(request, timeout=60.0) # Longer timeout for parsing
-                
-                # Convert the proto Struct back to a Python dict
-                return MessageToDict(response.content, preserving_proto_field_name=True)
-                
+            channel = await self.channels.get_channel(config.DATA_SERVICE_GRPC_URL)
+            stub = data_pb2_grpc.DataServiceStub(channel)
+            request = data_pb2.GetFileContentRequest(file_id=file_id, user_id=user_id)
+            response = await stub.GetFileContent(request, timeout=60.0) # Longer timeout for parsing
+
+            # Convert the proto Struct back to a Python dict
+            return MessageToDict(response.content, preserving_proto_field_name=True)
+
         except grpc.aio.AioRpcError as e:
             logger.error(f"gRPC error fetching content for file {file_id}: {e.details()}")
             return {"type": "error", "content": f"Error fetching file content: {e.details()}"}
@@ -15,7 +15,7 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import struct_pb2 as google_dot_protobuf_dot_struct__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ntool.proto\x12\x04tool\x1a\x1cgoogle/protobuf/struct.proto\"P\n\x08ToolCall\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12*\n\targuments\x18\x03 \x01(\x0b\x32\x17.google.protobuf.Struct\"A\n\x1b\x45xecuteMultipleToolsRequest\x12\"\n\ntool_calls\x18\x01 \x03(\x0b\x32\x0e.tool.ToolCall\"P\n\nToolResult\x12\x14\n\x0ctool_call_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06status\x18\x03 \x01(\t\x12\x0e\n\x06output\x18\x04 \x01(\t\"A\n\x1c\x45xecuteMultipleToolsResponse\x12!\n\x07results\x18\x01 \x03(\x0b\x32\x10.tool.ToolResult\">\n\x19GetToolDefinitionsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08tool_ids\x18\x02 \x03(\t\"J\n\x1aGetToolDefinitionsResponse\x12,\n\x0b\x64\x65\x66initions\x18\x01 \x03(\x0b\x32\x17.google.protobuf.Struct\"9\n\x14ValidateToolsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08tool_ids\x18\x02 \x03(\t\"B\n\x15ValidateToolsResponse\x12\x12\n\nauthorized\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t2\x8f\x02\n\x0bToolService\x12]\n\x14\x45xecuteMultipleTools\x12!.tool.ExecuteMultipleToolsRequest\x1a\".tool.ExecuteMultipleToolsResponse\x12H\n\rValidateTools\x12\x1a.tool.ValidateToolsRequest\x1a\x1b.tool.ValidateToolsResponse\x12W\n\x12GetToolDefinitions\x12\x1f.tool.GetToolDefinitionsRequest\x1a .tool.GetToolDefinitionsResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ntool.proto\x12\x04tool\x1a\x1cgoogle/protobuf/struct.proto\"P\n\x08ToolCall\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12*\n\targuments\x18\x03 \x01(\x0b\x32\x17.google.protobuf.Struct\"Q\n\x1b\x45xecuteMultipleToolsRequest\x12\"\n\ntool_calls\x18\x01 \x03(\x0b\x32\x0e.tool.ToolCall\x12\x0e\n\x06job_id\x18\x02 \x01(\t\"P\n\nToolResult\x12\x14\n\x0ctool_call_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06status\x18\x03 \x01(\t\x12\x0e\n\x06output\x18\x04 \x01(\t\"A\n\x1c\x45xecuteMultipleToolsResponse\x12!\n\x07results\x18\x01 \x03(\x0b\x32\x10.tool.ToolResult\"?\n\x16\x43\x61ncelToolCallsRequest\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x15\n\rtool_call_ids\x18\x02 \x03(\t\">\n\x17\x43\x61ncelToolCallsResponse\x12\x11\n\tcancelled\x18\x01 \x01(\x05\x12\x10\n\x08released\x18\x02 \x01(\x05\">\n\x19GetToolDefinitionsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08tool_ids\x18\x02 \x03(\t\"J\n\x1aGetToolDefinitionsResponse\x12,\n\x0b\x64\x65\x66initions\x18\x01 \x03(\x0b\x32\x17.google.protobuf.Struct\"9\n\x14ValidateToolsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08tool_ids\x18\x02 \x03(\t\"B\n\x15ValidateToolsResponse\x12\x12\n\nauthorized\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t2\xdf\x02\n\x0bToolService\x12]\n\x14\x45xecuteMultipleTools\x12!.tool.ExecuteMultipleToolsRequest\x1a\".tool.ExecuteMultipleToolsResponse\x12N\n\x0f\x43\x61ncelToolCalls\x12\x1c.tool.CancelToolCallsRequest\x1a\x1d.tool.CancelToolCallsResponse\x12H\n\rValidateTools\x12\x1a.tool.ValidateToolsRequest\x1a\x1b.tool.ValidateToolsResponse\x12W\n\x12GetToolDefinitions\x12\x1f.tool.GetToolDefinitionsRequest\x1a .tool.GetToolDefinitionsResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -25,19 +25,23 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_TOOLCALL']._serialized_start=50
   _globals['_TOOLCALL']._serialized_end=130
   _globals['_EXECUTEMULTIPLETOOLSREQUEST']._serialized_start=132
-  _globals['_EXECUTEMULTIPLETOOLSREQUEST']._serialized_end=197
-  _globals['_TOOLRESULT']._serialized_start=199
-  _globals['_TOOLRESULT']._serialized_end=279
-  _globals['_EXECUTEMULTIPLETOOLSRESPONSE']._serialized_start=281
-  _globals['_EXECUTEMULTIPLETOOLSRESPONSE']._serialized_end=346
-  _globals['_GETTOOLDEFINITIONSREQUEST']._serialized_start=348
-  _globals['_GETTOOLDEFINITIONSREQUEST']._serialized_end=410
-  _globals['_GETTOOLDEFINITIONSRESPONSE']._serialized_start=412
-  _globals['_GETTOOLDEFINITIONSRESPONSE']._serialized_end=486
-  _globals['_VALIDATETOOLSREQUEST']._serialized_start=488
-  _globals['_VALIDATETOOLSREQUEST']._serialized_end=545
-  _globals['_VALIDATETOOLSRESPONSE']._serialized_start=547
-  _globals['_VALIDATETOOLSRESPONSE']._serialized_end=613
-  _globals['_TOOLSERVICE']._serialized_start=616
-  _globals['_TOOLSERVICE']._serialized_end=887
+  _globals['_EXECUTEMULTIPLETOOLSREQUEST']._serialized_end=213
+  _globals['_TOOLRESULT']._serialized_start=215
+  _globals['_TOOLRESULT']._serialized_end=295
+  _globals['_EXECUTEMULTIPLETOOLSRESPONSE']._serialized_start=297
+  _globals['_EXECUTEMULTIPLETOOLSRESPONSE']._serialized_end=362
+  _globals['_CANCELTOOLCALLSREQUEST']._serialized_start=364
+  _globals['_CANCELTOOLCALLSREQUEST']._serialized_end=427
+  _globals['_CANCELTOOLCALLSRESPONSE']._serialized_start=429
+  _globals['_CANCELTOOLCALLSRESPONSE']._serialized_end=491
+  _globals['_GETTOOLDEFINITIONSREQUEST']._serialized_start=493
+  _globals['_GETTOOLDEFINITIONSREQUEST']._serialized_end=555
+  _globals['_GETTOOLDEFINITIONSRESPONSE']._serialized_start=557
+  _globals['_GETTOOLDEFINITIONSRESPONSE']._serialized_end=631
+  _globals['_VALIDATETOOLSREQUEST']._serialized_start=633
+  _globals['_VALIDATETOOLSREQUEST']._serialized_end=690
+  _globals['_VALIDATETOOLSRESPONSE']._serialized_start=692
+  _globals['_VALIDATETOOLSRESPONSE']._serialized_end=758
+  _globals['_TOOLSERVICE']._serialized_start=761
+  _globals['_TOOLSERVICE']._serialized_end=1112
 # @@protoc_insertion_point(module_scope)
@@ -44,6 +44,11 @@ class ToolServiceStub(object):
                 request_serializer=tool__pb2.ExecuteMultipleToolsRequest.SerializeToString,
                 response_deserializer=tool__pb2.ExecuteMultipleToolsResponse.FromString,
                 _registered_method=True)
+        self.CancelToolCalls = channel.unary_unary(
+                '/tool.ToolService/CancelToolCalls',
+                request_serializer=tool__pb2.CancelToolCallsRequest.SerializeToString,
+                response_deserializer=tool__pb2.CancelToolCallsResponse.FromString,
+                _registered_method=True)
         self.ValidateTools = channel.unary_unary(
                 '/tool.ToolService/ValidateTools',
                 request_serializer=tool__pb2.ValidateToolsRequest.SerializeToString,
@@ -66,6 +71,13 @@ class ToolServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def CancelToolCalls(self, request, context):
+        """...and this one to stop them when their job is cancelled.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ValidateTools(self, request, context):
         """Other RPCs defined for completeness, but not used by MS6.
         """
@@ -87,6 +99,11 @@ def add_ToolServiceServicer_to_server(servicer, server):
                     request_deserializer=tool__pb2.ExecuteMultipleToolsRequest.FromString,
                     response_serializer=tool__pb2.ExecuteMultipleToolsResponse.SerializeToString,
             ),
+            'CancelToolCalls': grpc.unary_unary_rpc_method_handler(
+                    servicer.CancelToolCalls,
+                    request_deserializer=tool__pb2.CancelToolCallsRequest.FromString,
+                    response_serializer=tool__pb2.CancelToolCallsResponse.SerializeToString,
+            ),
             'ValidateTools': grpc.unary_unary_rpc_method_handler(
                     servicer.ValidateTools,
                     request_deserializer=tool__pb2.ValidateToolsRequest.FromString,
@@ -135,6 +152,33 @@ class ToolService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def CancelToolCalls(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/tool.ToolService/CancelToolCalls',
+            tool__pb2.CancelToolCallsRequest.SerializeToString,
+            tool__pb2.CancelToolCallsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ValidateTools(request,
             target,
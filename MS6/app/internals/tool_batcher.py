@@ -0,0 +1,159 @@
+# MS6/app/internals/tool_batcher.py
+
+import asyncio
+import time
+from langchain_core.callbacks import AsyncCallbackHandler
+from app import config
+from app.internals.clients import ToolServiceClient
+from app.logging_config import logger
+from app.metrics import CANCEL_RELEASE_SECONDS
+
+
+class ToolCallBatcher:
+    """
+    Collects the tool calls one agent step emits and sends them to MS7 as ONE
+    ExecuteMultipleTools RPC. AgentExecutor runs the tools of a step concurrently,
+    so every call that arrives within a short window joins the same batch; MS7
+    executes the batch in parallel and results are mapped back by tool_call_id.
+    When the step's number of calls is known (see ToolStepCallback), the batch is sent
+    as soon as they have all arrived; the window only bounds the wait otherwise.
+
+    It exposes the same `execute_tools` interface as ToolServiceClient, so it can
+    be handed to MicroserviceToolExecutor in its place.
+
+    When the job is cancelled while its calls wait, calls that were not sent yet are
+    dropped, an RPC nobody waits for any more is aborted, and MS7 is asked to stop
+    the calls it is running (kill the Docker exec, abort the webhook request).
+    """
+    def __init__(self, client: ToolServiceClient, window_ms: float = None, job=None):
+        self.client = client
+        self.window = (window_ms if window_ms is not None else config.TOOL_BATCH_WINDOW_MS) / 1000.0
+        self.job = job
+        self.job_id = job.id if job is not None else ""
+        # Structure: [ (tool_call dict, asyncio.Future) ]
+        self._pending = []
+        self._flush_task = None
+        # Set when every call of the current step is pending, so the batch needn't wait the window.
+        self._step_complete = None
+        # How many calls the current agent step will send here (0 = unknown).
+        self._expected = 0
+        # Structure: { flush task: [ (tool_call dict, asyncio.Future) ] } for batches sent to MS7
+        self._in_flight = {}
+        # Dispatched calls to cancel in MS7; every call of a step is abandoned in the same
+        # loop iteration, so they are collected and sent as one CancelToolCalls RPC.
+        self._to_cancel = []
+        # Keeps the fire-and-forget cancel RPCs referenced until they finish.
+        self._cancel_tasks = set()
+
+    async def execute_tools(self, tool_calls: list[dict]) -> list[dict]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for call in tool_calls:
+            future = loop.create_future()
+            self._pending.append((call, future))
+            futures.append(future)
+        if self._flush_task is None:
+            self._step_complete = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_after_window(self._step_complete))
+        if self._expected and len(self._pending) >= self._expected:
+            self._step_complete.set()
+        try:
+            return list(await asyncio.gather(*futures))
+        except asyncio.CancelledError:
+            self._abandon([call.get("id") for call in tool_calls])
+            raise
+
+    def expect(self, count: int):
+        """Announces how many calls the next agent step will send to this batcher."""
+        self._expected = count
+
+    async def _flush_after_window(self, step_complete: asyncio.Event):
+        try:
+            await asyncio.wait_for(step_complete.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
+        batch, self._pending, self._flush_task = self._pending, [], None
+        self._expected = 0
+        if not batch:
+            return
+
+        calls = [call for call, _ in batch]
+        self._in_flight[asyncio.current_task()] = batch
+        try:
+            if len(calls) > 1:
+                logger.info(f"Dispatching {len(calls)} tool calls from one agent step as a single batch.")
+            results = await self.client.execute_tools(calls, job_id=self.job_id)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._in_flight.pop(asyncio.current_task(), None)
+
+        results_by_id = {res.get("tool_call_id"): res for res in results}
+        for call, future in batch:
+            if future.done():
+                continue
+            future.set_result(results_by_id.get(call.get("id")) or {
+                "tool_call_id": call.get("id"),
+                "name": call.get("name"),
+                "status": "error",
+                "output": "The Tool Service returned no result for this call."
+            })
+
+    def _abandon(self, call_ids: list[str]):
+        """Called when the callers of `call_ids` were cancelled (normally: the whole job was)."""
+        abandoned = set(call_ids)
+        # Not sent yet: simply never send them.
+        self._pending = [(call, future) for call, future in self._pending if call.get("id") not in abandoned]
+
+        dispatched = []
+        for task, batch in list(self._in_flight.items()):
+            dispatched += [call.get("id") for call, _ in batch if call.get("id") in abandoned]
+            if all(future.done() for _, future in batch):
+                # Cancelling the RPC also tells MS7 that nobody is waiting for the batch.
+                task.cancel()
+        if dispatched:
+            if not self._to_cancel:
+                task = asyncio.create_task(self._cancel_in_ms7())
+                self._cancel_tasks.add(task)
+                task.add_done_callback(self._cancel_tasks.discard)
+            self._to_cancel += dispatched
+
+    async def _cancel_in_ms7(self):
+        call_ids, self._to_cancel = self._to_cancel, []
+        requested_at = (self.job.cancel_requested_at if self.job is not None else None) or time.monotonic()
+        try:
+            cancelled, released = await self.client.cancel_tools(self.job_id, call_ids)
+        except Exception as e:
+            logger.warning(f"[{self.job_id}] Could not cancel {len(call_ids)} tool call(s) in the Tool Service: {e}")
+            return
+        elapsed = time.monotonic() - requested_at
+        if cancelled:
+            CANCEL_RELEASE_SECONDS.labels(resource="tool_calls").observe(elapsed)
+        if released < cancelled:
+            logger.warning(f"[{self.job_id}] {cancelled - released} cancelled tool call(s) were still running in the Tool Service after {elapsed:.2f}s.")
+        else:
+            logger.info(f"[{self.job_id}] Tool Service released {released} cancelled tool call(s) {elapsed * 1000:.0f}ms after the cancellation.")
+
+
+class ToolStepCallback(AsyncCallbackHandler):
+    """
+    Tells the batcher how many of its tools the agent's model just asked for, read from
+    the tool calls of the model response, so the step's batch is sent without waiting
+    for the window. Calls to tools that don't go through the batcher (the pager) are
+    not counted.
+    """
+    def __init__(self, batcher: ToolCallBatcher, tool_names: set[str]):
+        self.batcher = batcher
+        self.tool_names = tool_names
+
+    async def on_llm_end(self, response, **kwargs):
+        count = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                count += sum(1 for call in getattr(message, "tool_calls", None) or [] if call.get("name") in self.tool_names)
+        if count:
+            self.batcher.expect(count)
@@ -1,17 +1,23 @@
 # MS6/app/messaging/cancellation_listener.py
 
 import asyncio
-import json
+import time
 import aio_pika
 from app import config
 from app.logging_config import logger
 from .worker import RUNNING_JOBS # Import the global task dictionary
+from .job_ownership import instance_routing_key
+from . import codec
 
 class CancellationListener:
     """
-    Listens for broadcasted cancellation events. When an event is received,
+    Listens for cancellation events. When an event is received,
     it checks if the job is running on THIS instance, performs a final
     authorization check, and then cancels the asyncio.Task if valid.
+
+    Cancellations for jobs this instance has registered as its own arrive on
+    `job_control_direct_exchange` with this instance's routing key. The fanout
+    broadcast is still consumed as a fallback for jobs that had no owner yet.
     """
     async def run(self):
         """Connects to RabbitMQ and consumes cancellation messages."""
@@ -34,8 +40,16 @@ class CancellationListener:
                     
                     # Bind our unique queue to the fanout exchange.
                     await queue.bind(exchange)
+
+                    # ...and to this instance's key on the direct exchange for targeted cancellations.
+                    direct_exchange = await channel.declare_exchange(
+                        'job_control_direct_exchange',
+                        aio_pika.ExchangeType.DIRECT,
+                        durable=True
+                    )
+                    await queue.bind(direct_exchange, instance_routing_key(config.INSTANCE_ID))
                     
-                    logger.info(f" [*] Cancellation Listener is waiting for broadcast messages on unique queue '{queue.name}'.")
+                    logger.info(f" [*] Cancellation Listener (instance '{config.INSTANCE_ID}') is waiting for messages on unique queue '{queue.name}'.")
                     await queue.consume(self.on_message)
                     await asyncio.Event().wait() # Wait forever
             except aio_pika.exceptions.AMQPConnectionError as e:
@@ -47,7 +61,7 @@ class CancellationListener:
         # Acknowledge the message immediately. We don't want to requeue broadcasts.
         async with message.process(requeue=False):
             try:
-                payload = json.loads(message.body.decode())
+                payload = codec.decode(message.body, message.content_type)
                 job_id = payload.get("job_id")
                 requesting_user_id = payload.get("user_id") # User who sent the DELETE request
 
@@ -68,6 +82,8 @@ class CancellationListener:
                     if str(owning_user_id) == str(requesting_user_id):
                         # --- AUTHORIZATION PASSED ---
                         task_to_cancel = job_info["task"]
+                        # Lets the executor and the tool batcher measure how long releasing took.
+                        job_info["job"].cancel_requested_at = time.monotonic()
                         task_to_cancel.cancel()
                         logger.warning(f"[{job_id}] AUTHORIZED. CANCEL INTERRUPT SENT to local task.")
                     else:
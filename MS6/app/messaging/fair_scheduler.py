@@ -0,0 +1,155 @@
+# MS6/app/messaging/fair_scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Any
+from app import config
+
+
+class FairScheduler:
+    """
+    Decides which prefetched job runs next, so one tenant's burst can't starve the others.
+    Every tenant has its own queue (ordered by message priority, then arrival) and the
+    tenants are served by deficit round-robin: each visit adds the tenant's weight to its
+    deficit and every started job costs 1, so over time tenants get execution slots in
+    proportion to their weights. A tenant at its concurrency cap is skipped until one
+    of its jobs finishes; if only capped tenants have jobs queued while execution slots
+    are free, `take_blocked` hands their surplus back so the broker can deliver others.
+    """
+    def __init__(self, max_concurrent: int, weights: dict = None, default_weight: float = None,
+                 caps: dict = None, default_cap: int = None):
+        self.max_concurrent = max_concurrent
+        self.weights = weights if weights is not None else config.TENANT_WEIGHTS
+        self.default_weight = default_weight if default_weight is not None else config.TENANT_DEFAULT_WEIGHT
+        self.caps = caps if caps is not None else config.TENANT_CONCURRENCY_CAPS
+        self.default_cap = default_cap if default_cap is not None else config.TENANT_DEFAULT_CONCURRENCY_CAP
+        # Structure: { tenant: [(-priority, arrival_seq, enqueued_at, item), ...] } (a heap per tenant)
+        self._queues = {}
+        # Tenants with queued jobs, in round-robin order.
+        self._active = deque()
+        self._deficit = {}
+        # Structure: { tenant: number of running jobs }
+        self._running = {}
+        self._total_running = 0
+        self._arrivals = itertools.count()
+        self._condition = asyncio.Condition()
+
+    def _weight(self, tenant: str) -> float:
+        return max(0.01, self.weights.get(tenant, self.default_weight))
+
+    def _cap(self, tenant: str) -> int:
+        return self.caps.get(tenant, self.default_cap)
+
+    def _has_capacity(self, tenant: str) -> bool:
+        cap = self._cap(tenant)
+        return cap <= 0 or self._running.get(tenant, 0) < cap
+
+    async def submit(self, tenant: str, item: Any, priority: int = 0):
+        async with self._condition:
+            queue = self._queues.setdefault(tenant, [])
+            if not queue:
+                self._active.append(tenant)
+            heapq.heappush(queue, (-priority, next(self._arrivals), time.monotonic(), item))
+            self._condition.notify_all()
+
+    def _pick(self) -> tuple[str, Any, float] | None:
+        if self._total_running >= self.max_concurrent:
+            return None
+        if not any(self._has_capacity(tenant) for tenant in self._active):
+            return None
+
+        # Terminates: every visit to an uncapped tenant raises its deficit by a positive weight.
+        while True:
+            tenant = self._active[0]
+            if not self._has_capacity(tenant):
+                self._active.rotate(-1)
+                continue
+            if self._deficit.get(tenant, 0.0) < 1:
+                self._deficit[tenant] = self._deficit.get(tenant, 0.0) + self._weight(tenant)
+            if self._deficit[tenant] < 1:
+                self._active.rotate(-1)
+                continue
+
+            self._deficit[tenant] -= 1
+            queue = self._queues[tenant]
+            _, _, enqueued_at, item = heapq.heappop(queue)
+            if not queue:
+                # An idle tenant doesn't bank credit (standard DRR).
+                self._active.popleft()
+                del self._queues[tenant]
+                self._deficit.pop(tenant, None)
+            elif self._deficit[tenant] < 1:
+                self._active.rotate(-1)
+            return tenant, item, enqueued_at
+
+    def _blocked(self) -> bool:
+        """True when slots are free but every queued job belongs to a tenant at its cap."""
+        return (self._total_running < self.max_concurrent and bool(self._active)
+                and not any(self._has_capacity(tenant) for tenant in self._active))
+
+    async def take_blocked(self, keep: int = 1) -> list[tuple[str, Any]]:
+        """
+        Removes and returns the queued jobs that block the prefetch: when only capped
+        tenants have jobs queued, each keeps its `keep` next jobs (ready for when one of
+        its running jobs finishes) and the rest, lowest priority and newest first, are
+        returned for the caller to hand back to the broker. Otherwise returns [].
+        Without this, a prefetch filled with a capped tenant's jobs would leave slots
+        idle forever, because the broker delivers nothing past the prefetch limit.
+        """
+        async with self._condition:
+            if not self._blocked():
+                return []
+            taken = []
+            for tenant in self._active:
+                queue = sorted(self._queues[tenant])
+                kept, surplus = queue[:keep], queue[keep:]
+                heapq.heapify(kept)
+                self._queues[tenant] = kept
+                taken += [(tenant, entry[3]) for entry in reversed(surplus)]
+            return taken
+
+    async def next(self) -> tuple[str, Any, float]:
+        """Waits for the next job to run. Returns (tenant, item, monotonic time it was submitted)."""
+        async with self._condition:
+            while (picked := self._pick()) is None:
+                await self._condition.wait()
+            tenant = picked[0]
+            self._running[tenant] = self._running.get(tenant, 0) + 1
+            self._total_running += 1
+            return picked
+
+    async def release(self, tenant: str):
+        """Marks one of `tenant`'s jobs as finished."""
+        async with self._condition:
+            self._running[tenant] -= 1
+            if not self._running[tenant]:
+                del self._running[tenant]
+            self._total_running -= 1
+            self._condition.notify_all()
+
+    async def resize(self, max_concurrent: int):
+        async with self._condition:
+            self.max_concurrent = max_concurrent
+            self._condition.notify_all()
+
+    def clear(self) -> list:
+        """Removes and returns every queued (not yet started) item, e.g. to hand them back to the broker."""
+        items = [entry[3] for queue in self._queues.values() for entry in queue]
+        self._queues.clear()
+        self._active.clear()
+        self._deficit.clear()
+        return items
+
+    def snapshot(self) -> dict:
+        tenants = set(self._queues) | set(self._running)
+        return {
+            tenant: {"queued": len(self._queues.get(tenant, [])), "running": self._running.get(tenant, 0)}
+            for tenant in tenants
+        }
+
+
+# A single, process-wide scheduler used by the worker (the limit is resized with the prefetch).
+job_scheduler = FairScheduler(max_concurrent=10)
@@ -0,0 +1,56 @@
+# MS6/app/messaging/job_ownership.py
+
+import redis.asyncio as redis
+from app import config
+from app.logging_config import logger
+
+# Shared with MS5, which reads/writes the same keys when routing cancellations.
+INSTANCE_KEY = "job:instance:{job_id}"
+PENDING_CANCEL_KEY = "job:cancel_requested:{job_id}"
+
+
+def instance_routing_key(instance_id: str) -> str:
+    """Routing key on `job_control_direct_exchange` that reaches exactly one MS6 instance."""
+    return f"job.cancel.{instance_id}"
+
+
+class JobOwnershipRegistry:
+    """
+    Records which MS6 instance is running each job (job_id -> instance id, with a TTL)
+    so MS5 can send a cancellation straight to that instance instead of broadcasting it.
+    """
+    def __init__(self, redis_url: str, instance_id: str, ttl_seconds: int):
+        self.redis_url = redis_url
+        self.instance_id = instance_id
+        self.ttl_seconds = ttl_seconds
+        self._redis = None
+
+    def _client(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    async def register(self, job_id: str) -> str | None:
+        """
+        Claims the job for this instance. Returns the id of the user who asked to cancel
+        it before this attempt started (MS5 leaves a marker for every cancellation), or None.
+        """
+        try:
+            async with self._client().pipeline(transaction=False) as pipe:
+                pipe.set(INSTANCE_KEY.format(job_id=job_id), self.instance_id, ex=self.ttl_seconds)
+                pipe.get(PENDING_CANCEL_KEY.format(job_id=job_id))
+                _, pending_cancel_user = await pipe.execute()
+            return pending_cancel_user
+        except Exception as e:
+            # Without the registration MS5 falls back to the fanout broadcast, so the job still runs.
+            logger.warning(f"[{job_id}] Could not register job ownership: {e}")
+            return None
+
+    async def unregister(self, job_id: str):
+        try:
+            await self._client().delete(INSTANCE_KEY.format(job_id=job_id))
+        except Exception as e:
+            logger.warning(f"[{job_id}] Could not remove job ownership: {e}")
+
+
+job_ownership = JobOwnershipRegistry(config.REDIS_URL, config.INSTANCE_ID, config.JOB_OWNERSHIP_TTL_SECONDS)
@@ -1,59 +1,293 @@
 # MS6/app/messaging/publisher.py
 
-import json
+import asyncio
+import itertools
+import time
 import aio_pika
+from app import config
 from app.logging_config import logger
+from app.metrics import PUBLISH_SECONDS
+from app.messaging import codec
+
+class PublishNotConfirmedError(Exception):
+    """A job's result was not confirmed by the broker, so the job must not be acked."""
+
 
 class ResultPublisher:
     """
     Handles publishing all outgoing messages from the executor using aio_pika.
     This version is fully asynchronous and designed to work with an asyncio event loop.
+
+    Final results, errors and memory updates go through a small pool of long-lived
+    channels with publisher confirms enabled. Exchanges are declared once per channel.
+    Confirms are pipelined: `_publish` hands the message to the broker and returns,
+    while the confirm is awaited in the background (or in a batch by
+    `wait_for_confirms`). A message that is not confirmed is re-sent a few times,
+    then kept and replayed after `connect_robust` has recovered the connection.
+    The worker acks a job only once `wait_for_job` has seen its results confirmed.
+    Bodies are serialized with the MESSAGE_CODEC codec, named in each message's content_type.
     """
-    def __init__(self, connection: aio_pika.RobustConnection):
+    def __init__(self, connection: aio_pika.RobustConnection, pool_size: int = None, max_in_flight: int = None,
+                 codec_name: str = None):
         if not connection or connection.is_closed:
             raise ValueError("A valid, open aio_pika connection must be provided.")
         self.connection = connection
+        requested_codec = codec_name or config.MESSAGE_CODEC
+        self.codec = codec.resolve_codec(requested_codec)
+        if self.codec != requested_codec.lower():
+            logger.warning(f"Message codec '{requested_codec}' is not available. Publishing with '{self.codec}'.")
+        self.pool_size = pool_size or config.PUBLISHER_CHANNEL_POOL_SIZE
+        self._channels = [None] * self.pool_size
+        # Structure: [ { "exchange_name": Exchange }, ... ], one dict per pooled channel.
+        self._exchanges = [{} for _ in range(self.pool_size)]
+        self._channel_cursor = itertools.count()
+        self._pool_lock = asyncio.Lock()
 
-    async def _publish(self, exchange_name: str, routing_key: str, body: dict):
-        """Publishes a message using a new channel from the shared connection."""
-        try:
-            # Create a new channel for this publishing operation
-            async with self.connection.channel() as channel:
+        # Structure: { publish_id: (exchange_name, routing_key, body_bytes, content_type) }
+        self._unconfirmed = {}
+        # Structure: { publish_id: asyncio.Task awaiting the broker confirm }
+        self._in_flight = {}
+        self._publish_ids = itertools.count()
+        self._in_flight_limit = asyncio.Semaphore(max_in_flight or config.PUBLISHER_MAX_IN_FLIGHT)
+        # Structure: { publish_id: number of failed sends so far }
+        self._attempts = {}
+        # Publish ids waiting for their delayed re-send.
+        self._retrying = set()
+        # Structure: { publish_id: asyncio.Future settled by the confirm } for messages of a job
+        self._confirm_futures = {}
+        # Structure: { job_id: [asyncio.Future] }, consumed by `wait_for_job`
+        self._job_confirms = {}
+        # Jobs that have streamed output to the client; running them again would repeat it.
+        self._streamed_jobs = set()
+
+        # The streaming path reuses one channel and one declared exchange.
+        self._stream_channel = None
+        self._stream_exchange = None
+        self._stream_lock = asyncio.Lock()
+
+        if hasattr(connection, "reconnect_callbacks"):
+            connection.reconnect_callbacks.add(self._on_reconnect)
+
+    async def _get_exchange(self, exchange_name: str) -> aio_pika.abc.AbstractExchange:
+        """Picks the next pooled channel (round-robin) and returns its declared exchange."""
+        index = next(self._channel_cursor) % self.pool_size
+        channel = self._channels[index]
+        exchange = self._exchanges[index].get(exchange_name)
+        if channel is not None and not channel.is_closed and exchange is not None:
+            return exchange
+
+        async with self._pool_lock:
+            channel = self._channels[index]
+            if channel is None or channel.is_closed:
+                channel = await self.connection.channel(publisher_confirms=True)
+                self._channels[index] = channel
+                self._exchanges[index] = {}
+            exchange = self._exchanges[index].get(exchange_name)
+            if exchange is None:
                 exchange = await channel.declare_exchange(
                     exchange_name, aio_pika.ExchangeType.TOPIC, durable=True
                 )
-                message = aio_pika.Message(
-                    body=json.dumps(body, default=str).encode(),
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                    content_type="application/json"
-                )
-                await exchange.publish(message, routing_key=routing_key)
-                logger.info(f"Published message to exchange '{exchange_name}' with key '{routing_key}'")
+                self._exchanges[index][exchange_name] = exchange
+        return exchange
+
+    async def _publish(self, exchange_name: str, routing_key: str, body: dict, job_id: str = None):
+        """
+        Publishes a PERSISTENT message without waiting for the broker's confirm.
+        The message stays in `_unconfirmed` until the confirm arrives; `wait_for_job`
+        waits for the confirms of everything published for `job_id`.
+        """
+        publish_id = next(self._publish_ids)
+        self._unconfirmed[publish_id] = (exchange_name, routing_key, *codec.encode(body, self.codec))
+        if job_id is not None:
+            future = asyncio.get_running_loop().create_future()
+            self._confirm_futures[publish_id] = future
+            self._job_confirms.setdefault(job_id, []).append(future)
+        await self._send(publish_id)
+
+    async def _send(self, publish_id: int):
+        self._retrying.discard(publish_id)
+        exchange_name, routing_key, body_bytes, content_type = self._unconfirmed[publish_id]
+        await self._in_flight_limit.acquire()
+        try:
+            exchange = await self._get_exchange(exchange_name)
+            message = aio_pika.Message(
+                body=body_bytes,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                content_type=content_type
+            )
+            task = asyncio.create_task(exchange.publish(message, routing_key=routing_key))
+            started = time.perf_counter()
         except Exception as e:
-            logger.error(f"Failed to publish to exchange '{exchange_name}': {e}", exc_info=True)
+            self._in_flight_limit.release()
+            self._retry_or_give_up(publish_id, e)
+            return
 
-    async def publish_stream_chunk(self, job_id: str, chunk_content: str):
-        """Publishes a streaming chunk of the result."""
-        await self._publish(
-            "results_exchange", 
-            f"inference.result.streaming.{job_id}",
-            {"job_id": job_id, "type": "chunk", "content": chunk_content}
-        )
+        self._in_flight[publish_id] = task
+        task.add_done_callback(lambda t: self._on_confirm(publish_id, t, started))
+        logger.info(f"Published message to exchange '{exchange_name}' with key '{routing_key}'")
+
+    def _on_confirm(self, publish_id: int, task: asyncio.Task, started: float):
+        """Done-callback for a pending confirm. Failed messages are re-sent (see `_retry_or_give_up`)."""
+        self._in_flight.pop(publish_id, None)
+        self._in_flight_limit.release()
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            self._unconfirmed.pop(publish_id, None)
+            self._attempts.pop(publish_id, None)
+            self._settle(publish_id)
+            PUBLISH_SECONDS.labels(path="confirmed").observe(time.perf_counter() - started)
+        else:
+            self._retry_or_give_up(publish_id, error)
+
+    def _retry_or_give_up(self, publish_id: int, error: BaseException):
+        """
+        Re-sends a message whose publish or confirm failed, after a short delay, up to
+        PUBLISHER_CONFIRM_RETRIES times. `_get_exchange` opens a new channel if the old one
+        was closed, so this also recovers from channel-level failures that don't drop the
+        connection. After the last attempt the message is kept for the replay after a
+        reconnect, and the job waiting for it is told it was not confirmed.
+        """
+        exchange_name, routing_key, *_ = self._unconfirmed.get(publish_id, ("?", "?"))
+        attempt = self._attempts.get(publish_id, 0) + 1
+        self._attempts[publish_id] = attempt
+        if attempt <= config.PUBLISHER_CONFIRM_RETRIES:
+            logger.warning(f"Broker did not confirm message to '{exchange_name}' with key '{routing_key}': {error!r}. "
+                           f"Re-sending it (retry {attempt} of {config.PUBLISHER_CONFIRM_RETRIES}).")
+            self._retrying.add(publish_id)
+            asyncio.get_running_loop().call_later(
+                config.PUBLISHER_CONFIRM_RETRY_DELAY_SECONDS * attempt,
+                lambda: asyncio.create_task(self._send(publish_id)),
+            )
+            return
+        logger.error(f"Broker did not confirm message to '{exchange_name}' with key '{routing_key}' after "
+                     f"{config.PUBLISHER_CONFIRM_RETRIES} retries: {error!r}. Will replay after reconnect.")
+        self._settle(publish_id, PublishNotConfirmedError(f"Message to '{exchange_name}' with key '{routing_key}' was not confirmed: {error!r}"))
+
+    def _settle(self, publish_id: int, error: Exception = None):
+        future = self._confirm_futures.pop(publish_id, None)
+        if future is None or future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+    async def wait_for_job(self, job_id: str, timeout: float = None):
+        """
+        Waits until the broker has confirmed every message published for `job_id`, so the
+        job's own message can be acked without losing its results if this process dies.
+        Raises PublishNotConfirmedError if one of them was not confirmed in time.
+        """
+        futures = self._job_confirms.pop(job_id, [])
+        if not futures:
+            return
+        timeout = config.PUBLISHER_CONFIRM_TIMEOUT_SECONDS if timeout is None else timeout
+        try:
+            await asyncio.wait_for(asyncio.gather(*futures), timeout)
+        except asyncio.TimeoutError:
+            raise PublishNotConfirmedError(f"[{job_id}] Results were not confirmed within {timeout}s.")
+
+    async def wait_for_confirms(self):
+        """Awaits every confirm that is currently in flight, as one batch."""
+        if self._in_flight:
+            await asyncio.gather(*list(self._in_flight.values()), return_exceptions=True)
+
+    def _on_reconnect(self, *args, **kwargs):
+        """Called by aio_pika after the robust connection has been re-established."""
+        logger.info(f"Publisher connection recovered. Replaying {len(self._unconfirmed)} unconfirmed message(s).")
+        asyncio.create_task(self.replay_unconfirmed())
+
+    async def replay_unconfirmed(self):
+        """Re-sends every message that was never confirmed and is neither in flight nor about to be retried."""
+        for publish_id in [p for p in self._unconfirmed if p not in self._in_flight and p not in self._retrying]:
+            self._attempts.pop(publish_id, None)
+            await self._send(publish_id)
+
+    async def close(self):
+        """Waits for outstanding confirms before the connection is closed."""
+        await self.wait_for_confirms()
+        if self._unconfirmed:
+            logger.warning(f"Publisher closing with {len(self._unconfirmed)} unconfirmed message(s).")
+
+    async def _get_stream_exchange(self) -> aio_pika.abc.AbstractExchange:
+        """Opens (or re-opens after a failure) the long-lived channel used for stream chunks."""
+        async with self._stream_lock:
+            if self._stream_channel is None or self._stream_channel.is_closed:
+                # Chunks are transient and best-effort, so this channel doesn't use confirms.
+                self._stream_channel = await self.connection.channel(publisher_confirms=False)
+                self._stream_exchange = await self._stream_channel.declare_exchange(
+                    "results_exchange", aio_pika.ExchangeType.TOPIC, durable=True
+                )
+            return self._stream_exchange
+
+    def has_streamed(self, job_id: str) -> bool:
+        """True once a chunk of `job_id`'s answer has been sent to the client."""
+        return job_id in self._streamed_jobs
+
+    def forget_job(self, job_id: str):
+        """Drops what is tracked for a job that is over (or handed to another attempt)."""
+        self._streamed_jobs.discard(job_id)
+        self._job_confirms.pop(job_id, None)
+
+    async def publish_stream_chunk(self, job_id: str, chunk_content: str, seq: int = None):
+        """
+        Publishes a streaming chunk of the result. This is the hot path, so it skips
+        the per-message channel setup of `_publish`: chunks are TRANSIENT (they are
+        worthless once the job has finished) and only logged at DEBUG level.
+        """
+        self._streamed_jobs.add(job_id)
+        await self._publish_stream_message(job_id, {"job_id": job_id, "type": "chunk", "content": chunk_content}, seq)
+
+    async def publish_stream_event(self, job_id: str, event: dict, seq: int = None):
+        """
+        Publishes a progress event (e.g. {"type": "tool", "event": "started", ...}) on the
+        stream path. It must not carry a "status" key: MS8 treats "success"/"error"
+        statuses as the end of the job.
+        """
+        await self._publish_stream_message(job_id, {"job_id": job_id, **event}, seq)
+
+    async def _publish_stream_message(self, job_id: str, body: dict, seq: int = None):
+        if seq is not None:
+            body["seq"] = seq
+        try:
+            exchange = await self._get_stream_exchange()
+            body_bytes, content_type = codec.encode(body, self.codec)
+            message = aio_pika.Message(
+                body=body_bytes,
+                delivery_mode=aio_pika.DeliveryMode.NOT_PERSISTENT,
+                content_type=content_type,
+                # Wall-clock hand-off time, so consumers can measure chunk delivery latency.
+                headers={"x-published-at": time.time()}
+            )
+            started = time.perf_counter()
+            await exchange.publish(message, routing_key=f"inference.result.streaming.{job_id}")
+            PUBLISH_SECONDS.labels(path="stream").observe(time.perf_counter() - started)
+            logger.debug(f"[{job_id}] Published stream {body.get('type')} seq={seq}.")
+        except Exception as e:
+            self._stream_channel = None
+            logger.error(f"[{job_id}] Failed to publish stream {body.get('type')}: {e}", exc_info=True)
     
-    async def publish_final_result(self, job_id: str, result_content: str):
-        """Publishes the complete, final message."""
-        await self._publish(
-            "results_exchange", 
-            "inference.result.final", 
-            {"job_id": job_id, "status": "success", "content": result_content}
-        )
+    async def publish_final_result(self, job_id: str, result_content: str, metadata: dict = None, warnings: list[str] = None):
+        """
+        Publishes the complete, final message, with optional job metadata and warnings
+        for the caller (e.g. that the context was cut to fit the model).
+        """
+        body = {"job_id": job_id, "status": "success", "content": result_content}
+        if warnings:
+            body["warnings"] = warnings
+        if metadata:
+            body["metadata"] = metadata
+        await self._publish("results_exchange", "inference.result.final", body, job_id=job_id)
 
     async def publish_error_result(self, job_id: str, error_message: str):
         """Publishes an error message if the job fails."""
         await self._publish(
             "results_exchange", 
             "inference.result.error", 
-            {"job_id": job_id, "status": "error", "error": error_message}
+            {"job_id": job_id, "status": "error", "error": error_message},
+            job_id=job_id,
         )
 
     async def publish_memory_update(self, job, final_result, final_input: dict):
@@ -103,4 +337,4 @@ class ResultPublisher:
             "memory_bucket_id": bucket_id,
             "messages_to_add": [user_message, assistant_message]
         }
-        await self._publish("memory_exchange", "memory.context.update", update_payload)
\ No newline at end of file
+        await self._publish("memory_exchange", "memory.context.update", update_payload, job_id=job.id)
\ No newline at end of file
@@ -0,0 +1,120 @@
+# MS6/app/messaging/retry.py
+
+import asyncio
+import aio_pika
+from app import config
+from app.logging_config import logger
+from app.execution.job import InvalidJobError
+from app.internals.claim_check import ClaimCheckExpiredError
+
+JOB_EXCHANGE = 'inference_exchange'
+JOB_ROUTING_KEY = 'inference.job.start'
+DEAD_LETTER_QUEUE = 'inference_jobs_dlq'
+RETRY_QUEUE_PREFIX = 'inference_jobs_retry.'
+
+RETRY_COUNT_HEADER = 'x-retry-count'
+LAST_ERROR_HEADER = 'x-last-error'
+DEAD_LETTER_REASON_HEADER = 'x-dead-letter-reason'
+REPLAY_COUNT_HEADER = 'x-replay-count'
+
+# Errors that will fail the same way on every attempt (bad configuration, malformed jobs,
+# offloaded resources that are gone). Anything else, including a stray ValueError or
+# KeyError from a provider SDK, may be transient and is retried.
+NON_RETRYABLE_ERRORS = (InvalidJobError, ClaimCheckExpiredError)
+
+
+def retry_count(message: aio_pika.abc.AbstractIncomingMessage) -> int:
+    try:
+        return int((message.headers or {}).get(RETRY_COUNT_HEADER, 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def is_retryable(error: BaseException) -> bool:
+    return not isinstance(error, NON_RETRYABLE_ERRORS)
+
+
+def retry_delay(attempt: int) -> float:
+    """Backoff before `attempt` (1-based): base * 2^(attempt-1), capped at JOB_RETRY_MAX_DELAY_SECONDS."""
+    return min(config.JOB_RETRY_MAX_DELAY_SECONDS, config.JOB_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+
+
+def copy_message(message: aio_pika.abc.AbstractIncomingMessage, **header_updates) -> aio_pika.Message:
+    """A persistent copy of `message` (body and encoding untouched) with updated headers."""
+    headers = {key: value for key, value in (message.headers or {}).items() if key != 'x-death'}
+    for key, value in header_updates.items():
+        if value is None:
+            headers.pop(key, None)
+        else:
+            headers[key] = value
+    return aio_pika.Message(
+        body=message.body,
+        headers=headers,
+        content_type=message.content_type,
+        content_encoding=message.content_encoding,
+        priority=message.priority,
+        timestamp=message.timestamp,
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+    )
+
+
+class RetryRouter:
+    """
+    Decides where a failed job goes instead of an immediate requeue, which would spin a
+    poison job forever. Retries are republished to a delay queue (one per backoff delay)
+    whose message TTL expires into `inference_exchange`, so the job comes back after the
+    backoff without holding a prefetch slot. Jobs out of retries, or that failed with a
+    non-retryable error, are moved to `inference_jobs_dlq` for inspection and replay
+    (see replay_dead_letters.py). Publishes use confirms, so the original is only
+    acked once its copy is safely in the broker.
+    """
+    def __init__(self, connection: aio_pika.abc.AbstractRobustConnection):
+        self.connection = connection
+        self._channel = None
+        self._declared_delays = set()
+        self._lock = asyncio.Lock()
+
+    async def _get_channel(self) -> aio_pika.abc.AbstractChannel:
+        async with self._lock:
+            if self._channel is None or self._channel.is_closed:
+                self._channel = await self.connection.channel(publisher_confirms=True)
+                self._declared_delays = set()
+                await self._channel.declare_queue(DEAD_LETTER_QUEUE, durable=True)
+            return self._channel
+
+    async def _delay_queue(self, delay_seconds: float) -> str:
+        channel = await self._get_channel()
+        delay_ms = int(delay_seconds * 1000)
+        name = f"{RETRY_QUEUE_PREFIX}{delay_ms}ms"
+        if delay_ms not in self._declared_delays:
+            await channel.declare_queue(name, durable=True, arguments={
+                "x-message-ttl": delay_ms,
+                "x-dead-letter-exchange": JOB_EXCHANGE,
+                "x-dead-letter-routing-key": JOB_ROUTING_KEY,
+            })
+            self._declared_delays.add(delay_ms)
+        return name
+
+    async def schedule_retry(self, message: aio_pika.abc.AbstractIncomingMessage, attempt: int, error: BaseException):
+        """Republishes the job to come back after the backoff for `attempt`."""
+        delay = retry_delay(attempt)
+        queue_name = await self._delay_queue(delay)
+        retry = copy_message(message, **{RETRY_COUNT_HEADER: attempt, LAST_ERROR_HEADER: f"{type(error).__name__}: {error}"[:500]})
+        channel = await self._get_channel()
+        await channel.default_exchange.publish(retry, routing_key=queue_name)
+        logger.info(f"Job scheduled for retry {attempt}/{config.JOB_MAX_RETRIES} in {delay:.0f}s via '{queue_name}'.")
+
+    async def defer(self, message: aio_pika.abc.AbstractIncomingMessage, delay_seconds: float):
+        """Republishes the job to come back after `delay_seconds`, without counting a retry."""
+        queue_name = await self._delay_queue(delay_seconds)
+        channel = await self._get_channel()
+        await channel.default_exchange.publish(copy_message(message), routing_key=queue_name)
+
+    async def dead_letter(self, message: aio_pika.abc.AbstractIncomingMessage, reason: str, error: BaseException = None):
+        """Moves the job to the dead-letter queue with the reason (and last error) in its headers."""
+        channel = await self._get_channel()
+        updates = {DEAD_LETTER_REASON_HEADER: reason}
+        if error is not None:
+            updates[LAST_ERROR_HEADER] = f"{type(error).__name__}: {error}"[:500]
+        await channel.default_exchange.publish(copy_message(message, **updates), routing_key=DEAD_LETTER_QUEUE)
+        logger.warning(f"Job moved to dead-letter queue '{DEAD_LETTER_QUEUE}' (reason: {reason}).")
@@ -0,0 +1,95 @@
+# MS6/app/messaging/stream_buffer.py
+
+import asyncio
+import time
+from app import config
+from app.logging_config import logger
+
+
+class StreamChunkBuffer:
+    """
+    Coalesces the token chunks of ONE streaming job into fewer broker messages.
+    Chunks are buffered and flushed when either `max_bytes` have accumulated or
+    `window_ms` has elapsed since the first buffered chunk. Each flush carries an
+    increasing sequence number so consumers can detect gaps or reordering.
+    The full answer is kept as a list of parts and joined once at the end.
+    """
+    def __init__(self, publisher, job_id: str, window_ms: float = None, max_bytes: int = None):
+        self.publisher = publisher
+        self.job_id = job_id
+        self.window = (window_ms if window_ms is not None else config.STREAM_FLUSH_WINDOW_MS) / 1000.0
+        self.max_bytes = max_bytes if max_bytes is not None else config.STREAM_FLUSH_MAX_BYTES
+        self.seq = 0
+        self._parts = []      # Every chunk, for the final result.
+        self._pending = []    # Chunks not yet published.
+        self._pending_bytes = 0
+        self._first_pending_at = None
+        self._timer = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def has_output(self) -> bool:
+        return bool(self._parts)
+
+    async def add(self, content: str):
+        """Buffers a chunk, flushing immediately if a threshold has been crossed."""
+        self._parts.append(content)
+        self._pending.append(content)
+        self._pending_bytes += len(content.encode())
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+
+        if self._pending_bytes >= self.max_bytes or time.monotonic() - self._first_pending_at >= self.window:
+            await self.flush()
+        elif self._timer is None:
+            # Make sure a quiet period after a burst still gets delivered on time.
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.window)
+            self._timer = None
+            await self.flush()
+        except asyncio.CancelledError:
+            pass
+
+    async def flush(self):
+        """Publishes whatever is pending as a single chunk message."""
+        async with self._lock:
+            await self._flush_locked()
+
+    async def _flush_locked(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        if not self._pending:
+            return
+        content = "".join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._first_pending_at = None
+        # Publishing under the lock keeps the sequence numbers in broker order.
+        await self.publisher.publish_stream_chunk(self.job_id, content, seq=self.seq)
+        self.seq += 1
+
+    async def publish_event(self, event: dict):
+        """
+        Publishes a progress event in stream order: pending text is flushed first and
+        the event takes the next sequence number. Events are not part of the final text.
+        """
+        async with self._lock:
+            await self._flush_locked()
+            await self.publisher.publish_stream_event(self.job_id, event, seq=self.seq)
+            self.seq += 1
+
+    async def close(self) -> str:
+        """Flushes the tail of the stream and returns the full concatenated text."""
+        await self.flush()
+        logger.debug(f"[{self.job_id}] Stream buffer closed after {self.seq} flush(es).")
+        return "".join(self._parts)
+
+    def discard(self):
+        """Stops the flush timer without publishing anything (e.g. on error or cancellation)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
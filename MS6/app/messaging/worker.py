@@ -1,13 +1,28 @@
 import asyncio
-import json
+import math
+import time
+from datetime import datetime, timezone
 import aio_pika
+import zstandard
 from app import config
 from app.logging_config import logger
 from app.execution.job import Job
 from app.execution.build_context import BuildContext
 from app.execution.pipeline import ChainConstructionPipeline
 from app.execution.executor import Executor
-from app.messaging.publisher import ResultPublisher
+from app.execution.map_reduce import MapReduceExecutor
+from app.messaging.publisher import PublishNotConfirmedError, ResultPublisher
+from app.internals.channels import channel_manager
+from app.execution.direct_providers import direct_http_client
+from app.execution.ollama_models import ollama_models
+from app.execution.concurrency import provider_limiters
+from app.execution.response_cache import response_cache
+from app.execution.agent_checkpoint import agent_checkpoints
+from app.messaging.job_ownership import job_ownership
+from app.messaging import codec
+from app.messaging.fair_scheduler import job_scheduler
+from app.messaging.retry import RetryRouter, retry_count, is_retryable
+from app.metrics import QUEUE_WAIT_SECONDS, JOB_DURATION_SECONDS, JOBS_TOTAL, IN_FLIGHT_JOBS, CANCEL_RELEASE_SECONDS, tenant_label
 
 
 
@@ -15,23 +30,96 @@ from app.messaging.publisher import ResultPublisher
 # A global dictionary to hold references to running tasks and their job data.
 # Structure: { "job_id": {"task": asyncio.Task, "job": Job} }
 RUNNING_JOBS = {}
+IN_FLIGHT_JOBS.set_function(lambda: len(RUNNING_JOBS))
 # --- END OF MODIFICATION ---
 
 class RabbitMQWorker:
     """
     Manages the asyncio connection and consumption loop for inference jobs.
     This version is designed for high-throughput, concurrent job processing.
+    Delivered jobs are not started in arrival order: they go through the fair
+    scheduler, which shares the execution slots across tenants.
     """
     def __init__(self, prefetch_count: int = 10):
         """
         Initializes the worker.
         Args:
             prefetch_count: The maximum number of jobs this worker can
-                            process concurrently.
+                            process concurrently (the broker prefetch is
+                            SCHEDULER_BUFFER_FACTOR times larger).
         """
         self.connection = None
         self.result_publisher = None
+        self.retry_router = None
         self.prefetch_count = prefetch_count
+        # Every process_message task, including ones still decoding their payload.
+        self._job_tasks = set()
+        self._queue_iter = None
+        self._draining = asyncio.Event()
+        # Set when the drain timed out and the remaining jobs are handed back to the broker.
+        self._abandoning = False
+
+    async def _execute(self, job: Job) -> str:
+        """Builds the chain for `job` and runs it. Returns the final text."""
+        build_context = BuildContext(job)
+        pipeline = ChainConstructionPipeline(build_context)
+        final_context = await pipeline.run()
+
+        # Both executors take a slot on the provider's adaptive limiter for each LLM call.
+        if MapReduceExecutor.applies(final_context):
+            return await MapReduceExecutor(final_context, self.result_publisher).run()
+        return await Executor(final_context, self.result_publisher).run()
+
+    async def _publish_shared_result(self, job: Job, result: str, source: str):
+        """
+        Delivers a result this job didn't compute itself (a cache hit or a coalesced run)
+        to its own result stream. Cache-eligible jobs have no memory, so there is no memory update.
+        """
+        if job.is_streaming:
+            await self.result_publisher.publish_stream_chunk(job.id, result, seq=0)
+        await self.result_publisher.publish_final_result(job.id, result, {"response_cache": source})
+
+    @staticmethod
+    def _decode_body(body: bytes, content_encoding: str = None, content_type: str = None) -> dict:
+        if content_encoding == "zstd":
+            body = zstandard.ZstdDecompressor().decompress(body)
+        return codec.decode(body, content_type)
+
+    async def _decode_payload(self, message: aio_pika.IncomingMessage) -> dict:
+        """
+        Decodes a job message (JSON or msgpack, per its content_type), decompressing it
+        first if MS5 marked it with content_encoding 'zstd'.
+        Large bodies are decoded in a worker thread so they don't stall the event loop.
+        """
+        if len(message.body) < config.OFFLOOP_DECODE_MIN_BYTES:
+            return self._decode_body(message.body, message.content_encoding, message.content_type)
+        return await asyncio.to_thread(self._decode_body, message.body, message.content_encoding, message.content_type)
+
+    @staticmethod
+    def _tenant_of(message: aio_pika.IncomingMessage) -> str:
+        """The tenant MS5 tagged the job with. Untagged jobs (older publishers) share one tenant."""
+        return str((message.headers or {}).get("x-tenant-id") or "default")
+
+    @staticmethod
+    def _buffer_size(concurrency: int) -> int:
+        return max(concurrency, math.ceil(concurrency * config.SCHEDULER_BUFFER_FACTOR))
+
+    def _observe_queue_wait(self, job: Job, message: aio_pika.IncomingMessage):
+        """Records how long the job sat in the broker, using the MS5 payload timestamp (or the AMQP one)."""
+        published_at = message.timestamp
+        if job.timestamp:
+            try:
+                published_at = datetime.fromisoformat(job.timestamp)
+            except ValueError:
+                pass
+        if published_at is None:
+            return
+        if published_at.tzinfo is None:
+            # MS5 stamps jobs with a naive datetime.utcnow().
+            published_at = published_at.replace(tzinfo=timezone.utc)
+        QUEUE_WAIT_SECONDS.labels(tenant=tenant_label(self._tenant_of(message))).observe(
+            max(0.0, (datetime.now(timezone.utc) - published_at).total_seconds())
+        )
 
     # --- THIS ENTIRE METHOD IS REWRITTEN FOR MANUAL ACK/NACK ---
     async def process_message(self, message: aio_pika.IncomingMessage):
@@ -41,81 +129,301 @@ class RabbitMQWorker:
         """
         job_id = "unknown"
         task = asyncio.current_task()
+        started = time.perf_counter()
+        outcome = "error"
 
         try:
             # Step 1: Decode the payload first. If this fails, we can reject it.
-            payload = json.loads(message.body.decode())
+            payload = await self._decode_payload(message)
             job = Job(payload)
             job_id = job.id
+            self._observe_queue_wait(job, message)
             
             # Step 2: Register the job and start processing.
             RUNNING_JOBS[job_id] = {"task": task, "job": job}
             logger.info(f"[{job_id}] Task registered for user '{job.user_id}'. Now processing.")
 
-            build_context = BuildContext(job)
-            pipeline = ChainConstructionPipeline(build_context)
-            final_context = await pipeline.run()
+            # Tell MS5 which instance owns the job so cancellations are routed here directly.
+            pending_cancel_user = await job_ownership.register(job_id)
+            if pending_cancel_user and str(pending_cancel_user) == str(job.user_id):
+                logger.warning(f"[{job_id}] Cancellation was requested before the job started.")
+                raise asyncio.CancelledError()
 
-            executor = Executor(final_context, self.result_publisher)
-            await executor.run()
+            cache_key = response_cache.key_for(job)
+            if cache_key:
+                # Deterministic, stateless job: serve it from the cache or share an identical in-flight run.
+                result, source = await response_cache.run(cache_key, lambda: self._execute(job))
+                if source != "miss":
+                    await self._publish_shared_result(job, result, source)
+                logger.info(f"[{job_id}] Response cache {source}. Stats: {response_cache.stats()}")
+            else:
+                await self._execute(job)
             
+            # Step 3 (Happy Path): Acknowledge the message once its results are safely with the broker.
+            await self._confirm_results(job_id)
             logger.info(f"[{job_id}] Successfully finished processing job.")
-            
-            # Step 3 (Happy Path): Acknowledge the message upon successful completion.
+            outcome = "success"
             await message.ack()
 
         except asyncio.CancelledError:
+            if self._abandoning:
+                # The worker is shutting down, not the user cancelling: let another worker run it.
+                logger.warning(f"[{job_id}] Job did not finish before the drain timeout. Requeueing.")
+                outcome = "requeued"
+                await message.nack(requeue=True)
+                return
+
             logger.warning(f"[{job_id}] Job execution was INTERRUPTED by cancellation signal.")
+            outcome = "cancelled"
+            job_info = RUNNING_JOBS.get(job_id)
+            if job_info and job_info["job"].cancel_requested_at:
+                # The executor has unwound by now: provider HTTP streams are `async with` scopes
+                # inside the awaited generators, so they were closed on the way out.
+                release = time.monotonic() - job_info["job"].cancel_requested_at
+                CANCEL_RELEASE_SECONDS.labels(resource="execution").observe(release)
+                logger.info(f"[{job_id}] Execution released {release * 1000:.0f}ms after the cancellation request.")
             if self.result_publisher:
                 await self.result_publisher.publish_error_result(job_id, "Job was cancelled by the user.")
+                await self._confirm_results(job_id, required=False)
             
             # Step 3 (Cancellation Path): Acknowledge the message to remove it from the queue.
             await message.ack()
 
-        except json.JSONDecodeError:
-            logger.error(f"Message body is not valid JSON. Discarding message: {message.body.decode()[:200]}...")
-            # Rejecting tells the queue to discard the message (or DLQ it).
-            await message.reject(requeue=False)
+        except (codec.MessageDecodeError, zstandard.ZstdError) as e:
+            logger.error(f"Message body could not be decoded. Dead-lettering message: {message.body[:200]!r}...")
+            outcome = "rejected"
+            # Nobody can be told (there is no job_id), but the message is kept for inspection.
+            await self._route_failure(message, "undecodable", e)
             
         except Exception as e:
-            logger.error(f"[{job_id}] Critical error processing message. Publishing error result.", exc_info=True)
-            if self.result_publisher:
-                await self.result_publisher.publish_error_result(job_id, f"An unexpected internal executor error occurred: {type(e).__name__}")
-            
-            # Step 3 (Error Path): Nack the message to requeue it for another try.
-            # Set requeue=False if you have a Dead Letter Queue and want to send it there instead.
-            await message.nack(requeue=True)
+            attempt = retry_count(message) + 1
+            # A retry would stream the answer again on top of what the client already shows.
+            streamed = bool(self.result_publisher and self.result_publisher.has_streamed(job_id))
+            if is_retryable(e) and not streamed and attempt <= config.JOB_MAX_RETRIES:
+                logger.error(f"[{job_id}] Error processing job (attempt {attempt}). Scheduling a retry.", exc_info=True)
+                outcome = "retried"
+                await self._route_failure(message, "retry", e, attempt=attempt)
+            else:
+                if not is_retryable(e):
+                    reason = "non_retryable_error"
+                elif streamed:
+                    reason = "output_streamed"
+                else:
+                    reason = "retries_exhausted"
+                logger.error(f"[{job_id}] Job failed for good ({reason}). Publishing error result.", exc_info=True)
+                outcome = "dead_lettered"
+                # Step 3 (Error Path): the client gets exactly one error result, when the job is given up on.
+                if self.result_publisher:
+                    await self.result_publisher.publish_error_result(job_id, f"An unexpected internal executor error occurred: {type(e).__name__}")
+                    await self._confirm_results(job_id, required=False)
+                await self._route_failure(message, reason, e)
             
         finally:
+            JOB_DURATION_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - started)
+            JOBS_TOTAL.labels(outcome=outcome).inc()
+            if self.result_publisher:
+                self.result_publisher.forget_job(job_id)
             # Step 4: Always clean up the task from the registry.
             if job_id in RUNNING_JOBS:
-                del RUNNING_JOBS[job_id]
+                job_info = RUNNING_JOBS.pop(job_id)
+                if config.AGENT_CHECKPOINT_ENABLED and job_info["job"].tool_definitions and outcome not in ("retried", "requeued"):
+                    # The job is over for good; only a job that will run again needs its agent steps.
+                    await agent_checkpoints.clear(job_id)
+                await job_ownership.unregister(job_id)
                 logger.info(f"[{job_id}] Task de-registered.")
     # --- END OF REWRITTEN METHOD ---
 
-    async def run(self):
-        """Starts the worker and listens for messages indefinitely."""
+    async def _confirm_results(self, job_id: str, required: bool = True):
+        """
+        Waits for the broker to confirm what the job published. With `required`, a missing
+        confirm raises, so the job is not acked and runs again; otherwise it is only logged.
+        """
+        if not self.result_publisher:
+            return
+        try:
+            await self.result_publisher.wait_for_job(job_id)
+        except PublishNotConfirmedError as e:
+            if required:
+                raise
+            logger.warning(f"[{job_id}] {e}")
+
+    async def _route_failure(self, message: aio_pika.IncomingMessage, reason: str, error: BaseException, attempt: int = None):
+        """
+        Sends a failed job to a delay queue (reason "retry") or to the dead-letter queue,
+        then acks the original. If the broker won't take the copy, the job is requeued
+        as before so it is never lost.
+        """
+        try:
+            if reason == "retry":
+                await self.retry_router.schedule_retry(message, attempt, error)
+            else:
+                await self.retry_router.dead_letter(message, reason, error)
+            await message.ack()
+        except Exception as routing_error:
+            logger.error(f"Could not route failed job ({reason}): {routing_error}. Requeueing it.")
+            await message.nack(requeue=True)
+
+    async def _adjust_prefetch(self, channel: aio_pika.abc.AbstractChannel):
+        """
+        Periodically matches the worker's concurrency to the total capacity of the
+        provider limiters, so excess jobs wait in the broker (where other MS6
+        instances can take them) instead of in this process. The prefetch keeps a
+        buffer of SCHEDULER_BUFFER_FACTOR times that for the fair scheduler to choose from.
+        """
+        current = self.prefetch_count
+        while True:
+            await asyncio.sleep(config.PREFETCH_ADJUST_INTERVAL_SECONDS)
+            capacity = provider_limiters.total_capacity() or self.prefetch_count
+            target = max(config.PREFETCH_MIN, min(config.PREFETCH_MAX, capacity))
+            if target != current:
+                await job_scheduler.resize(target)
+                await channel.set_qos(prefetch_count=self._buffer_size(target), global_=True)
+                logger.info(f"Worker concurrency adjusted from {current} to {target}. Limiters: {provider_limiters.snapshot()}")
+                current = target
+
+    async def _run_scheduled(self, tenant: str, message: aio_pika.IncomingMessage):
+        try:
+            await self.process_message(message)
+        finally:
+            await job_scheduler.release(tenant)
+            await self._hand_back_blocked()
+
+    async def _hand_back_blocked(self):
+        """
+        Returns the surplus jobs of tenants at their concurrency cap to the broker when
+        they hold the prefetch while slots are free. They go through a delay queue: a plain
+        requeue would put them back at the head of the queue and redeliver them at once.
+        """
+        blocked = await job_scheduler.take_blocked()
+        if not blocked:
+            return
+        logger.info(f"Handing {len(blocked)} job(s) of capped tenant(s) back to the broker "
+                    f"for {config.SCHEDULER_CAPPED_REQUEUE_DELAY_SECONDS:.0f}s. Scheduler: {job_scheduler.snapshot()}")
+        for _, message in blocked:
+            try:
+                await self.retry_router.defer(message, config.SCHEDULER_CAPPED_REQUEUE_DELAY_SECONDS)
+                await message.ack()
+            except Exception as e:
+                logger.error(f"Could not defer a capped tenant's job: {e}. Requeueing it.")
+                await message.nack(requeue=True)
+
+    async def _dispatch(self):
+        """Starts jobs in the order the fair scheduler picks them, as slots become free."""
         while True:
+            tenant, message, _ = await job_scheduler.next()
+            job_task = asyncio.create_task(self._run_scheduled(tenant, message))
+            self._job_tasks.add(job_task)
+            job_task.add_done_callback(self._job_tasks.discard)
+
+    @staticmethod
+    async def _requeue_unstarted():
+        """Hands jobs that were delivered but never started back to the broker."""
+        for message in job_scheduler.clear():
             try:
-                self.connection = await aio_pika.connect_robust(config.RABBITMQ_URL, loop=asyncio.get_event_loop())
-                async with self.connection:
-                    self.result_publisher = ResultPublisher(self.connection)
-                    channel = await self.connection.channel()
-                    
-                    await channel.set_qos(prefetch_count=self.prefetch_count)
-                    logger.info(f"Worker QoS set to {self.prefetch_count}. Ready to process jobs concurrently.")
-                    
-                    exchange = await channel.declare_exchange('inference_exchange', aio_pika.ExchangeType.TOPIC, durable=True)
-                    queue = await channel.declare_queue('inference_jobs_queue', durable=True)
-                    await queue.bind(exchange, 'inference.job.start')
-                    
-                    logger.info(" [*] Inference Executor Worker is ready and waiting for jobs.")
-                    
-                    async with queue.iterator() as queue_iter:
-                        async for message in queue_iter:
-                            asyncio.create_task(self.process_message(message))
-
-            except aio_pika.exceptions.AMQPConnectionError as e:
-                logger.error(f"RabbitMQ connection lost: {e}. Retrying in 5 seconds...")
-                await asyncio.sleep(5)
+                await message.nack(requeue=True)
+            except Exception:
+                # The channel is gone; the broker has already requeued its unacked messages.
+                pass
 
+    async def drain(self):
+        """
+        Stops consuming new jobs. `run()` returns once the in-flight jobs have finished
+        (or WORKER_DRAIN_TIMEOUT_SECONDS has passed). Prefetched jobs that haven't
+        started are returned to the queue when the consumer is cancelled.
+        """
+        if self._draining.is_set():
+            return
+        logger.info(f"Worker draining. {len(self._job_tasks)} job(s) in flight.")
+        self._draining.set()
+        if self._queue_iter is not None:
+            await self._queue_iter.close()
+
+    async def _wait_for_in_flight(self):
+        if not self._job_tasks:
+            return
+        _, pending = await asyncio.wait(set(self._job_tasks), timeout=config.WORKER_DRAIN_TIMEOUT_SECONDS)
+        if pending:
+            logger.warning(f"{len(pending)} job(s) still running after {config.WORKER_DRAIN_TIMEOUT_SECONDS}s of draining. Requeueing them.")
+            self._abandoning = True
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        logger.info("Worker drained.")
+
+    async def _open_channel(self) -> aio_pika.abc.AbstractChannel:
+        channel = await self.connection.channel()
+        # Channel-wide (global) prefetch, so `_adjust_prefetch` can resize it while consuming.
+        await job_scheduler.resize(self.prefetch_count)
+        await channel.set_qos(prefetch_count=self._buffer_size(self.prefetch_count), global_=True)
+        return channel
+
+    async def _declare_job_queue(self) -> tuple[aio_pika.abc.AbstractChannel, aio_pika.abc.AbstractQueue]:
+        """
+        Declares inference_jobs_queue as a priority queue (JOB_QUEUE_MAX_PRIORITY), so the
+        broker delivers MS5's higher-priority jobs first. A queue that already exists with
+        other arguments is used as it is, since RabbitMQ can't change them in place.
+        """
+        channel = await self._open_channel()
+        exchange = await channel.declare_exchange('inference_exchange', aio_pika.ExchangeType.TOPIC, durable=True)
+        queue_arguments = {"x-max-priority": config.JOB_QUEUE_MAX_PRIORITY} if config.JOB_QUEUE_MAX_PRIORITY > 0 else None
+        try:
+            queue = await channel.declare_queue('inference_jobs_queue', durable=True, arguments=queue_arguments)
+        except aio_pika.exceptions.ChannelPreconditionFailed:
+            logger.error("inference_jobs_queue exists with different arguments (declared before JOB_QUEUE_MAX_PRIORITY "
+                         "was set?). Consuming it as it is, so jobs are delivered FIFO and a tenant's burst can delay "
+                         "others. See JOB_QUEUE_MAX_PRIORITY in config.py for the queue migration.")
+            # The failed declare closed the channel.
+            channel = await self._open_channel()
+            exchange = await channel.declare_exchange('inference_exchange', aio_pika.ExchangeType.TOPIC, durable=True)
+            queue = await channel.declare_queue('inference_jobs_queue', passive=True)
+        await queue.bind(exchange, 'inference.job.start')
+        return channel, queue
+
+    async def run(self):
+        """Starts the worker and listens for messages until `drain()` is called."""
+        # Loads the recently used Ollama models while the worker connects and takes its first jobs.
+        preload_task = asyncio.create_task(ollama_models.preload_hot_models())
+        try:
+            while not self._draining.is_set():
+                try:
+                    self.connection = await aio_pika.connect_robust(config.RABBITMQ_URL, loop=asyncio.get_event_loop())
+                    async with self.connection:
+                        self.result_publisher = ResultPublisher(self.connection)
+                        self.retry_router = RetryRouter(self.connection)
+                        channel, queue = await self._declare_job_queue()
+                        logger.info(f"Worker concurrency set to {self.prefetch_count}. Ready to process jobs concurrently.")
+                        
+                        logger.info(" [*] Inference Executor Worker is ready and waiting for jobs.")
+                        prefetch_task = asyncio.create_task(self._adjust_prefetch(channel))
+                        dispatch_task = asyncio.create_task(self._dispatch())
+                        
+                        try:
+                            async with queue.iterator() as queue_iter:
+                                self._queue_iter = queue_iter
+                                if self._draining.is_set():
+                                    # drain() was called while we were (re)connecting.
+                                    await queue_iter.close()
+                                async for message in queue_iter:
+                                    await job_scheduler.submit(self._tenant_of(message), message, priority=message.priority or 0)
+                                    await self._hand_back_blocked()
+                            dispatch_task.cancel()
+                            await self._requeue_unstarted()
+                            if self._draining.is_set():
+                                # Keep the connection (and the publisher) open until the in-flight jobs are done.
+                                await self._wait_for_in_flight()
+                        finally:
+                            self._queue_iter = None
+                            prefetch_task.cancel()
+                            dispatch_task.cancel()
+                            # Give pipelined publisher confirms a chance to land before the connection closes.
+                            await self.result_publisher.close()
+
+                except aio_pika.exceptions.AMQPConnectionError as e:
+                    logger.error(f"RabbitMQ connection lost: {e}. Retrying in 5 seconds...")
+                    await asyncio.sleep(5)
+        finally:
+            preload_task.cancel()
+            # The gRPC channels and the direct provider HTTP pool are shared across jobs
+            # for the lifetime of the worker, so they are only torn down when it stops.
+            await channel_manager.close()
+            await direct_http_client.close()
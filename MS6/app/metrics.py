@@ -0,0 +1,178 @@
+# MS6/app/metrics.py
+
+import asyncio
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app import config
+from app.logging_config import logger
+
+# Buckets spanning fast internal calls (ms) up to long agent runs (minutes).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+QUEUE_WAIT_SECONDS = Histogram(
+    "ms6_queue_wait_seconds", "Time between MS5 publishing a job and MS6 starting it (broker + scheduler), per tenant.",
+    ["tenant"], buckets=LATENCY_BUCKETS,
+)
+BUILDER_STAGE_SECONDS = Histogram(
+    "ms6_builder_stage_seconds", "Time spent in each chain construction builder.",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "ms6_time_to_first_token_seconds", "Time from the start of execution to the first streamed token.",
+    ["provider"], buckets=LATENCY_BUCKETS,
+)
+TOKENS_PER_SECOND = Histogram(
+    "ms6_tokens_per_second", "Estimated output tokens per second of execution.",
+    ["provider"], buckets=(1, 5, 10, 20, 40, 80, 160, 320, 640),
+)
+TOOL_CALL_SECONDS = Histogram(
+    "ms6_tool_call_seconds", "Latency of a tool call through the Tool Service (MS7).",
+    ["tool", "status"], buckets=LATENCY_BUCKETS,
+)
+PUBLISH_SECONDS = Histogram(
+    "ms6_publish_seconds", "Broker publish latency ('stream' = hand-off, 'confirmed' = until the broker confirm).",
+    ["path"], buckets=LATENCY_BUCKETS,
+)
+JOB_DURATION_SECONDS = Histogram(
+    "ms6_job_duration_seconds", "Total time MS6 spent on a job, by outcome.",
+    ["outcome"], buckets=LATENCY_BUCKETS,
+)
+CANCEL_RELEASE_SECONDS = Histogram(
+    "ms6_cancel_release_seconds",
+    "Time from a cancellation request until the job's resources were released "
+    "('execution' = provider streams closed and the executor unwound, 'tool_calls' = MS7 stopped the job's tool calls).",
+    ["resource"], buckets=LATENCY_BUCKETS,
+)
+JOBS_TOTAL = Counter("ms6_jobs_total", "Jobs processed, by outcome.", ["outcome"])
+EXECUTION_PATH_TOTAL = Counter(
+    "ms6_execution_path_total", "Jobs executed, by path ('agent', 'runnable' or 'direct' provider call).", ["path"],
+)
+TOOL_OUTPUT_OVERSIZED_TOTAL = Counter(
+    "ms6_tool_output_oversized_total", "Tool results that exceeded their output budget, by how they were shortened.",
+    ["tool", "strategy"],
+)
+AGENT_STEPS_RESTORED_TOTAL = Counter(
+    "ms6_agent_steps_restored_total", "Agent tool calls restored from a checkpoint instead of being run again.",
+)
+OLLAMA_COLD_STARTS_TOTAL = Counter(
+    "ms6_ollama_cold_starts_total", "Ollama requests of jobs that had to wait for the model to load.", ["model"],
+)
+OLLAMA_PRELOADS_TOTAL = Counter("ms6_ollama_preloads_total", "Ollama models preloaded at worker startup, by outcome.", ["outcome"])
+OLLAMA_LOAD_SECONDS = Histogram(
+    "ms6_ollama_load_seconds", "Model load time reported by Ollama ('job' = a cold start, 'preload' = at worker startup).",
+    ["trigger"], buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT_JOBS = Gauge("ms6_in_flight_jobs", "Jobs currently registered as running in this process.")
+
+# Structure: { label_name: {values exported so far} }
+_label_values = {}
+
+
+def bounded_label(name: str, value: str) -> str:
+    """
+    Bounds the cardinality of a label whose values come from user input: once
+    METRICS_MAX_LABEL_VALUES distinct values were seen for `name`, new ones share "other".
+    """
+    seen = _label_values.setdefault(name, set())
+    if value in seen:
+        return value
+    if len(seen) < config.METRICS_MAX_LABEL_VALUES:
+        seen.add(value)
+        return value
+    return "other"
+
+
+def tenant_label(tenant: str) -> str:
+    return bounded_label("tenant", tenant)
+
+
+def tool_label(tool: str) -> str:
+    return bounded_label("tool", tool)
+
+
+def model_label(model: str) -> str:
+    return bounded_label("model", model)
+
+
+class RuntimeStateCollector:
+    """Exports state owned by other components (limiters, caches) at scrape time."""
+    def collect(self):
+        from app.execution.concurrency import provider_limiters
+        from app.execution.response_cache import response_cache
+        from app.messaging.fair_scheduler import job_scheduler
+
+        limit = GaugeMetricFamily("ms6_provider_limit", "Current adaptive concurrency limit per provider.", labels=["limiter"])
+        in_flight = GaugeMetricFamily("ms6_provider_in_flight", "Jobs holding a provider limiter slot.", labels=["limiter"])
+        for name, state in provider_limiters.snapshot().items():
+            limit.add_metric([name], state["limit"])
+            in_flight.add_metric([name], state["in_flight"])
+        yield limit
+        yield in_flight
+
+        cache = CounterMetricFamily("ms6_response_cache_events", "Response cache lookups by result.", labels=["result"])
+        for result in ("hits", "misses", "coalesced", "errors"):
+            cache.add_metric([result], response_cache.counters[result])
+        yield cache
+
+        queued = GaugeMetricFamily("ms6_scheduler_queued_jobs", "Prefetched jobs waiting in the fair scheduler.", labels=["tenant"])
+        running = GaugeMetricFamily("ms6_scheduler_running_jobs", "Jobs started by the fair scheduler.", labels=["tenant"])
+        totals = {}
+        for tenant, state in job_scheduler.snapshot().items():
+            label = tenant_label(tenant)
+            current = totals.setdefault(label, {"queued": 0, "running": 0})
+            current["queued"] += state["queued"]
+            current["running"] += state["running"]
+        for label, state in totals.items():
+            queued.add_metric([label], state["queued"])
+            running.add_metric([label], state["running"])
+        yield queued
+        yield running
+
+
+REGISTRY.register(RuntimeStateCollector())
+
+
+class MetricsServer:
+    """
+    A minimal HTTP server for Prometheus scrapes that runs on the worker's own
+    event loop, next to the RabbitMQ worker and the cancellation listener.
+    """
+    def __init__(self, host: str = None, port: int = None):
+        self.host = host or config.METRICS_HOST
+        self.port = port or config.METRICS_PORT
+
+    async def _read_request_line(self, reader: asyncio.StreamReader) -> bytes:
+        request_line = await reader.readline()
+        # Drain the headers; the request body (if any) is ignored.
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        return request_line
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # An idle or slow client must not hold the connection (and this coroutine) forever.
+            request_line = await asyncio.wait_for(self._read_request_line(reader), config.METRICS_REQUEST_TIMEOUT_SECONDS)
+
+            parts = request_line.decode(errors="replace").split()
+            if len(parts) >= 2 and parts[1].split("?")[0] == "/metrics":
+                status, content_type, body = "200 OK", CONTENT_TYPE_LATEST, generate_latest(REGISTRY)
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"Not Found\n"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except asyncio.TimeoutError:
+            logger.debug("Closed a metrics connection that sent no complete request in time.")
+        except Exception as e:
+            logger.warning(f"Error while serving metrics request: {e}")
+        finally:
+            writer.close()
+
+    async def run(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f" [*] Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,48 @@
+# MS6/app/service.py
+
+import asyncio
+import signal
+from app.logging_config import logger
+
+
+async def run_services(drain_signals: tuple = (signal.SIGTERM,)):
+    """
+    Runs the inference worker, the cancellation listener and the metrics endpoint
+    on the current event loop. Any of `drain_signals` makes the worker stop taking
+    new jobs; once its in-flight jobs are done the other services are stopped too,
+    so the process exits without dropping work.
+    """
+    # Imported here so a supervised worker process can adjust its config
+    # (instance id, metrics port) before the singletons that read it are created.
+    from app.messaging.worker import RabbitMQWorker
+    from app.messaging.cancellation_listener import CancellationListener
+    from app.metrics import MetricsServer
+
+    worker = RabbitMQWorker()
+    worker_task = asyncio.create_task(worker.run())
+    # The listener keeps running while the worker drains, so in-flight jobs can still be cancelled.
+    listener_task = asyncio.create_task(CancellationListener().run())
+    metrics_task = asyncio.create_task(MetricsServer().run())
+
+    def on_drain_signal(sig: signal.Signals):
+        logger.info(f"Received {sig.name}. Finishing in-flight jobs before shutting down.")
+        asyncio.create_task(worker.drain())
+
+    loop = asyncio.get_running_loop()
+    for sig in drain_signals:
+        loop.add_signal_handler(sig, on_drain_signal, sig)
+
+    logger.info("Inference Executor Worker, Cancellation Listener and metrics endpoint are now running.")
+
+    tasks = {worker_task, listener_task, metrics_task}
+    try:
+        # The worker only returns after a drain; the others only return if they crash.
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for sig in drain_signals:
+            loop.remove_signal_handler(sig)
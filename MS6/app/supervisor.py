@@ -0,0 +1,176 @@
+# MS6/app/supervisor.py
+
+import asyncio
+import itertools
+import math
+import multiprocessing
+import os
+import signal
+import time
+import aio_pika
+from app import config
+from app.logging_config import logger, setup_logging
+
+QUEUE_NAME = 'inference_jobs_queue'
+# Extra time a draining worker gets after its own drain timeout before it is killed.
+KILL_GRACE_SECONDS = 30
+
+
+def _worker_process_main(slot: int):
+    """Entry point of a spawned worker process: one event loop, worker and cancellation listener."""
+    setup_logging()
+    if os.getenv("MS6_INSTANCE_ID"):
+        # An explicit id is inherited by every child; keep each one's cancellation routing key distinct.
+        config.INSTANCE_ID = f"{config.INSTANCE_ID}-{slot}"
+    # Each process serves its own registry, so each gets its own metrics port.
+    config.METRICS_PORT += slot
+
+    from app.service import run_services
+    try:
+        # Ctrl+C reaches the whole process group; the supervisor coordinates the shutdown,
+        # so the children treat SIGINT like SIGTERM and drain.
+        asyncio.run(run_services(drain_signals=(signal.SIGTERM, signal.SIGINT)))
+    except Exception as e:
+        logger.critical(f"Worker process in slot {slot} crashed: {e}", exc_info=True)
+        raise SystemExit(1)
+
+
+class WorkerSupervisor:
+    """
+    Runs MS6 as several worker processes instead of one event loop, so decoding,
+    graph construction and logging are spread across cores. The depth and consumer
+    count of `inference_jobs_queue` are polled with a passive declare and the number
+    of processes is scaled between WORKER_PROCESSES_MIN and WORKER_PROCESSES_MAX:
+    - up when the ready backlog per consumer exceeds AUTOSCALE_BACKLOG_PER_WORKER,
+    - down by one after AUTOSCALE_IDLE_POLLS consecutive polls found the queue empty.
+    A worker being scaled down gets SIGTERM: it stops consuming, finishes its jobs and exits.
+    """
+    def __init__(self, min_workers: int = None, max_workers: int = None):
+        self.min_workers = max(1, min_workers or config.WORKER_PROCESSES_MIN)
+        self.max_workers = max(self.min_workers, max_workers or config.WORKER_PROCESSES_MAX)
+        # Spawned (not forked) children start with a clean event loop, clean gRPC state and their own INSTANCE_ID.
+        self._context = multiprocessing.get_context("spawn")
+        # Structure: { slot: multiprocessing.Process } for workers that are taking jobs.
+        self._workers = {}
+        # Structure: { slot: (multiprocessing.Process, drain_started_at) }
+        self._draining = {}
+        self._idle_polls = 0
+        self._connection = None
+        self._channel = None
+
+    def _start_worker(self):
+        used = set(self._workers) | set(self._draining)
+        slot = next(slot for slot in itertools.count() if slot not in used)
+        process = self._context.Process(target=_worker_process_main, args=(slot,), name=f"ms6-worker-{slot}")
+        process.start()
+        self._workers[slot] = process
+        logger.info(f"Started worker process {process.pid} in slot {slot}. Active workers: {len(self._workers)}.")
+
+    def _drain_worker(self, slot: int):
+        process = self._workers.pop(slot)
+        process.terminate()  # SIGTERM: the worker drains instead of dying.
+        self._draining[slot] = (process, time.monotonic())
+        logger.info(f"Draining worker process {process.pid} (slot {slot}). Active workers: {len(self._workers)}.")
+
+    def _reap(self):
+        """Restarts workers that died and collects (or kills) draining workers."""
+        for slot, process in list(self._workers.items()):
+            if not process.is_alive():
+                process.join()
+                del self._workers[slot]
+                logger.error(f"Worker process {process.pid} (slot {slot}) exited with code {process.exitcode}. Restarting it.")
+                self._start_worker()
+
+        for slot, (process, started) in list(self._draining.items()):
+            if not process.is_alive():
+                process.join()
+                del self._draining[slot]
+                logger.info(f"Worker process {process.pid} (slot {slot}) drained and exited.")
+            elif time.monotonic() - started > config.WORKER_DRAIN_TIMEOUT_SECONDS + KILL_GRACE_SECONDS:
+                logger.warning(f"Worker process {process.pid} (slot {slot}) did not exit after draining. Killing it.")
+                process.kill()
+
+    async def _queue_stats(self) -> tuple[int, int] | None:
+        """Returns (ready messages, consumers) of the job queue, or None if the broker can't be reached."""
+        try:
+            if self._connection is None:
+                self._connection = await aio_pika.connect_robust(config.RABBITMQ_URL)
+            if self._channel is None or self._channel.is_closed:
+                self._channel = await self._connection.channel()
+            queue = await self._channel.declare_queue(QUEUE_NAME, passive=True)
+            result = queue.declaration_result
+            return result.message_count, result.consumer_count
+        except Exception as e:
+            # A missing queue closes the channel; it is reopened on the next poll.
+            logger.warning(f"Could not read the depth of '{QUEUE_NAME}': {e}")
+            self._channel = None
+            return None
+
+    def _target_workers(self, ready: int, consumers: int) -> int:
+        current = len(self._workers)
+        self._idle_polls = self._idle_polls + 1 if ready == 0 else 0
+
+        if ready > config.AUTOSCALE_BACKLOG_PER_WORKER * max(consumers, 1):
+            # `consumers` counts every MS6 process on the queue (including other hosts).
+            wanted = math.ceil(ready / config.AUTOSCALE_BACKLOG_PER_WORKER) - consumers
+            return min(self.max_workers, current + max(1, wanted))
+        if self._idle_polls >= config.AUTOSCALE_IDLE_POLLS and current > self.min_workers:
+            self._idle_polls = 0
+            return current - 1
+        return current
+
+    async def _scale(self):
+        stats = await self._queue_stats()
+        if stats is None:
+            return
+        ready, consumers = stats
+        target = self._target_workers(ready, consumers)
+        current = len(self._workers)
+        if target == current:
+            return
+
+        logger.info(f"Scaling workers {current} -> {target} ({ready} ready job(s), {consumers} consumer(s)).")
+        while len(self._workers) < target:
+            self._start_worker()
+        while len(self._workers) > target:
+            # Drain the newest slot so the low metrics ports stay stable.
+            self._drain_worker(max(self._workers))
+
+    async def _shutdown(self):
+        for slot in list(self._workers):
+            self._drain_worker(slot)
+        deadline = time.monotonic() + config.WORKER_DRAIN_TIMEOUT_SECONDS + KILL_GRACE_SECONDS
+        while self._draining and time.monotonic() < deadline:
+            self._reap()
+            await asyncio.sleep(1)
+        for process, _ in self._draining.values():
+            logger.warning(f"Killing worker process {process.pid} after the shutdown deadline.")
+            process.kill()
+            process.join()
+        self._draining.clear()
+        if self._connection is not None:
+            await self._connection.close()
+
+    async def run(self):
+        """Starts the minimum number of workers and scales them until SIGTERM/SIGINT."""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+
+        logger.info(f" [*] MS6 supervisor managing {self.min_workers}-{self.max_workers} worker processes.")
+        for _ in range(self.min_workers):
+            self._start_worker()
+
+        try:
+            while not stop.is_set():
+                self._reap()
+                await self._scale()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=config.AUTOSCALE_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            logger.info("Supervisor stopping. Draining all worker processes...")
+        finally:
+            await self._shutdown()
+            logger.info("All worker processes have exited.")
@@ -0,0 +1,106 @@
+# MS6/benchmarks/codec_benchmark.py
+
+"""
+Microbenchmarks for the RabbitMQ message codecs (app/messaging/codec.py).
+Compares encode/decode time and wire size of every installed codec on payloads
+shaped like the real traffic: an MS5 job, an MS6 stream chunk and an MS6 memory update.
+
+Usage (from the MS6 directory):
+    python benchmarks/codec_benchmark.py [--number 20000]
+"""
+import argparse
+import json
+import sys
+import timeit
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.messaging import codec  # noqa: E402
+
+
+def job_payload() -> dict:
+    """A chat job as assembled by MS5 (`_assemble_job_payload`), with some history and one tool."""
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": [{"type": "text", "text": f"Message {i}. " + "lorem ipsum " * 40}]}
+        for i in range(20)
+    ]
+    return {
+        "job_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "timestamp": datetime.utcnow().isoformat(),
+        "query": {
+            "inputs": [{"type": "text", "content": "Summarize the attached report and list the open risks."}],
+            "parameters": {"temperature": 0.2},
+            "output_config": {"mode": "streaming", "persist_inputs_in_memory": False},
+            "resource_overrides": {},
+        },
+        "default_parameters": {"temperature": 0.7, "max_output_tokens": 2048, "top_p": 0.95},
+        "resources": {
+            "model_config": {
+                "provider": "google",
+                "model_name": "gemini-1.5-flash",
+                "configuration": {"parameters": {"properties": {"temperature": {"type": "number", "default": 0.7}}}},
+            },
+            "tools": [{
+                "name": "get_weather",
+                "description": "Returns the current weather for a city.",
+                "parameters": {"type": "object", "properties": {"city": {"type": "string"}}, "required": ["city"]},
+            }],
+            "rag_context": None,
+            "memory_context": {"memory_bucket_id": str(uuid.uuid4()), "history": history},
+        },
+    }
+
+
+def chunk_payload() -> dict:
+    """One coalesced stream chunk (see StreamChunkBuffer / ResultPublisher.publish_stream_chunk)."""
+    return {"job_id": str(uuid.uuid4()), "type": "chunk", "content": "The quick brown fox jumps over the lazy dog. " * 2, "seq": 42}
+
+
+def memory_update_payload() -> dict:
+    """A memory update as built by ResultPublisher.publish_memory_update."""
+    return {
+        "idempotency_key": str(uuid.uuid4()),
+        "memory_bucket_id": str(uuid.uuid4()),
+        "messages_to_add": [
+            {"role": "user", "content": [{"type": "text", "text": "Summarize the attached report. " * 10}, {"type": "file_ref", "file_id": str(uuid.uuid4())}]},
+            {"role": "assistant", "content": [{"type": "text", "text": "The report covers three areas. " * 60}]},
+        ],
+    }
+
+
+PAYLOADS = {"job": job_payload, "chunk": chunk_payload, "memory_update": memory_update_payload}
+
+
+def run(number: int):
+    print(f"Codecs installed: {', '.join(codec.CODECS)}  (iterations per measurement: {number})\n")
+    header = f"{'payload':<14} {'codec':<8} {'bytes':>7} {'encode us':>10} {'decode us':>10} {'round trip us':>14}"
+    print(header)
+    print("-" * len(header))
+    for payload_name, factory in PAYLOADS.items():
+        payload = factory()
+        baseline = None
+        for codec_name in codec.CODECS:
+            body, content_type = codec.encode(payload, codec_name)
+            assert codec.decode(body, content_type) == codec.decode(*codec.encode(payload, "json"))
+
+            encode_us = min(timeit.repeat(lambda: codec.encode(payload, codec_name), number=number, repeat=3)) / number * 1e6
+            if codec_name == "json":
+                # codec.decode uses orjson for any JSON body when it's installed; time the historical stdlib path.
+                decode = lambda: json.loads(body)  # noqa: E731
+            else:
+                decode = lambda: codec.decode(body, content_type)  # noqa: E731
+            decode_us = min(timeit.repeat(decode, number=number, repeat=3)) / number * 1e6
+            round_trip = encode_us + decode_us
+            baseline = baseline or round_trip
+            print(f"{payload_name:<14} {codec_name:<8} {len(body):>7} {encode_us:>10.2f} {decode_us:>10.2f} "
+                  f"{round_trip:>9.2f} ({baseline / round_trip:.1f}x)")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="Iterations per timing run.")
+    run(parser.parse_args().number)
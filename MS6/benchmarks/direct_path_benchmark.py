@@ -0,0 +1,180 @@
+# MS6/benchmarks/direct_path_benchmark.py
+
+"""
+Compares the per-token overhead and memory of the two ways MS6 runs a plain chat
+job (no tools) against Ollama's /api/chat:
+- runnable: `ChatPromptTemplate | ChatOllama` streamed with `astream` (LangChain),
+- direct:   the same rendered prompt streamed by OllamaAdapter over pooled httpx.
+
+By default the model is a mock Ollama server, started in a separate process, that
+streams `--tokens` NDJSON tokens as fast as it can, so the numbers are client-side
+overhead (parsing, message objects, callbacks) rather than model speed. Reports CPU
+and wall time per token and the tracemalloc peak of one streamed answer.
+
+Usage (from the MS6 directory):
+    python benchmarks/direct_path_benchmark.py --tokens 2000 --runs 20
+    python benchmarks/direct_path_benchmark.py --ollama-url http://localhost:11434 --model llama3
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from langchain_community.chat_models import ChatOllama  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+from app.execution.direct_providers import OllamaAdapter, DirectHttpClient, direct_spec_for  # noqa: E402
+from app.execution.builders.prompt_builder import SYSTEM_PROMPT  # noqa: E402
+
+
+async def _serve_mock_ollama(port: int, tokens: int):
+    """A minimal HTTP/1.1 server answering POST /api/chat with a chunked NDJSON stream."""
+    lines = [
+        json.dumps({"model": "mock", "message": {"role": "assistant", "content": f"token{i} "}, "done": False}).encode() + b"\n"
+        for i in range(tokens)
+    ]
+    lines.append(json.dumps({"model": "mock", "message": {"role": "assistant", "content": ""}, "done": True}).encode() + b"\n")
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for header in head.split(b"\r\n"):
+                    name, _, value = header.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+                for line in lines:
+                    writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    await writer.drain()
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+def run_mock_ollama(port: int, tokens: int):
+    asyncio.run(_serve_mock_ollama(port, tokens))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def measure(name: str, stream_factory, runs: int) -> dict:
+    """Streams `runs` answers; returns per-token CPU and wall time and the memory peak of one answer."""
+    async def consume() -> int:
+        count = 0
+        async for _ in stream_factory():
+            count += 1
+        return count
+
+    await consume()  # Warm-up: connection pool, imports, template and schema caches.
+
+    cpu_per_token, wall_per_token, token_counts = [], [], []
+    for _ in range(runs):
+        cpu, wall = time.process_time(), time.perf_counter()
+        count = await consume()
+        cpu_per_token.append((time.process_time() - cpu) / max(count, 1))
+        wall_per_token.append((time.perf_counter() - wall) / max(count, 1))
+        token_counts.append(count)
+
+    tracemalloc.start()
+    await consume()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "path": name,
+        "tokens_per_answer": statistics.median(token_counts),
+        "cpu_us_per_token": statistics.median(cpu_per_token) * 1e6,
+        "wall_us_per_token": statistics.median(wall_per_token) * 1e6,
+        "peak_memory_kib": peak / 1024,
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT), ("user", "{input}")])
+    input_data = {"input": "Write a long story about a benchmark."}
+
+    llm = ChatOllama(base_url=args.ollama_url, model=args.model)
+    runnable = prompt | llm
+
+    http = DirectHttpClient()
+    adapter = OllamaAdapter(http)
+    spec = direct_spec_for("ollama", args.model, {}, base_url=args.ollama_url)
+
+    def direct_stream():
+        # Rendering the template is part of the direct path's per-job cost too.
+        messages = [{"role": m.type, "content": m.content} for m in prompt.format_messages(**input_data)]
+        return adapter.stream(spec, messages)
+
+    try:
+        return [
+            await measure("runnable", lambda: runnable.astream(input_data), args.runs),
+            await measure("direct", direct_stream, args.runs),
+        ]
+    finally:
+        await http.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ollama-url", help="A real Ollama server (default: a local mock).")
+    parser.add_argument("--model", default="mock")
+    parser.add_argument("--tokens", type=int, default=1000, help="Tokens per answer from the mock server.")
+    parser.add_argument("--runs", type=int, default=10, help="Measured answers per path (after one warm-up).")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    server = None
+    if not args.ollama_url:
+        port = free_port()
+        server = multiprocessing.Process(target=run_mock_ollama, args=(port, args.tokens), daemon=True)
+        server.start()
+        args.ollama_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_for_port(port))
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"\n{'path':<10} {'tokens':>8} {'cpu us/token':>14} {'wall us/token':>15} {'peak KiB':>10}")
+        for r in results:
+            print(f"{r['path']:<10} {r['tokens_per_answer']:>8.0f} {r['cpu_us_per_token']:>14.1f} "
+                  f"{r['wall_us_per_token']:>15.1f} {r['peak_memory_kib']:>10.1f}")
+        runnable, direct = results
+        if direct["cpu_us_per_token"] > 0:
+            print(f"\nThe direct path uses {runnable['cpu_us_per_token'] / direct['cpu_us_per_token']:.1f}x less CPU per token.")
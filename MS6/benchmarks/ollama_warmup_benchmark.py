@@ -0,0 +1,193 @@
+# MS6/benchmarks/ollama_warmup_benchmark.py
+
+"""
+Shows what the Ollama model manager saves: the time jobs wait for Ollama to load a
+model. A mock Ollama server (in a separate process) behaves like the real one in the
+ways that matter here: a model is loaded on first use, which takes `--load-seconds`;
+it is reloaded when a request asks for a different num_ctx; and it is unloaded once
+its keep_alive runs out. Each scenario streams `--requests` answers through
+OllamaAdapter, `--gap` seconds apart, and reports the time to first token and the cold
+starts counted by ms6_ollama_cold_starts_total:
+- default:      no keep_alive (the mock's default is shorter than the gap) and no num_ctx,
+- varying_ctx:  jobs alternate between two num_ctx values, as jobs without a pinned one would,
+- managed:      the model is preloaded first, then every job uses the pinned num_ctx and keep_alive.
+
+Usage (from the MS6 directory):
+    python benchmarks/ollama_warmup_benchmark.py --load-seconds 2 --requests 6 --gap 1.5
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app import config  # noqa: E402
+from app.execution.direct_providers import DirectHttpClient, OllamaAdapter, direct_spec_for  # noqa: E402
+from app.execution.ollama_models import HotModel, OllamaModelManager  # noqa: E402
+from prometheus_client import REGISTRY  # noqa: E402
+
+MODEL = "mock"
+
+
+def cold_starts() -> float:
+    return REGISTRY.get_sample_value("ms6_ollama_cold_starts_total", {"model": MODEL}) or 0
+
+
+def keep_alive_seconds(value, default: float) -> float:
+    """Ollama's keep_alive: seconds, a duration string ("30m", "10s", "1h") or negative for forever."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    units = {"s": 1, "m": 60, "h": 3600}
+    return float(value[:-1]) * units[value[-1]] if value[-1] in units else float(value)
+
+
+async def _serve_mock_ollama(port: int, load_seconds: float, default_keep_alive: float):
+    # Structure: { model: {"num_ctx": int, "expires_at": float} }
+    loaded = {}
+
+    async def ensure_loaded(request: dict) -> int:
+        """Loads the requested model if needed; returns the load_duration in nanoseconds."""
+        num_ctx = (request.get("options") or {}).get("num_ctx", 2048)
+        runner = loaded.get(request["model"])
+        load_ns = 1_000_000
+        if runner is None or runner["num_ctx"] != num_ctx or runner["expires_at"] < time.monotonic():
+            await asyncio.sleep(load_seconds)
+            load_ns = int(load_seconds * 1e9)
+        loaded[request["model"]] = {"num_ctx": num_ctx, "expires_at": float("inf")}
+        return load_ns
+
+    def release(request: dict):
+        # The keep_alive countdown starts when the request is done.
+        loaded[request["model"]]["expires_at"] = time.monotonic() + keep_alive_seconds(request.get("keep_alive"), default_keep_alive)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, length = head.split(b"\r\n", 1)[0], 0
+                for header in head.split(b"\r\n"):
+                    name, _, value = header.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                request = json.loads(await reader.readexactly(length))
+                load_ns = await ensure_loaded(request)
+                if b"/api/generate" in request_line:
+                    body = json.dumps({"model": request["model"], "done": True, "load_duration": load_ns}).encode()
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+                else:
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+                    lines = [{"message": {"role": "assistant", "content": f"token{i} "}, "done": False} for i in range(20)]
+                    lines.append({"message": {"role": "assistant", "content": ""}, "done": True, "load_duration": load_ns})
+                    for line in lines:
+                        data = json.dumps({"model": request["model"], **line}).encode() + b"\n"
+                        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    writer.write(b"0\r\n\r\n")
+                await writer.drain()
+                release(request)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+def run_mock_ollama(port: int, load_seconds: float, default_keep_alive: float):
+    asyncio.run(_serve_mock_ollama(port, load_seconds, default_keep_alive))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def scenario(name: str, url: str, params_for_request, args: argparse.Namespace, preload: HotModel = None) -> dict:
+    http = DirectHttpClient()
+    adapter = OllamaAdapter(http)
+    messages = [{"role": "human", "content": "Hello"}]
+    cold_before = cold_starts()
+    first_token = []
+    try:
+        if preload is not None:
+            await OllamaModelManager(config.REDIS_URL).preload([preload])
+        for i in range(args.requests):
+            spec = direct_spec_for("ollama", MODEL, params_for_request(i), base_url=url)
+            started = time.perf_counter()
+            stream = adapter.stream(spec, messages)
+            await anext(stream)
+            first_token.append(time.perf_counter() - started)
+            async for _ in stream:
+                pass
+            await asyncio.sleep(args.gap)
+    finally:
+        await http.close()
+    return {
+        "scenario": name,
+        "cold_starts": int(cold_starts() - cold_before),
+        "ttft_median_s": statistics.median(first_token),
+        "ttft_max_s": max(first_token),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    results = []
+    for name, params_for_request, preload in [
+        ("default", lambda i: {}, None),
+        ("varying_ctx", lambda i: {"num_ctx": 4096 if i % 2 else 8192, "keep_alive": "30m"}, None),
+        ("managed", lambda i: {"num_ctx": 8192, "keep_alive": "30m"}, HotModel(None, MODEL, 8192, "30m")),
+    ]:
+        # A fresh server per scenario, so every one starts with the model unloaded.
+        port = free_port()
+        server = multiprocessing.Process(
+            target=run_mock_ollama, args=(port, args.load_seconds, args.default_keep_alive), daemon=True,
+        )
+        server.start()
+        try:
+            await wait_for_port(port)
+            url = f"http://127.0.0.1:{port}"
+            if preload is not None:
+                preload.base_url = url
+            results.append(await scenario(name, url, params_for_request, args, preload))
+        finally:
+            server.terminate()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load-seconds", type=float, default=2.0, help="Simulated model load time.")
+    parser.add_argument("--default-keep-alive", type=float, default=1.0,
+                        help="The mock's keep_alive (seconds) for requests that don't send one; shorter than --gap.")
+    parser.add_argument("--requests", type=int, default=6)
+    parser.add_argument("--gap", type=float, default=1.5, help="Idle seconds between requests.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"\n{'scenario':<12} {'cold starts':>12} {'median ttft s':>14} {'max ttft s':>11}")
+        for r in results:
+            print(f"{r['scenario']:<12} {r['cold_starts']:>12} {r['ttft_median_s']:>14.3f} {r['ttft_max_s']:>11.3f}")
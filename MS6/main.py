@@ -1,37 +1,32 @@
 # MS6/main.py
 
 import asyncio
+from app import config
 from app.logging_config import setup_logging, logger
-from app.messaging.worker import RabbitMQWorker
-from app.messaging.cancellation_listener import CancellationListener
+from app.service import run_services
+from app.supervisor import WorkerSupervisor
 
 def main():
     """
     The main entry point for the Inference Executor (MS6) application.
     It launches the main worker and the cancellation listener in parallel.
+    With MS6_WORKER_PROCESSES_MAX > 1 it instead runs a supervisor that spawns
+    and autoscales several such worker processes.
     """
     setup_logging() # Configure the logger first
-    worker_instance = RabbitMQWorker()
-    cancellation_listener = CancellationListener()
-
-    async def run_all():
-        """A wrapper to run multiple asyncio tasks concurrently."""
-        # Create tasks for both workers so they can run indefinitely
-        worker_task = asyncio.create_task(worker_instance.run())
-        listener_task = asyncio.create_task(cancellation_listener.run())
-        
-        logger.info("Inference Executor Worker and Cancellation Listener are now running.")
-        
-        # This will run until one of the tasks finishes or is cancelled.
-        await asyncio.gather(worker_task, listener_task)
 
     try:
-        logger.info("Starting all MS6 services...")
-        asyncio.run(run_all())
+        if config.WORKER_PROCESSES_MAX > 1:
+            logger.info("Starting MS6 in supervisor mode...")
+            asyncio.run(WorkerSupervisor().run())
+        else:
+            logger.info("Starting all MS6 services...")
+            # SIGTERM drains the worker: no new jobs are taken and the running ones finish.
+            asyncio.run(run_services())
     except KeyboardInterrupt:
         logger.info("Services shutting down gracefully due to user request (CTRL+C).")
     except Exception as e:
         logger.critical(f"FATAL: A service crashed during startup: {e}", exc_info=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
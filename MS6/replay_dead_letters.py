@@ -0,0 +1,102 @@
+# MS6/replay_dead_letters.py
+
+"""
+Inspects and replays jobs from the dead-letter queue (inference_jobs_dlq).
+
+    python replay_dead_letters.py list [--limit 50]
+    python replay_dead_letters.py replay [--job-id ID ...] [--reason REASON] [--limit N] [--dry-run]
+
+Replayed jobs are published back to inference_exchange with their retry count reset,
+so they get the full retry budget again. Messages that don't match the filters are
+returned to the dead-letter queue untouched.
+"""
+import argparse
+import asyncio
+import sys
+import aio_pika
+import zstandard
+from app import config
+from app.messaging import codec
+from app.messaging.retry import (
+    DEAD_LETTER_QUEUE, JOB_EXCHANGE, JOB_ROUTING_KEY, RETRY_COUNT_HEADER, LAST_ERROR_HEADER,
+    DEAD_LETTER_REASON_HEADER, REPLAY_COUNT_HEADER, copy_message,
+)
+
+
+def job_id_of(message: aio_pika.abc.AbstractIncomingMessage) -> str | None:
+    try:
+        body = message.body
+        if message.content_encoding == "zstd":
+            body = zstandard.ZstdDecompressor().decompress(body)
+        return codec.decode(body, message.content_type).get("job_id")
+    except Exception:
+        return None
+
+
+def describe(message: aio_pika.abc.AbstractIncomingMessage) -> str:
+    headers = message.headers or {}
+    return (f"job_id={job_id_of(message) or '<undecodable>'}  tenant={headers.get('x-tenant-id', '-')}  "
+            f"reason={headers.get(DEAD_LETTER_REASON_HEADER, '-')}  retries={headers.get(RETRY_COUNT_HEADER, 0)}  "
+            f"replays={headers.get(REPLAY_COUNT_HEADER, 0)}\n    last error: {headers.get(LAST_ERROR_HEADER, '-')}")
+
+
+def matches(message: aio_pika.abc.AbstractIncomingMessage, args: argparse.Namespace) -> bool:
+    if args.job_id and job_id_of(message) not in args.job_id:
+        return False
+    if args.reason and (message.headers or {}).get(DEAD_LETTER_REASON_HEADER) != args.reason:
+        return False
+    return True
+
+
+async def main(args: argparse.Namespace) -> int:
+    connection = await aio_pika.connect_robust(config.RABBITMQ_URL)
+    async with connection:
+        channel = await connection.channel(publisher_confirms=True)
+        queue = await channel.declare_queue(DEAD_LETTER_QUEUE, durable=True)
+        exchange = await channel.declare_exchange(JOB_EXCHANGE, aio_pika.ExchangeType.TOPIC, durable=True)
+
+        # Messages stay unacked until the end, so each one is fetched only once per run.
+        held, replayed = [], 0
+        while args.limit <= 0 or len(held) + replayed < args.limit:
+            message = await queue.get(no_ack=False, fail=False)
+            if message is None:
+                break
+            if args.command == "list" or not matches(message, args):
+                if args.command == "list":
+                    print(describe(message))
+                held.append(message)
+                continue
+
+            print(f"{'Would replay' if args.dry_run else 'Replaying'}: {describe(message)}")
+            if args.dry_run:
+                held.append(message)
+                continue
+            replays = int((message.headers or {}).get(REPLAY_COUNT_HEADER, 0)) + 1
+            await exchange.publish(
+                copy_message(message, **{
+                    RETRY_COUNT_HEADER: None, LAST_ERROR_HEADER: None, DEAD_LETTER_REASON_HEADER: None,
+                    REPLAY_COUNT_HEADER: replays,
+                }),
+                routing_key=JOB_ROUTING_KEY,
+            )
+            await message.ack()
+            replayed += 1
+
+        for message in held:
+            await message.nack(requeue=True)
+
+    if args.command == "list":
+        print(f"{len(held)} message(s) listed from '{DEAD_LETTER_QUEUE}'.")
+    else:
+        print(f"{replayed} job(s) replayed to '{JOB_EXCHANGE}'; {len(held)} left in '{DEAD_LETTER_QUEUE}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("list", "replay"))
+    parser.add_argument("--job-id", action="append", help="Only replay these job ids (repeatable).")
+    parser.add_argument("--reason", help="Only replay jobs dead-lettered for this reason (e.g. retries_exhausted).")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many messages (0 = the whole queue).")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be replayed without doing it.")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,115 @@
+# MS6/tests/test_agent_checkpoint.py
+
+import unittest
+from langchain.agents import create_tool_calling_agent
+from langchain.agents.output_parsers.tools import ToolAgentAction
+from langchain_core.agents import AgentAction, AgentActionMessageLog
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import StructuredTool
+from app.execution.agent_checkpoint import (
+    CHECKPOINT_KEY, AgentCheckpointStore, CheckpointedAgentExecutor, deserialize_step, serialize_step,
+)
+from app.execution.fake_model import FakeChatModel
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def rpush(self, key, *values):
+        self.commands.append(lambda: self.redis.lists.setdefault(key, []).extend(values))
+
+    def expire(self, key, seconds):
+        self.commands.append(lambda: None)
+
+    async def execute(self):
+        return [command() for command in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.lists = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+    async def delete(self, key):
+        self.lists.pop(key, None)
+
+
+def store() -> AgentCheckpointStore:
+    checkpoints = AgentCheckpointStore("redis://unused", ttl_seconds=60)
+    checkpoints._redis = FakeRedis()
+    return checkpoints
+
+
+class SerializeStepTest(unittest.TestCase):
+    def test_round_trip_keeps_the_action_type(self):
+        message = AIMessage(content="", tool_calls=[{"name": "lookup", "args": {"q": "x"}, "id": "call_0"}])
+        actions = [
+            AgentAction(tool="lookup", tool_input={"q": "x"}, log="plain"),
+            AgentActionMessageLog(tool="lookup", tool_input={"q": "x"}, log="logged", message_log=[message]),
+            ToolAgentAction(tool="lookup", tool_input={"q": "x"}, log="tool", message_log=[message], tool_call_id="call_0"),
+        ]
+        for action in actions:
+            with self.subTest(action=type(action).__name__):
+                restored, observation = deserialize_step(serialize_step(action, "found it"))
+                self.assertIs(type(restored), type(action))
+                self.assertEqual(restored, action)
+                self.assertEqual(observation, "found it")
+
+    def test_non_text_observations_are_stored_as_json(self):
+        _, observation = deserialize_step(serialize_step(AgentAction(tool="t", tool_input="", log=""), {"rows": 2}))
+        self.assertEqual(observation, '{"rows": 2}')
+
+
+class AgentCheckpointStoreTest(unittest.IsolatedAsyncioTestCase):
+    async def test_append_load_and_clear(self):
+        checkpoints = store()
+        step = (AgentAction(tool="lookup", tool_input="x", log=""), "found it")
+        await checkpoints.append("job-1", [step, step])
+        self.assertEqual(await checkpoints.load("job-1"), [step, step])
+        await checkpoints.clear("job-1")
+        self.assertEqual(await checkpoints.load("job-1"), [])
+
+    async def test_unreadable_checkpoint_starts_over(self):
+        checkpoints = store()
+        checkpoints._redis.lists[CHECKPOINT_KEY.format(job_id="job-1")] = ["not json"]
+        self.assertEqual(await checkpoints.load("job-1"), [])
+
+
+class CheckpointedAgentExecutorTest(unittest.IsolatedAsyncioTestCase):
+    def agent_executor(self, checkpoints: AgentCheckpointStore, restored_steps: list, calls: list) -> CheckpointedAgentExecutor:
+        async def lookup(q: str) -> str:
+            calls.append(q)
+            return f"result for {q}"
+
+        tool = StructuredTool.from_function(coroutine=lookup, name="lookup", description="Looks things up.")
+        llm = FakeChatModel(ttft_ms=0, tokens_per_second=0, output_tokens=3,
+                            tool_call_script=[[{"name": "lookup", "args": {"q": "a"}}], [{"name": "lookup", "args": {"q": "b"}}]])
+        prompt = ChatPromptTemplate.from_messages([("human", "{input}"), MessagesPlaceholder("agent_scratchpad")])
+        return CheckpointedAgentExecutor(agent=create_tool_calling_agent(llm, [tool], prompt), tools=[tool],
+                                         job_id="job-1", checkpoint_store=checkpoints, restored_steps=restored_steps)
+
+    async def test_redelivered_job_resumes_after_its_checkpointed_steps(self):
+        checkpoints = store()
+        calls = []
+        first = await self.agent_executor(checkpoints, [], calls).ainvoke({"input": "Find a and b."})
+        self.assertEqual(calls, ["a", "b"])
+
+        restored = await checkpoints.load("job-1")
+        self.assertEqual([observation for _, observation in restored], ["result for a", "result for b"])
+        second = await self.agent_executor(checkpoints, restored, calls).ainvoke({"input": "Find a and b."})
+        self.assertEqual(calls, ["a", "b"])
+        self.assertEqual(second["output"], first["output"])
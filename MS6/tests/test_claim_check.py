@@ -0,0 +1,61 @@
+# MS6/tests/test_claim_check.py
+
+import asyncio
+import json
+import unittest
+import zstandard
+from app.execution.job import Job
+from app.internals.claim_check import CLAIM_CHECK_FIELD, ClaimCheckExpiredError, ClaimCheckStore, claim_check_store, is_reference
+
+
+class FakeRedis:
+    def __init__(self, values: dict):
+        self.values = values
+        self.gets = 0
+
+    async def get(self, key):
+        self.gets += 1
+        await asyncio.sleep(0)
+        return self.values.get(key)
+
+
+def offload(name: str, section, store: dict, **inline) -> dict:
+    """Offloads `section` the way MS5 does: zstd-compressed JSON under a reference, `inline` fields kept."""
+    serialized = json.dumps(section, sort_keys=True).encode()
+    key = f"claim_check:{name}:test"
+    store[key] = zstandard.ZstdCompressor().compress(serialized)
+    return {**inline, CLAIM_CHECK_FIELD: {"key": key, "encoding": "zstd", "size": len(serialized)}}
+
+
+class ClaimCheckTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.values = {}
+        self.redis = FakeRedis(self.values)
+        self._previous = claim_check_store._redis
+        claim_check_store._redis = self.redis
+
+    def tearDown(self):
+        claim_check_store._redis = self._previous
+
+    async def test_job_resolves_offloaded_sections_on_demand(self):
+        memory = {"bucket_id": "b-1", "history": [{"role": "user", "content": "hi"}]}
+        job = Job({"job_id": "job-1", "resources": {"memory_context": offload("memory_context", memory, self.values, bucket_id="b-1")}})
+        self.assertTrue(is_reference(job.resources["memory_context"]))
+        self.assertEqual(job.feedback_ids["memory_bucket_id"], "b-1")
+
+        await job.resolve("memory_context", "tools")
+        self.assertEqual(job.memory_context, memory)
+        self.assertFalse(is_reference(job.resources["memory_context"]))
+
+    async def test_concurrent_resolves_share_one_fetch(self):
+        tools = [{"name": "search", "description": "Searches the web."}]
+        job = Job({"job_id": "job-1", "resources": {"tools": offload("tools", tools, self.values)}})
+        await asyncio.gather(job.resolve("tools"), job.resolve("tools"))
+        self.assertEqual(self.redis.gets, 1)
+        self.assertEqual(job.tool_definitions, tools)
+
+    async def test_expired_reference_raises(self):
+        store = ClaimCheckStore("redis://unused")
+        store._redis = self.redis
+        with self.assertRaises(ClaimCheckExpiredError):
+            await store.fetch({CLAIM_CHECK_FIELD: {"key": "claim_check:tools:gone", "encoding": "zstd"}})
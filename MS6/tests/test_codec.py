@@ -0,0 +1,46 @@
+# MS6/tests/test_codec.py
+
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+from app.messaging import codec
+
+BODY = {"job_id": "job-1", "status": "success", "result": "Zürich ☀", "chunks": [1, 2.5, None, True]}
+
+
+class CodecTest(unittest.TestCase):
+    def test_round_trip_for_every_installed_codec(self):
+        for name in codec.CODECS:
+            with self.subTest(codec=name):
+                body, content_type = codec.encode(BODY, name)
+                self.assertEqual(codec.decode(body, content_type), BODY)
+
+    def test_json_codecs_share_the_wire_format(self):
+        stamp = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        expected = codec._json_encode({"at": stamp})
+        for name in ("json", "orjson"):
+            if name in codec.CODECS:
+                with self.subTest(codec=name):
+                    body, content_type = codec.encode({"at": stamp}, name)
+                    self.assertEqual(content_type, codec.CONTENT_TYPE_JSON)
+                    self.assertEqual(codec.decode(body), codec.decode(expected))
+
+    def test_unknown_or_missing_codec_falls_back_to_json(self):
+        self.assertEqual(codec.resolve_codec("protobuf"), "json")
+        self.assertEqual(codec.resolve_codec(None), "json")
+        self.assertEqual(codec.encode(BODY, "protobuf")[1], codec.CONTENT_TYPE_JSON)
+
+    def test_undecodable_bodies_raise_message_decode_error(self):
+        with self.assertRaises(codec.MessageDecodeError):
+            codec.decode(b"\xff{not json", codec.CONTENT_TYPE_JSON)
+
+    def test_msgpack_without_the_package_is_a_decode_error(self):
+        with mock.patch.object(codec, "msgpack", None):
+            with self.assertRaises(codec.MessageDecodeError):
+                codec.decode(b"\x81\xa1a\x01", codec.CONTENT_TYPE_MSGPACK)
+
+    @unittest.skipIf(codec.msgpack is None, "msgpack is not installed")
+    def test_msgpack_is_announced_in_the_content_type(self):
+        body, content_type = codec.encode(BODY, "msgpack")
+        self.assertEqual(content_type, codec.CONTENT_TYPE_MSGPACK)
+        self.assertEqual(codec.decode(body, "application/x-msgpack"), BODY)
@@ -0,0 +1,134 @@
+# MS6/tests/test_concurrency.py
+
+import asyncio
+import unittest
+import uuid
+from app.execution.concurrency import AdaptiveLimiter, LimiterCallback, ProviderLimiterRegistry, classify_provider_error
+
+
+def limiter(initial_limit: float = 16, min_limit: int = 1, max_limit: int = 32) -> AdaptiveLimiter:
+    return AdaptiveLimiter("test", initial_limit, min_limit, max_limit, backoff_ratio=0.5, latency_tolerance=2.0)
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+class ResourceExhausted(Exception):
+    """Named like google.api_core's quota error, which carries no HTTP status attribute here."""
+
+
+class ClassifyProviderErrorTest(unittest.TestCase):
+    def test_status_codes(self):
+        self.assertEqual(classify_provider_error(ThrottledError()), "throttled")
+        error = Exception("upstream failed")
+        error.response = type("Response", (), {"status_code": 503})()
+        self.assertEqual(classify_provider_error(error), "server_error")
+
+    def test_exception_types(self):
+        self.assertEqual(classify_provider_error(ResourceExhausted("quota")), "throttled")
+
+    def test_numbers_in_the_message_are_ignored(self):
+        self.assertEqual(classify_provider_error(ValueError("prompt has 4290 tokens, max is 4096")), "error")
+        self.assertEqual(classify_provider_error(ConnectionError("connect to 10.0.0.5:5003 failed (errno 500 )")), "error")
+
+    def test_wrapped_errors_are_followed(self):
+        try:
+            try:
+                raise ThrottledError("rate limited")
+            except ThrottledError as e:
+                raise RuntimeError("model call failed") from e
+        except RuntimeError as wrapper:
+            self.assertEqual(classify_provider_error(wrapper), "throttled")
+
+
+class AdaptiveLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_success_increases_additively(self):
+        l = limiter(initial_limit=4)
+        for _ in range(4):
+            await l.release(await l.acquire(), 1.0, "success")
+        # +1/limit per call: about one slot per window of `limit` calls.
+        self.assertGreater(l.limit, 4.9)
+        self.assertLess(l.limit, 5.0)
+
+    async def test_limit_stays_within_bounds(self):
+        l = limiter(initial_limit=2, min_limit=2, max_limit=3)
+        for _ in range(20):
+            await l.release(await l.acquire(), 1.0, "success")
+        self.assertEqual(l.limit, 3)
+        await l.release(await l.acquire(), 1.0, "throttled")
+        self.assertEqual(l.limit, 2)
+
+    async def test_burst_of_throttled_calls_backs_off_once(self):
+        l = limiter(initial_limit=16)
+        tickets = [await l.acquire() for _ in range(16)]
+        for ticket in tickets:
+            await l.release(ticket, 1.0, "throttled")
+        self.assertEqual(l.limit, 8)
+
+    async def test_calls_started_after_a_decrease_can_decrease_again(self):
+        l = limiter(initial_limit=16)
+        old = await l.acquire()
+        await l.release(await l.acquire(), 1.0, "throttled")
+        new = await l.acquire()
+        await l.release(old, 1.0, "server_error")
+        self.assertEqual(l.limit, 8)
+        await l.release(new, 1.0, "throttled")
+        self.assertEqual(l.limit, 4)
+
+    async def test_slow_call_decreases_the_limit(self):
+        l = limiter(initial_limit=8)
+        await l.release(await l.acquire(), 1.0, "success")
+        limit = l.limit
+        await l.release(await l.acquire(), 5.0, "success")
+        self.assertAlmostEqual(l.limit, limit * 0.5)
+
+    async def test_client_errors_and_cancellations_leave_the_limit(self):
+        l = limiter(initial_limit=8)
+        await l.release(await l.acquire(), 1.0, "error")
+        await l.release(await l.acquire(), 1.0, "cancelled")
+        self.assertEqual(l.limit, 8)
+        self.assertIsNone(l.latency_ewma)
+
+    async def test_acquire_waits_for_a_free_slot(self):
+        l = limiter(initial_limit=1)
+        ticket = await l.acquire()
+        waiter = asyncio.create_task(l.acquire())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        await l.release(ticket, 1.0, "success")
+        await asyncio.wait_for(waiter, 1)
+
+
+class ProviderLimiterRegistryTest(unittest.IsolatedAsyncioTestCase):
+    async def test_slot_classifies_exceptions(self):
+        registry = ProviderLimiterRegistry()
+        limiter = registry.get(("p", "m"))
+        initial = limiter.limit
+        with self.assertRaises(ThrottledError):
+            async with registry.slot(("p", "m")):
+                raise ThrottledError()
+        self.assertEqual(limiter.counts["throttled"], 1)
+        self.assertEqual(limiter.limit, max(limiter.min_limit, initial * limiter.backoff_ratio))
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_callback_holds_a_slot_per_model_call(self):
+        registry = ProviderLimiterRegistry()
+        limiter = registry.get(("p", "m"))
+        callback = LimiterCallback(registry, ("p", "m"))
+        run_id = uuid.uuid4()
+        await callback.on_chat_model_start({}, [[]], run_id=run_id)
+        self.assertEqual(limiter.in_flight, 1)
+        await callback.on_llm_new_token("a", run_id=run_id)
+        await callback.on_llm_end(None, run_id=run_id)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.counts["success"], 1)
+
+    async def test_callback_releases_unfinished_calls_as_cancelled(self):
+        registry = ProviderLimiterRegistry()
+        limiter = registry.get(("p", "m"))
+        callback = LimiterCallback(registry, ("p", "m"))
+        await callback.on_chat_model_start({}, [[]], run_id=uuid.uuid4())
+        await callback.release_all()
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.counts["cancelled"], 1)
@@ -0,0 +1,105 @@
+# MS6/tests/test_context_packer.py
+
+import unittest
+from unittest import mock
+from app import config
+from app.execution.build_context import BuildContext
+from app.execution.builders.prompt_builder import PromptBuilder
+from app.execution.context_packer import (
+    ContextPacker, PackItem, estimate_tokens, head_policy, packing_warnings, relevance_policy,
+    resolve_context_window, tail_policy,
+)
+from app.execution.job import Job
+
+QUOTAS = {"history": 0.3, "files": 0.4, "rag": 0.3}
+
+
+def items(source: str, *token_counts: int) -> list[PackItem]:
+    """Items of `source` whose text is exactly the given number of tokens."""
+    chars = int(config.CONTEXT_CHARS_PER_TOKEN)
+    return [PackItem(source, str(i), "x" * (tokens * chars)) for i, tokens in enumerate(token_counts)]
+
+
+class AllocationTest(unittest.TestCase):
+    def test_everything_fits(self):
+        packer = ContextPacker(1000, QUOTAS)
+        self.assertEqual(packer._allocate({"history": 100, "files": 200, "rag": 50}), {"history": 100, "files": 200, "rag": 50})
+
+    def test_budget_is_split_by_quota(self):
+        packer = ContextPacker(1000, QUOTAS)
+        self.assertEqual(packer._allocate({"history": 5000, "files": 5000, "rag": 5000}), {"history": 300, "files": 400, "rag": 300})
+
+    def test_unused_share_goes_to_the_other_sources(self):
+        packer = ContextPacker(1000, QUOTAS)
+        allocation = packer._allocate({"history": 50, "files": 5000, "rag": 0})
+        self.assertEqual(allocation["history"], 50)
+        self.assertEqual(allocation["rag"], 0)
+        self.assertEqual(allocation["files"], 950)
+
+    def test_negative_budget_allocates_nothing(self):
+        self.assertEqual(ContextPacker(-10, QUOTAS)._allocate({"files": 10}), {"files": 0})
+
+
+class PolicyTest(unittest.TestCase):
+    def test_head_keeps_the_start_and_cuts_the_first_overflowing_item(self):
+        kept = head_policy(items("files", 10, 10, 10), 15, "")
+        self.assertEqual([item.key for item in kept], ["0", "1"])
+        self.assertTrue(kept[1].truncated)
+        self.assertEqual(kept[1].tokens, 5)
+
+    def test_tail_keeps_the_most_recent_items(self):
+        history = items("history", 10, 10, 10)
+        for item in history:
+            item.splittable = False
+        self.assertEqual([item.key for item in tail_policy(history, 25, "")], ["1", "2"])
+
+    def test_relevance_prefers_documents_sharing_query_terms(self):
+        docs = [PackItem("rag", "weather", "sunny weather forecast"), PackItem("rag", "invoice", "invoice total amount due")]
+        kept = relevance_policy(docs, estimate_tokens("invoice total amount due"), "what is the invoice total?")
+        self.assertEqual([item.key for item in kept], ["invoice"])
+
+
+class PackTest(unittest.TestCase):
+    def test_report_lists_dropped_and_truncated_items(self):
+        packer = ContextPacker(100, QUOTAS, {"history": "tail", "files": "head", "rag": "relevance"})
+        packed, report = packer.pack({"history": [], "files": items("files", 80, 80), "rag": []}, "question")
+        self.assertEqual(report["used"]["files"], 100)
+        self.assertEqual(report["truncated"], [{"source": "files", "key": "1"}])
+        self.assertEqual(report["dropped"], [])
+
+    def test_warnings_summarize_what_was_cut(self):
+        report = {"context_window": 8192, "dropped": [{"source": "history", "key": "0", "tokens": 5}],
+                  "truncated": [{"source": "files", "key": "0"}]}
+        self.assertEqual(packing_warnings(report), [
+            "The context did not fit the model's window of 8192 tokens and was cut (history: 1 dropped; files: 1 truncated)."
+        ])
+        self.assertEqual(packing_warnings(report, ignore_sources=("history", "files")), [])
+        self.assertEqual(packing_warnings({}), [])
+
+
+def job(parameters: dict = None) -> Job:
+    return Job({
+        "job_id": "job-1",
+        "query": {"prompt": "Summarize the file.", "parameter_overrides": parameters or {}},
+        "resources": {"model_config": {"provider": "ollama"}},
+    })
+
+
+class PromptBuilderPackingTest(unittest.IsolatedAsyncioTestCase):
+    async def build(self, parameters: dict = None) -> BuildContext:
+        context = BuildContext(job(parameters))
+        context.on_the_fly_data = [{"type": "text_content", "content": "x" * 100_000}]
+        return await PromptBuilder().build(context)
+
+    @mock.patch.object(config, "CONTEXT_PACKING_ENABLED", False)
+    async def test_full_prompt_is_sent_when_the_window_is_unknown(self):
+        context = await self.build()
+        self.assertIn("x" * 100_000, context.final_input["input"])
+        self.assertEqual(context.packing_report, {})
+
+    @mock.patch.object(config, "CONTEXT_PACKING_ENABLED", False)
+    async def test_declared_window_is_respected(self):
+        context = await self.build({"num_ctx": 4096})
+        self.assertLess(estimate_tokens(context.final_input["input"]), 4096)
+        self.assertEqual(resolve_context_window(context.job)[0], 4096)
+        self.assertTrue(packing_warnings(context.packing_report))
@@ -0,0 +1,79 @@
+# MS6/tests/test_direct_providers.py
+
+import json
+import unittest
+import httpx
+from app.execution.direct_providers import (
+    DirectAdapter, DirectProviderError, GeminiAdapter, OllamaAdapter, direct_spec_for,
+)
+
+MESSAGES = [
+    {"role": "system", "content": "Be brief."},
+    {"role": "human", "content": "Hi"},
+    {"role": "human", "content": "What is 2+2?"},
+]
+
+
+class FakeHttp:
+    """Stands in for DirectHttpClient, answering every request with `handler`."""
+    def __init__(self, handler):
+        self.requests = []
+
+        def record(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return handler(request)
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+
+    def get(self) -> httpx.AsyncClient:
+        return self.client
+
+
+class DirectSpecTest(unittest.TestCase):
+    def test_ollama_parameters_are_split_into_options_and_fields(self):
+        spec = direct_spec_for("ollama", "llama3", {"temperature": 0, "num_ctx": 4096, "keep_alive": "1h"}, base_url="http://ollama:11434/")
+        self.assertEqual(spec.base_url, "http://ollama:11434")
+        self.assertEqual(spec.params, {"keep_alive": "1h", "options": {"temperature": 0, "num_ctx": 4096}})
+
+    def test_gemini_parameters_are_renamed(self):
+        spec = direct_spec_for("google", "gemini-1.5-flash", {"max_tokens": 100, "stop": "END"}, api_key="k")
+        self.assertEqual(spec.model, "models/gemini-1.5-flash")
+        self.assertEqual(spec.params["generationConfig"], {"temperature": 0.7, "maxOutputTokens": 100, "stopSequences": ["END"]})
+
+    def test_unsupported_providers_and_parameters_keep_langchain(self):
+        self.assertIsNone(direct_spec_for("openai", "gpt-4o", {}))
+        self.assertIsNone(direct_spec_for("ollama", "llama3", {"format_instructions": "x"}, base_url="http://ollama"))
+        self.assertIsNone(direct_spec_for("google", "gemini", {"safety_settings": {}}))
+
+
+class AdapterTest(unittest.IsolatedAsyncioTestCase):
+    def test_adapters_must_implement_stream(self):
+        with self.assertRaises(TypeError):
+            DirectAdapter(FakeHttp(lambda request: httpx.Response(200)))
+
+    async def test_ollama_streams_ndjson_deltas(self):
+        lines = [{"message": {"content": "4"}}, {"message": {"content": "."}}, {"done": True}]
+        http = FakeHttp(lambda request: httpx.Response(200, text="\n".join(json.dumps(line) for line in lines)))
+        spec = direct_spec_for("ollama", "llama3", {"temperature": 0}, base_url="http://ollama")
+        self.assertEqual(await OllamaAdapter(http).complete(spec, MESSAGES), "4.")
+        payload = json.loads(http.requests[0].content)
+        self.assertEqual([m["role"] for m in payload["messages"]], ["system", "user", "user"])
+        self.assertEqual(payload["options"], {"temperature": 0})
+
+    async def test_gemini_streams_sse_and_merges_turns(self):
+        events = [{"candidates": [{"content": {"parts": [{"text": "4"}]}}]}, {"candidates": [{"content": {"parts": [{"text": "."}]}}]}]
+        http = FakeHttp(lambda request: httpx.Response(200, text="".join(f"data: {json.dumps(e)}\n\n" for e in events)))
+        spec = direct_spec_for("google", "gemini-1.5-flash", {}, api_key="secret")
+        self.assertEqual(await GeminiAdapter(http).complete(spec, MESSAGES), "4.")
+        request = http.requests[0]
+        self.assertEqual(request.headers["x-goog-api-key"], "secret")
+        payload = json.loads(request.content)
+        self.assertEqual(payload["systemInstruction"], {"parts": [{"text": "Be brief."}]})
+        self.assertEqual(payload["contents"], [{"role": "user", "parts": [{"text": "Hi"}, {"text": "What is 2+2?"}]}])
+
+    async def test_http_errors_carry_the_status_code(self):
+        http = FakeHttp(lambda request: httpx.Response(429, text="slow down"))
+        spec = direct_spec_for("ollama", "llama3", {}, base_url="http://ollama")
+        with self.assertRaises(DirectProviderError) as raised:
+            await OllamaAdapter(http).complete(spec, MESSAGES)
+        self.assertEqual(raised.exception.status_code, 429)
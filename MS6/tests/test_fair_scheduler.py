@@ -0,0 +1,101 @@
+# MS6/tests/test_fair_scheduler.py
+
+import asyncio
+import unittest
+from app.messaging.fair_scheduler import FairScheduler
+
+
+def scheduler(max_concurrent: int = 4, weights: dict = None, caps: dict = None, default_cap: int = 0) -> FairScheduler:
+    return FairScheduler(max_concurrent, weights=weights or {}, default_weight=1.0, caps=caps or {}, default_cap=default_cap)
+
+
+class FairSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_does_not_starve_other_tenant(self):
+        s = scheduler(max_concurrent=1)
+        for i in range(50):
+            await s.submit("a", f"a{i}")
+        await s.submit("b", "b0")
+
+        picked = []
+        for _ in range(3):
+            tenant, item, _ = await s.next()
+            picked.append(item)
+            await s.release(tenant)
+        self.assertIn("b0", picked[:2])
+
+    async def test_weights_share_slots_proportionally(self):
+        s = scheduler(max_concurrent=1, weights={"a": 3.0, "b": 1.0})
+        for i in range(40):
+            await s.submit("a", i)
+            await s.submit("b", i)
+
+        counts = {"a": 0, "b": 0}
+        for _ in range(40):
+            tenant, _, _ = await s.next()
+            counts[tenant] += 1
+            await s.release(tenant)
+        self.assertEqual(counts, {"a": 30, "b": 10})
+
+    async def test_priority_orders_jobs_of_a_tenant(self):
+        s = scheduler()
+        await s.submit("a", "low", priority=1)
+        await s.submit("a", "high", priority=5)
+        _, item, _ = await s.next()
+        self.assertEqual(item, "high")
+
+    async def test_next_waits_for_a_free_slot(self):
+        s = scheduler(max_concurrent=1)
+        await s.submit("a", 1)
+        await s.submit("a", 2)
+        tenant, _, _ = await s.next()
+
+        waiting = asyncio.create_task(s.next())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        await s.release(tenant)
+        _, item, _ = await asyncio.wait_for(waiting, 1)
+        self.assertEqual(item, 2)
+
+    async def test_capped_tenant_is_skipped(self):
+        s = scheduler(caps={"a": 1})
+        await s.submit("a", "a0")
+        await s.submit("a", "a1")
+        await s.submit("b", "b0")
+        await s.next()  # a0
+        _, item, _ = await s.next()
+        self.assertEqual(item, "b0")
+        self.assertIsNone(s._pick())
+
+    async def test_take_blocked_returns_surplus_of_capped_tenants(self):
+        s = scheduler(max_concurrent=4, caps={"a": 1})
+        for i in range(6):
+            await s.submit("a", f"a{i}", priority=1 if i == 5 else 0)
+        await s.next()  # a5, the highest priority
+
+        blocked = await s.take_blocked(keep=1)
+        # a0 is kept to start when a5 finishes; the newest go first.
+        self.assertEqual([item for _, item in blocked], ["a4", "a3", "a2", "a1"])
+        self.assertEqual(s.snapshot()["a"], {"queued": 1, "running": 1})
+
+        await s.release("a")
+        _, item, _ = await s.next()
+        self.assertEqual(item, "a0")
+
+    async def test_take_blocked_keeps_jobs_when_something_can_start(self):
+        s = scheduler(max_concurrent=4, caps={"a": 1})
+        for i in range(3):
+            await s.submit("a", f"a{i}")
+        await s.next()
+        await s.submit("b", "b0")
+        self.assertEqual(await s.take_blocked(), [])
+
+    async def test_take_blocked_keeps_jobs_when_all_slots_are_busy(self):
+        s = scheduler(max_concurrent=1, caps={"a": 1})
+        for i in range(3):
+            await s.submit("a", f"a{i}")
+        await s.next()
+        self.assertEqual(await s.take_blocked(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# MS6/tests/test_job_ownership.py
+
+import unittest
+from app.messaging.job_ownership import INSTANCE_KEY, PENDING_CANCEL_KEY, JobOwnershipRegistry, instance_routing_key
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append(lambda: self.redis.values.__setitem__(key, value))
+
+    def get(self, key):
+        self.commands.append(lambda: self.redis.values.get(key))
+
+    async def execute(self):
+        if self.redis.down:
+            raise ConnectionError("redis is down")
+        return [command() for command in self.commands]
+
+
+class FakeRedis:
+    def __init__(self, down: bool = False):
+        self.values = {}
+        self.down = down
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def delete(self, key):
+        if self.down:
+            raise ConnectionError("redis is down")
+        self.values.pop(key, None)
+
+
+def registry(redis: FakeRedis) -> JobOwnershipRegistry:
+    job_ownership = JobOwnershipRegistry("redis://unused", "ms6-a", ttl_seconds=60)
+    job_ownership._redis = redis
+    return job_ownership
+
+
+class JobOwnershipTest(unittest.IsolatedAsyncioTestCase):
+    async def test_register_claims_the_job_until_unregistered(self):
+        redis = FakeRedis()
+        job_ownership = registry(redis)
+        self.assertIsNone(await job_ownership.register("job-1"))
+        self.assertEqual(redis.values[INSTANCE_KEY.format(job_id="job-1")], "ms6-a")
+        await job_ownership.unregister("job-1")
+        self.assertEqual(redis.values, {})
+
+    async def test_register_returns_an_early_cancellation(self):
+        redis = FakeRedis()
+        redis.values[PENDING_CANCEL_KEY.format(job_id="job-1")] = "user-7"
+        self.assertEqual(await registry(redis).register("job-1"), "user-7")
+
+    async def test_redis_failures_do_not_stop_the_job(self):
+        job_ownership = registry(FakeRedis(down=True))
+        self.assertIsNone(await job_ownership.register("job-1"))
+        await job_ownership.unregister("job-1")
+
+    def test_routing_key_names_the_instance(self):
+        self.assertEqual(instance_routing_key("ms6-a"), "job.cancel.ms6-a")
@@ -0,0 +1,108 @@
+# MS6/tests/test_map_reduce.py
+
+import unittest
+from unittest import mock
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from app import config
+from app.execution.build_context import BuildContext
+from app.execution.job import Job
+from app.execution.map_reduce import MapReduceExecutor, NOTHING_RELEVANT, split_text
+
+
+class SplitTextTest(unittest.TestCase):
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(split_text("short", 100, 10), ["short"])
+
+    def test_chunks_prefer_paragraph_ends_and_overlap(self):
+        text = ("a" * 60 + "\n\n") * 4
+        chunks = split_text(text, 100, 10)
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertTrue(chunks[0].endswith("\n\n"))
+        # Each chunk starts with the tail of the previous one.
+        self.assertTrue(chunks[1].startswith(chunks[0][-10:]))
+        self.assertTrue(text.endswith(chunks[-1]))
+
+    def test_text_without_separators_is_cut_at_the_window(self):
+        chunks = split_text("x" * 250, 100, 0)
+        self.assertEqual([len(chunk) for chunk in chunks], [100, 100, 50])
+
+
+def context(strategy: str = "map_reduce", truncated_source: str = "files") -> BuildContext:
+    job = Job({
+        "job_id": "job-1",
+        "query": {"prompt": "What is the total?", "parameter_overrides": {"num_ctx": 4096, "num_predict": 256},
+                  "output_config": {"execution_strategy": strategy}},
+        "resources": {"model_config": {"provider": "ollama"}},
+    })
+    built = BuildContext(job)
+    built.packing_report = {"truncated": [{"source": truncated_source, "key": "0"}], "dropped": []}
+    return built
+
+
+class GroupTest(unittest.TestCase):
+    def test_notes_are_grouped_to_fit_the_budget(self):
+        executor = MapReduceExecutor(context(), publisher=None)
+        executor.budget = 100
+        note = "n" * int(40 * config.CONTEXT_CHARS_PER_TOKEN)
+        groups = executor._group([note] * 5)
+        self.assertEqual([len(group) for group in groups], [2, 2, 1])
+
+    def test_a_group_takes_at_least_two_notes(self):
+        executor = MapReduceExecutor(context(), publisher=None)
+        executor.budget = 10
+        long_note = "n" * 1000
+        self.assertEqual([len(group) for group in executor._group([long_note] * 3)], [2, 1])
+
+
+class AppliesTest(unittest.TestCase):
+    def test_only_opted_in_jobs_with_cut_files(self):
+        self.assertTrue(MapReduceExecutor.applies(context()))
+        self.assertFalse(MapReduceExecutor.applies(context(strategy="standard")))
+        self.assertFalse(MapReduceExecutor.applies(context(truncated_source="history")))
+
+
+class NotesModel:
+    """Takes a note from the chunks that mention the total; the final call answers."""
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        prompt = messages[-1].content
+        self.prompts.append(prompt)
+        if prompt.startswith("Below is part"):
+            return AIMessage(content="note: total 42" if "total 42" in prompt else NOTHING_RELEVANT)
+        return AIMessage(content="The total is 42.")
+
+
+class FakePublisher:
+    def __init__(self):
+        self.final = None
+
+    async def publish_final_result(self, job_id, result, metadata=None, warnings=None):
+        self.final = (result, metadata, warnings)
+
+    async def publish_memory_update(self, job, final_result, final_input):
+        pass
+
+
+class RunTest(unittest.IsolatedAsyncioTestCase):
+    @mock.patch.object(config, "MAP_REDUCE_MIN_CHUNK_TOKENS", 10)
+    @mock.patch.object(config, "MAP_REDUCE_CHUNK_TOKENS", 50)
+    @mock.patch.object(config, "MAP_REDUCE_CHUNK_OVERLAP_TOKENS", 0)
+    async def test_chunks_are_mapped_and_the_relevant_notes_answered(self):
+        built = context()
+        paragraph = "filler " * 25
+        built.on_the_fly_data = [{"type": "text_content", "content": f"{paragraph}\n\ntotal 42\n\n{paragraph}"}]
+        built.llm = NotesModel()
+        built.prompt_template = ChatPromptTemplate.from_messages([("human", "{input}")])
+        publisher = FakePublisher()
+
+        result = await MapReduceExecutor(built, publisher).run()
+        self.assertEqual(result, "The total is 42.")
+        report = publisher.final[1]["map_reduce"]
+        self.assertGreater(report["chunks"], 1)
+        self.assertEqual(report["relevant_chunks"], 1)
+        self.assertEqual(report["reduce_levels"], 0)
+        self.assertIn("note: total", built.llm.prompts[-1])
+        self.assertEqual(publisher.final[2], [])
@@ -0,0 +1,47 @@
+# MS6/tests/test_metrics.py
+
+import asyncio
+import unittest
+from unittest import mock
+from app import config
+from app import metrics
+
+
+class BoundedLabelTest(unittest.TestCase):
+    def setUp(self):
+        metrics._label_values.clear()
+
+    @mock.patch.object(config, "METRICS_MAX_LABEL_VALUES", 2)
+    def test_values_past_the_cap_share_other(self):
+        self.assertEqual([metrics.tool_label(name) for name in ("a", "b", "c", "a")], ["a", "b", "other", "a"])
+
+    @mock.patch.object(config, "METRICS_MAX_LABEL_VALUES", 1)
+    def test_each_label_has_its_own_cap(self):
+        self.assertEqual(metrics.tool_label("search"), "search")
+        self.assertEqual(metrics.tenant_label("acme"), "acme")
+        self.assertEqual(metrics.tool_label("terminal"), "other")
+
+
+class MetricsServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = await asyncio.start_server(metrics.MetricsServer()._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_serves_metrics(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n")
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        self.assertTrue(response.startswith(b"HTTP/1.1 200 OK"))
+        self.assertIn(b"ms6_jobs_total", response)
+
+    @mock.patch.object(config, "METRICS_REQUEST_TIMEOUT_SECONDS", 0.05)
+    async def test_idle_connection_is_closed(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(b"GET /metrics HTTP/1.1\r\n")
+        self.assertEqual(await asyncio.wait_for(reader.read(), 5), b"")
+        writer.close()
@@ -0,0 +1,91 @@
+# MS6/tests/test_ollama_models.py
+
+import json
+import time
+import unittest
+from unittest import mock
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.messages import AIMessage
+from app import config
+from app.execution.job import Job
+from app.execution.ollama_models import USAGE_KEY, OllamaLoadObserver, OllamaModelManager
+from app.metrics import OLLAMA_COLD_STARTS_TOTAL, model_label
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    async def hset(self, key, field_name, value):
+        self.hashes.setdefault(key, {})[field_name] = value
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hdel(self, key, *field_names):
+        for field_name in field_names:
+            self.hashes.get(key, {}).pop(field_name, None)
+
+
+def manager() -> OllamaModelManager:
+    models = OllamaModelManager("redis://unused")
+    models._redis = FakeRedis()
+    return models
+
+
+def job(**parameters) -> Job:
+    return Job({"job_id": "job-1", "query": {"parameter_overrides": parameters}, "resources": {"model_config": {"provider": "ollama"}}})
+
+
+def cold_starts(model: str) -> float:
+    return OLLAMA_COLD_STARTS_TOTAL.labels(model=model_label(model))._value.get()
+
+
+class ResidencyParamsTest(unittest.TestCase):
+    @mock.patch.object(config, "OLLAMA_KEEP_ALIVE", "30m")
+    def test_every_request_gets_the_same_window_and_keep_alive(self):
+        self.assertEqual(OllamaModelManager.residency_params(job(), {}),
+                         {"num_ctx": config.CONTEXT_WINDOW_DEFAULTS["ollama"], "keep_alive": "30m"})
+
+    @mock.patch.object(config, "OLLAMA_KEEP_ALIVE", "30m")
+    def test_parameters_the_job_sets_are_kept(self):
+        params = {"num_ctx": 4096, "keep_alive": -1}
+        self.assertEqual(OllamaModelManager.residency_params(job(**params), params), {})
+
+
+@mock.patch.object(config, "OLLAMA_COLD_START_THRESHOLD_SECONDS", 0.5)
+class ObserveLoadTest(unittest.TestCase):
+    def test_only_slow_loads_are_cold_starts(self):
+        before = cold_starts("llama3")
+        self.assertFalse(OllamaModelManager.observe_load("llama3", None))
+        self.assertFalse(OllamaModelManager.observe_load("llama3", 10_000_000))
+        self.assertTrue(OllamaModelManager.observe_load("llama3", 2_000_000_000))
+        self.assertEqual(cold_starts("llama3") - before, 1)
+
+    def test_callback_reads_the_load_duration(self):
+        before = cold_starts("mistral")
+        generation = ChatGeneration(message=AIMessage(content="hi"), generation_info={"load_duration": 3_000_000_000})
+        OllamaLoadObserver("mistral").on_llm_end(LLMResult(generations=[[generation]]))
+        self.assertEqual(cold_starts("mistral") - before, 1)
+
+
+class HotModelsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_use_is_recorded_at_most_once_per_interval(self):
+        models = manager()
+        await models.record_use("http://ollama", "llama3", {"num_ctx": 8192, "keep_alive": "30m"})
+        models._redis.hashes[USAGE_KEY].clear()
+        await models.record_use("http://ollama", "llama3", {"num_ctx": 8192, "keep_alive": "30m"})
+        self.assertEqual(models._redis.hashes[USAGE_KEY], {})
+
+    @mock.patch.object(config, "OLLAMA_PRELOAD_MAX_MODELS", 1)
+    @mock.patch.object(config, "OLLAMA_HOT_MODEL_WINDOW_SECONDS", 3600)
+    async def test_recent_models_per_server_most_recent_first(self):
+        models = manager()
+        now = time.time()
+        usage = models._redis.hashes.setdefault(USAGE_KEY, {})
+        for base_url, model, age in (("http://a", "old", 10), ("http://a", "new", 1), ("http://b", "x", 5), ("http://b", "stale", 7200)):
+            usage[json.dumps([base_url, model])] = json.dumps({"num_ctx": 8192, "keep_alive": "30m", "last_used": now - age})
+
+        hot = await models.hot_models()
+        self.assertEqual([(m.base_url, m.model, m.num_ctx) for m in hot], [("http://a", "new", 8192), ("http://b", "x", 8192)])
+        self.assertNotIn(json.dumps(["http://b", "stale"]), usage)
@@ -0,0 +1,89 @@
+# MS6/tests/test_publisher.py
+
+import asyncio
+import unittest
+from unittest import mock
+from app import config
+from app.messaging.publisher import PublishNotConfirmedError, ResultPublisher
+
+
+class FakeExchange:
+    def __init__(self, broker: "FakeBroker"):
+        self.broker = broker
+
+    async def publish(self, message, routing_key: str):
+        await asyncio.sleep(0)
+        if self.broker.failures > 0:
+            self.broker.failures -= 1
+            raise ConnectionError("channel closed")
+        self.broker.confirmed.append((routing_key, message.body))
+
+
+class FakeChannel:
+    def __init__(self, broker: "FakeBroker"):
+        self.broker = broker
+        self.is_closed = False
+
+    async def declare_exchange(self, name, *args, **kwargs):
+        return FakeExchange(self.broker)
+
+
+class FakeBroker:
+    """Stands in for the robust connection; the first `failures` publishes are not confirmed."""
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.confirmed = []
+        self.channels = []
+        self.is_closed = False
+        self.reconnect_callbacks = set()
+
+    async def channel(self, publisher_confirms: bool = True):
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+
+
+@mock.patch.object(config, "PUBLISHER_CONFIRM_RETRY_DELAY_SECONDS", 0.0)
+@mock.patch.object(config, "PUBLISHER_CONFIRM_RETRIES", 2)
+class ResultPublisherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_wait_for_job_returns_once_results_are_confirmed(self):
+        broker = FakeBroker()
+        publisher = ResultPublisher(broker, pool_size=1)
+        await publisher.publish_final_result("job-1", "answer")
+        await publisher.wait_for_job("job-1", timeout=1)
+        self.assertEqual([key for key, _ in broker.confirmed], ["inference.result.final"])
+        self.assertEqual(publisher._unconfirmed, {})
+
+    async def test_failed_confirm_is_resent_without_a_reconnect(self):
+        broker = FakeBroker(failures=2)
+        publisher = ResultPublisher(broker, pool_size=1)
+        await publisher.publish_final_result("job-1", "answer")
+        await publisher.wait_for_job("job-1", timeout=1)
+        self.assertEqual(len(broker.confirmed), 1)
+        self.assertEqual(publisher._unconfirmed, {})
+
+    async def test_closed_channel_is_reopened_for_the_retry(self):
+        broker = FakeBroker(failures=1)
+        publisher = ResultPublisher(broker, pool_size=1)
+        await publisher.publish_error_result("job-1", "boom")
+        broker.channels[0].is_closed = True
+        await publisher.wait_for_job("job-1", timeout=1)
+        self.assertEqual(len(broker.channels), 2)
+        self.assertEqual(len(broker.confirmed), 1)
+
+    async def test_unconfirmed_result_fails_the_wait_and_is_kept_for_replay(self):
+        broker = FakeBroker(failures=10)
+        publisher = ResultPublisher(broker, pool_size=1)
+        await publisher.publish_final_result("job-1", "answer")
+        with self.assertRaises(PublishNotConfirmedError):
+            await publisher.wait_for_job("job-1", timeout=1)
+        self.assertEqual(len(publisher._unconfirmed), 1)
+
+        broker.failures = 0
+        await publisher.replay_unconfirmed()
+        await publisher.wait_for_confirms()
+        self.assertEqual(publisher._unconfirmed, {})
+
+    async def test_wait_for_job_without_results_returns_at_once(self):
+        publisher = ResultPublisher(FakeBroker(), pool_size=1)
+        await publisher.wait_for_job("job-without-results", timeout=0)
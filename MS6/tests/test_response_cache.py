@@ -0,0 +1,128 @@
+# MS6/tests/test_response_cache.py
+
+import asyncio
+import unittest
+from unittest import mock
+from app import config
+from app.execution.job import Job
+from app.execution.response_cache import ResponseCache
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append(lambda: self.redis.values.__setitem__(key, value))
+
+    def zadd(self, name, mapping):
+        self.commands.append(lambda: self.redis.index.update(mapping))
+
+    def zcard(self, name):
+        self.commands.append(lambda: len(self.redis.index))
+
+    async def execute(self):
+        return [command() for command in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.index = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def zpopmin(self, name, count):
+        oldest = sorted(self.index.items(), key=lambda item: item[1])[:count]
+        for member, _ in oldest:
+            del self.index[member]
+        return oldest
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+def cache(max_entries: int = 10) -> ResponseCache:
+    response_cache = ResponseCache("redis://unused", ttl_seconds=60, max_entries=max_entries, max_entry_bytes=1_000)
+    response_cache._redis = FakeRedis()
+    return response_cache
+
+
+def job(temperature=0, **resources) -> Job:
+    return Job({
+        "job_id": "job-1",
+        "query": {"prompt": "What is 2+2?", "parameter_overrides": {"temperature": temperature}},
+        "resources": {"model_config": {"provider": "fake"}, **resources},
+    })
+
+
+@mock.patch.object(config, "RESPONSE_CACHE_ENABLED", True)
+class KeyForTest(unittest.TestCase):
+    def test_only_deterministic_stateless_jobs_are_eligible(self):
+        self.assertIsNotNone(cache().key_for(job()))
+        self.assertIsNone(cache().key_for(job(temperature=0.7)))
+        self.assertIsNone(cache().key_for(job(tools=[{"name": "search"}])))
+        self.assertIsNone(cache().key_for(job(memory_context={"history": [{"role": "user", "content": "hi"}]})))
+
+    def test_identical_jobs_share_a_key(self):
+        self.assertEqual(cache().key_for(job()), cache().key_for(job()))
+
+
+class RunTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_identical_jobs_share_one_execution(self):
+        response_cache = cache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "4"
+
+        results = await asyncio.gather(*(response_cache.run("k", compute) for _ in range(3)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(source for _, source in results), ["coalesced", "coalesced", "miss"])
+        self.assertEqual(await response_cache.run("k", compute), ("4", "hit"))
+
+    async def test_followers_run_themselves_when_the_leader_fails(self):
+        response_cache = cache()
+        attempts = []
+
+        async def compute():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise RuntimeError("provider down")
+            return "4"
+
+        leader, follower = await asyncio.gather(response_cache.run("k", compute), response_cache.run("k", compute),
+                                                return_exceptions=True)
+        self.assertIsInstance(leader, RuntimeError)
+        self.assertEqual(follower, ("4", "miss"))
+
+    async def test_empty_results_are_not_cached(self):
+        response_cache = cache()
+
+        async def compute():
+            return ""
+
+        await response_cache.run("k", compute)
+        self.assertEqual(response_cache._redis.values, {})
+
+    async def test_oldest_entries_are_evicted_past_the_cap(self):
+        response_cache = cache(max_entries=1)
+        await response_cache.set("a", "1")
+        await asyncio.sleep(0.001)
+        await response_cache.set("b", "2")
+        self.assertEqual(response_cache._redis.values, {"b": "2"})
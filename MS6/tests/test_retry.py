@@ -0,0 +1,67 @@
+# MS6/tests/test_retry.py
+
+import unittest
+from unittest import mock
+import aio_pika
+from app import config
+from app.execution.job import InvalidJobError, Job
+from app.internals.claim_check import ClaimCheckExpiredError
+from app.messaging.publisher import ResultPublisher
+from app.messaging.retry import LAST_ERROR_HEADER, RETRY_COUNT_HEADER, copy_message, is_retryable, retry_count, retry_delay
+from tests.test_publisher import FakeBroker
+
+
+class IsRetryableTest(unittest.TestCase):
+    def test_invalid_jobs_are_not_retried(self):
+        with self.assertRaises(InvalidJobError) as raised:
+            Job(["not", "a", "dict"])
+        self.assertFalse(is_retryable(raised.exception))
+        self.assertFalse(is_retryable(ClaimCheckExpiredError("gone")))
+
+    def test_other_errors_are_retried(self):
+        # Provider SDKs raise plain ValueErrors and KeyErrors for transient failures too.
+        for error in (ValueError("bad gateway payload"), KeyError("choices"), TypeError("None"), ConnectionError()):
+            self.assertTrue(is_retryable(error), error)
+
+
+class RetryDelayTest(unittest.TestCase):
+    @mock.patch.object(config, "JOB_RETRY_BASE_DELAY_SECONDS", 2)
+    @mock.patch.object(config, "JOB_RETRY_MAX_DELAY_SECONDS", 10)
+    def test_delay_doubles_up_to_the_cap(self):
+        self.assertEqual([retry_delay(attempt) for attempt in (1, 2, 3, 4)], [2, 4, 8, 10])
+
+
+class IncomingMessage:
+    def __init__(self, headers: dict):
+        self.body = b'{"job_id": "job-1"}'
+        self.headers = headers
+        self.content_type = "application/json"
+        self.content_encoding = None
+        self.priority = 3
+        self.timestamp = None
+
+
+class CopyMessageTest(unittest.TestCase):
+    def test_copy_updates_headers_and_drops_broker_ones(self):
+        original = IncomingMessage({RETRY_COUNT_HEADER: 1, LAST_ERROR_HEADER: "boom", "x-death": [{}], "x-tenant": "acme"})
+        copy = copy_message(original, **{RETRY_COUNT_HEADER: 2, LAST_ERROR_HEADER: None})
+        self.assertEqual(copy.headers, {RETRY_COUNT_HEADER: 2, "x-tenant": "acme"})
+        self.assertEqual(copy.body, original.body)
+        self.assertEqual(copy.priority, 3)
+        self.assertEqual(copy.delivery_mode, aio_pika.DeliveryMode.PERSISTENT)
+
+    def test_retry_count_tolerates_bad_headers(self):
+        self.assertEqual(retry_count(IncomingMessage(None)), 0)
+        self.assertEqual(retry_count(IncomingMessage({RETRY_COUNT_HEADER: "x"})), 0)
+        self.assertEqual(retry_count(IncomingMessage({RETRY_COUNT_HEADER: "2"})), 2)
+
+
+class StreamedJobTest(unittest.IsolatedAsyncioTestCase):
+    async def test_streamed_jobs_are_tracked_until_forgotten(self):
+        publisher = ResultPublisher(FakeBroker(), pool_size=1)
+        self.assertFalse(publisher.has_streamed("job-1"))
+        await publisher.publish_stream_chunk("job-1", "Hello", seq=0)
+        self.assertTrue(publisher.has_streamed("job-1"))
+        self.assertFalse(publisher.has_streamed("job-2"))
+        publisher.forget_job("job-1")
+        self.assertFalse(publisher.has_streamed("job-1"))
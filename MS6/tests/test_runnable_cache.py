@@ -0,0 +1,34 @@
+# MS6/tests/test_runnable_cache.py
+
+import unittest
+from app.execution.runnable_cache import RunnableCache, content_hash
+
+
+class ContentHashTest(unittest.TestCase):
+    def test_key_order_is_ignored(self):
+        self.assertEqual(content_hash({"a": 1, "b": [1, 2]}), content_hash({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(content_hash({"a": 1}), content_hash({"a": 2}))
+
+
+class RunnableCacheTest(unittest.TestCase):
+    def test_factory_runs_once_per_key(self):
+        cache = RunnableCache()
+        calls = []
+        first = cache.get_or_create("tool_shell", "k", lambda: calls.append(1) or object())
+        second = cache.get_or_create("tool_shell", "k", lambda: calls.append(1) or object())
+        self.assertIs(first, second)
+        self.assertEqual((len(calls), cache.hits, cache.misses), (1, 1, 1))
+
+    def test_namespaces_do_not_collide(self):
+        cache = RunnableCache()
+        self.assertEqual(cache.get_or_create("prompt", "k", lambda: "prompt"), "prompt")
+        self.assertEqual(cache.get_or_create("agent", "k", lambda: "agent"), "agent")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = RunnableCache(max_size=2)
+        cache.get_or_create("n", "a", lambda: "a")
+        cache.get_or_create("n", "b", lambda: "b")
+        cache.get_or_create("n", "a", lambda: "a")
+        cache.get_or_create("n", "c", lambda: "c")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_or_create("n", "b", lambda: "rebuilt"), "rebuilt")
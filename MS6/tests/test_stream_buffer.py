@@ -0,0 +1,52 @@
+# MS6/tests/test_stream_buffer.py
+
+import asyncio
+import unittest
+from app.messaging.stream_buffer import StreamChunkBuffer
+
+
+class FakePublisher:
+    def __init__(self):
+        self.messages = []
+
+    async def publish_stream_chunk(self, job_id: str, content: str, seq: int = None):
+        self.messages.append((seq, "chunk", content))
+
+    async def publish_stream_event(self, job_id: str, event: dict, seq: int = None):
+        self.messages.append((seq, "event", event))
+
+
+class StreamChunkBufferTest(unittest.IsolatedAsyncioTestCase):
+    async def test_chunks_are_coalesced_until_max_bytes(self):
+        publisher = FakePublisher()
+        buffer = StreamChunkBuffer(publisher, "job-1", window_ms=10_000, max_bytes=6)
+        for token in ("ab", "cd", "ef", "g"):
+            await buffer.add(token)
+        self.assertEqual(publisher.messages, [(0, "chunk", "abcdef")])
+        self.assertEqual(await buffer.close(), "abcdefg")
+        self.assertEqual(publisher.messages[-1], (1, "chunk", "g"))
+
+    async def test_quiet_period_is_flushed_by_the_timer(self):
+        publisher = FakePublisher()
+        buffer = StreamChunkBuffer(publisher, "job-1", window_ms=10, max_bytes=1_000)
+        await buffer.add("hello")
+        self.assertEqual(publisher.messages, [])
+        await asyncio.sleep(0.05)
+        self.assertEqual(publisher.messages, [(0, "chunk", "hello")])
+
+    async def test_events_follow_pending_text_in_sequence(self):
+        publisher = FakePublisher()
+        buffer = StreamChunkBuffer(publisher, "job-1", window_ms=10_000, max_bytes=1_000)
+        await buffer.add("Let me check.")
+        await buffer.publish_event({"type": "tool", "event": "started"})
+        self.assertEqual([(seq, kind) for seq, kind, _ in publisher.messages], [(0, "chunk"), (1, "event")])
+        self.assertEqual(await buffer.close(), "Let me check.")
+
+    async def test_discard_publishes_nothing(self):
+        publisher = FakePublisher()
+        buffer = StreamChunkBuffer(publisher, "job-1", window_ms=10, max_bytes=1_000)
+        await buffer.add("partial")
+        self.assertTrue(buffer.has_output)
+        buffer.discard()
+        await asyncio.sleep(0.05)
+        self.assertEqual(publisher.messages, [])
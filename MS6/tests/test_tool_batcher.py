@@ -0,0 +1,101 @@
+# MS6/tests/test_tool_batcher.py
+
+import asyncio
+import time
+import unittest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from app.execution.job import Job
+from app.internals.tool_batcher import ToolCallBatcher, ToolStepCallback
+
+
+class FakeToolClient:
+    def __init__(self, hold: bool = False):
+        self.batches = []
+        # Structure: [ (job_id, [tool_call_id]) ] of CancelToolCalls requests
+        self.cancelled = []
+        # When set, batches stay in flight until `release` is set.
+        self.release = asyncio.Event() if hold else None
+
+    async def execute_tools(self, calls: list[dict], job_id: str = "") -> list[dict]:
+        self.batches.append([call["id"] for call in calls])
+        if self.release is not None:
+            await self.release.wait()
+        return [{"tool_call_id": call["id"], "name": call["name"], "status": "success", "output": call["id"]} for call in calls]
+
+    async def cancel_tools(self, job_id: str, tool_call_ids: list[str] = None) -> tuple[int, int]:
+        self.cancelled.append((job_id, tool_call_ids))
+        return len(tool_call_ids), len(tool_call_ids)
+
+
+def call(call_id: str, name: str = "search") -> dict:
+    return {"id": call_id, "name": name, "arguments": {}}
+
+
+def model_response(*tool_names: str) -> LLMResult:
+    message = AIMessage(content="", tool_calls=[{"name": name, "args": {}, "id": str(i)} for i, name in enumerate(tool_names)])
+    return LLMResult(generations=[[ChatGeneration(message=message)]])
+
+
+class ToolCallBatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_calls_within_the_window_share_one_batch(self):
+        client = FakeToolClient()
+        batcher = ToolCallBatcher(client, window_ms=50)
+        results = await asyncio.gather(batcher.execute_tools([call("a")]), batcher.execute_tools([call("b")]))
+        self.assertEqual(client.batches, [["a", "b"]])
+        self.assertEqual([result[0]["output"] for result in results], ["a", "b"])
+
+    async def test_complete_step_is_sent_without_waiting_for_the_window(self):
+        client = FakeToolClient()
+        batcher = ToolCallBatcher(client, window_ms=10_000)
+        batcher.expect(2)
+        started = time.perf_counter()
+        await asyncio.wait_for(asyncio.gather(batcher.execute_tools([call("a")]), batcher.execute_tools([call("b")])), 1)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(client.batches, [["a", "b"]])
+
+        # The expectation was for that step only: the next call waits for the window again.
+        pending = asyncio.create_task(batcher.execute_tools([call("c")]))
+        await asyncio.sleep(0.05)
+        self.assertFalse(pending.done())
+        pending.cancel()
+
+    async def test_callback_counts_the_batched_tools_of_the_step(self):
+        client = FakeToolClient()
+        batcher = ToolCallBatcher(client, window_ms=10_000)
+        await ToolStepCallback(batcher, {"search"}).on_llm_end(model_response("search", "read_tool_output"))
+        result = await asyncio.wait_for(batcher.execute_tools([call("a")]), 1)
+        self.assertEqual(result[0]["status"], "success")
+
+    async def test_responses_without_tool_calls_leave_the_expectation(self):
+        batcher = ToolCallBatcher(FakeToolClient(), window_ms=10_000)
+        batcher.expect(2)
+        await ToolStepCallback(batcher, {"search"}).on_llm_end(model_response())
+        self.assertEqual(batcher._expected, 2)
+
+
+class CancellationTest(unittest.IsolatedAsyncioTestCase):
+    async def test_calls_not_sent_yet_are_dropped(self):
+        client = FakeToolClient()
+        batcher = ToolCallBatcher(client, window_ms=10_000)
+        pending = asyncio.create_task(batcher.execute_tools([call("a")]))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(batcher._pending, [])
+        self.assertEqual(client.cancelled, [])
+
+    async def test_dispatched_calls_are_cancelled_in_ms7_with_one_rpc(self):
+        client = FakeToolClient(hold=True)
+        batcher = ToolCallBatcher(client, window_ms=0, job=Job({"job_id": "job-1"}))
+        steps = [asyncio.create_task(batcher.execute_tools([call(call_id)])) for call_id in ("a", "b")]
+        while not client.batches:
+            await asyncio.sleep(0)
+        for step in steps:
+            step.cancel()
+        await asyncio.gather(*steps, return_exceptions=True)
+        await asyncio.wait_for(asyncio.gather(*batcher._cancel_tasks), 1)
+        self.assertEqual(client.cancelled, [("job-1", ["a", "b"])])
+        # Nobody waits for the batch any more, so its RPC was aborted too.
+        self.assertEqual(batcher._in_flight, {})
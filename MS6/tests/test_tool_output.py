@@ -0,0 +1,111 @@
+# MS6/tests/test_tool_output.py
+
+import unittest
+from unittest import mock
+from langchain_core.messages import AIMessage
+from app import config
+from app.execution.build_context import BuildContext
+from app.execution.job import Job
+from app.execution.tool_output import (
+    OutputBudget, ToolOutputArtifacts, ToolOutputLimiter, build_pager_tool, cut_at_boundary,
+)
+
+CHARS_PER_TOKEN = int(config.CONTEXT_CHARS_PER_TOKEN)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+
+def artifacts() -> ToolOutputArtifacts:
+    store = ToolOutputArtifacts("redis://unused", ttl_seconds=60)
+    store._redis = FakeRedis()
+    return store
+
+
+class OutputBudgetTest(unittest.TestCase):
+    @mock.patch.object(config, "TOOL_OUTPUT_MAX_TOKENS", 0)
+    def test_budgets_are_opt_in(self):
+        self.assertEqual(OutputBudget.from_definition({"name": "search"}), OutputBudget(0, "truncate"))
+
+    def test_declared_budget_is_read_from_the_definition(self):
+        budget = OutputBudget.from_definition({"name": "search", "output_budget": {"max_tokens": 1500.0, "strategy": "summarize"}})
+        self.assertEqual(budget, OutputBudget(1500, "summarize"))
+
+    def test_unknown_strategy_truncates(self):
+        budget = OutputBudget.from_definition({"name": "search", "output_budget": {"max_tokens": 10, "strategy": "compress"}})
+        self.assertEqual(budget.strategy, "truncate")
+
+
+class CutAtBoundaryTest(unittest.TestCase):
+    def test_short_text_is_untouched(self):
+        self.assertEqual(cut_at_boundary("abc", 10), "abc")
+
+    def test_cut_prefers_a_line_break_in_the_second_half(self):
+        self.assertEqual(cut_at_boundary("line one\nline two\nline three", 20), "line one\nline two")
+
+    def test_cut_without_line_breaks_is_exact(self):
+        self.assertEqual(cut_at_boundary("x" * 30, 20), "x" * 20)
+
+
+class SummaryModel:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+
+    def with_config(self, **kwargs):
+        return self
+
+    async def ainvoke(self, messages):
+        if self.fail:
+            raise ConnectionError("provider down")
+        return AIMessage(content="Summary: 3 errors in build.log.")
+
+
+def limiter(store: ToolOutputArtifacts, llm=None) -> ToolOutputLimiter:
+    context = BuildContext(Job({"job_id": "job-1", "query": {"prompt": "Why did the build fail?"}}))
+    context.llm = llm
+    return ToolOutputLimiter(context, store)
+
+
+class ToolOutputLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_output_within_budget_is_untouched(self):
+        store = artifacts()
+        self.assertEqual(await limiter(store).apply("search", "short", OutputBudget(100)), "short")
+        self.assertEqual(store._redis.values, {})
+
+    @mock.patch.object(config, "TOOL_OUTPUT_PAGE_TOKENS", 50)
+    async def test_oversized_output_is_truncated_and_pageable(self):
+        store = artifacts()
+        output = "\n".join(f"line {i:03d} " + "x" * 30 for i in range(40))
+        shortened = await limiter(store).apply("search", output, OutputBudget(20))
+        self.assertTrue(shortened.startswith("line 000"))
+        self.assertIn("read_tool_output", shortened)
+        artifact_id = shortened.split("artifact_id='")[1].split("'")[0]
+
+        pager = build_pager_tool("job-1", store)
+        first = await pager.ainvoke({"artifact_id": artifact_id, "page": 1})
+        self.assertIn("page 1 of", first)
+        self.assertIn("line 000", first)
+        pages = int(first.split(" of ")[1].split("]")[0])
+        self.assertEqual(pages, -(-len(output) // (50 * CHARS_PER_TOKEN)))
+        self.assertIn("line 039", await pager.ainvoke({"artifact_id": artifact_id, "page": pages}))
+        self.assertTrue((await pager.ainvoke({"artifact_id": artifact_id, "page": pages + 1})).startswith("Error"))
+
+    async def test_pager_only_reads_its_own_job(self):
+        store = artifacts()
+        artifact_id = await store.put("job-2", "secret")
+        self.assertIn("does not exist", await build_pager_tool("job-1", store).ainvoke({"artifact_id": artifact_id}))
+
+    async def test_summarize_falls_back_to_truncation(self):
+        output = "x" * 1000
+        summarized = await limiter(artifacts(), SummaryModel()).apply("build", output, OutputBudget(20, "summarize"))
+        self.assertTrue(summarized.startswith("Summary: 3 errors"))
+        truncated = await limiter(artifacts(), SummaryModel(fail=True)).apply("build", output, OutputBudget(20, "summarize"))
+        self.assertTrue(truncated.startswith("x" * 20 * CHARS_PER_TOKEN + "\n\n["))
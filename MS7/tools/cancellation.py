@@ -0,0 +1,107 @@
+# MS7/tools/cancellation.py
+
+import contextvars
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How long CancelToolCalls waits for cancelled calls to actually finish before answering.
+RELEASE_WAIT_SECONDS = 5.0
+
+
+class CancelScope:
+    """
+    The cancellation state of one running tool call. The code holding a resource
+    (a Docker exec, an HTTP request) registers a callback with `on_cancel` that
+    releases it; `cancel()` may come from any gRPC thread.
+    """
+    def __init__(self, tool_call_id: str, job_id: str = ""):
+        self.tool_call_id = tool_call_id
+        self.job_id = job_id
+        self.cancelled_at = None
+        self.finished = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancelled_at is not None
+
+    def on_cancel(self, callback):
+        """Registers `callback` to release a resource; runs it right away if already cancelled."""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        self._run(callback)
+
+    def cancel(self) -> bool:
+        """Runs the release callbacks once. Returns False if the call was already cancelled."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.cancelled_at = time.monotonic()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._run(callback)
+        return True
+
+    def _run(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Error while releasing tool call '{self.tool_call_id}' after cancellation: {e}")
+
+
+class ToolCancellationRegistry:
+    """Tracks the running tool calls of this process by tool_call_id and job_id."""
+    def __init__(self):
+        # Structure: { tool_call_id: CancelScope }
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    def register(self, tool_call_id: str, job_id: str = "") -> CancelScope:
+        scope = CancelScope(tool_call_id, job_id)
+        with self._lock:
+            self._scopes[tool_call_id] = scope
+        return scope
+
+    def unregister(self, scope: CancelScope):
+        with self._lock:
+            if self._scopes.get(scope.tool_call_id) is scope:
+                del self._scopes[scope.tool_call_id]
+        scope.finished.set()
+        if scope.cancelled:
+            logger.info(f"Tool call '{scope.tool_call_id}' released "
+                        f"{(time.monotonic() - scope.cancelled_at) * 1000:.0f}ms after its cancellation.")
+
+    def cancel(self, job_id: str = "", tool_call_ids: list[str] = None) -> list[CancelScope]:
+        """
+        Cancels the matching running calls (all of the job's when no ids are given) and
+        returns them, including ones already being cancelled (e.g. by the aborted RPC).
+        """
+        with self._lock:
+            if tool_call_ids:
+                scopes = [self._scopes[i] for i in tool_call_ids if i in self._scopes]
+            else:
+                scopes = [scope for scope in self._scopes.values() if job_id and scope.job_id == job_id]
+        for scope in scopes:
+            scope.cancel()
+        return scopes
+
+    @staticmethod
+    def wait_released(scopes: list[CancelScope], timeout: float = RELEASE_WAIT_SECONDS) -> int:
+        """Waits up to `timeout` in total for `scopes` to finish; returns how many did."""
+        deadline = time.monotonic() + timeout
+        for scope in scopes:
+            scope.finished.wait(max(0.0, deadline - time.monotonic()))
+        return sum(1 for scope in scopes if scope.finished.is_set())
+
+
+# The scope of the tool call running in the current thread, for tools that hold releasable resources.
+current_cancel_scope = contextvars.ContextVar("current_cancel_scope", default=None)
+
+# A single, process-wide registry shared by the executor and the gRPC servicer.
+tool_cancellations = ToolCancellationRegistry()
@@ -3,6 +3,10 @@ import importlib
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from .models import Tool
+from .cancellation import CancelScope, tool_cancellations, current_cancel_scope
+
+# Upper bound on tools executed concurrently for a single ExecuteMultipleTools batch.
+MAX_PARALLEL_TOOLS = 16
 
 class ToolExecutor:
     """
@@ -18,7 +22,7 @@ class ToolExecutor:
         except (ImportError, AttributeError) as e:
             raise RuntimeError(f"Could not find or import internal function: {pointer}. Error: {e}")
 
-    def _execute_webhook(self, config: dict, arguments: dict):
+    def _execute_webhook(self, config: dict, arguments: dict, scope: CancelScope = None):
         url = config.get("url")
         if not url:
             raise ValueError("Webhook execution config is missing 'url'.")
@@ -32,6 +36,9 @@ class ToolExecutor:
             headers["Authorization"] = f"Bearer {token}"
             
         with httpx.Client(timeout=10.0) as client:
+            if scope is not None:
+                # Closing the client from the cancelling thread closes the socket the request is blocked on.
+                scope.on_cancel(client.close)
             try:
                 response = client.post(url, json=arguments)
                 response.raise_for_status() # Raise an exception for 4xx/5xx responses
@@ -39,10 +46,16 @@ class ToolExecutor:
             except httpx.RequestError as e:
                 raise RuntimeError(f"Error calling webhook {url}: {e}")
 
-    def execute_single_tool(self, tool_call: dict) -> dict:
-        """Executes one tool call and returns the result."""
+    def execute_single_tool(self, tool_call: dict, job_id: str = "") -> dict:
+        """
+        Executes one tool call and returns the result. While it runs, the call is
+        registered under its tool_call_id and job_id so CancelToolCalls can stop it;
+        internal functions find their scope through `current_cancel_scope`.
+        """
         tool_name = tool_call.get("name")
         arguments = tool_call.get("arguments", {})
+        scope = tool_cancellations.register(tool_call.get("id"), job_id)
+        scope_token = current_cancel_scope.set(scope)
 
         try:
             tool = Tool.objects.get(name=tool_name) # Assuming user is already authorized
@@ -52,9 +65,12 @@ class ToolExecutor:
             if exec_type == "internal_function":
                 result_content = self._execute_internal_function(execution_config.get("pointer"), arguments)
             elif exec_type == "webhook":
-                result_content = self._execute_webhook(execution_config, arguments)
+                result_content = self._execute_webhook(execution_config, arguments, scope)
             else:
                 raise ValueError(f"Unknown execution type for tool '{tool_name}': {exec_type}")
+            if scope.cancelled:
+                # Whatever the tool returned after its resources were pulled away is not a real result.
+                raise RuntimeError("Tool call was cancelled.")
 
             return {
                 "tool_call_id": tool_call.get("id"),
@@ -67,30 +83,37 @@ class ToolExecutor:
                 "tool_call_id": tool_call.get("id"),
                 "name": tool_name,
                 "status": "error",
-                "output": str(e)
+                "output": "Tool call was cancelled." if scope.cancelled else str(e)
             }
+        finally:
+            current_cancel_scope.reset(scope_token)
+            tool_cancellations.unregister(scope)
 
-    def execute_parallel_tools(self, tool_calls: list[dict]) -> list[dict]:
+    def execute_parallel_tools(self, tool_calls: list[dict], job_id: str = "") -> list[dict]:
         """
         Executes a list of tool calls in parallel using a thread pool.
-        This is the primary method used by the gRPC servicer.
+        This is the primary method used by the gRPC servicer. MS6 sends all the
+        tool calls of one agent step in a single batch, so they run concurrently
+        here; results are returned in request order and carry their tool_call_id.
         """
-        results = []
-        with ThreadPoolExecutor() as executor:
-            future_to_call = {executor.submit(self.execute_single_tool, call): call for call in tool_calls}
-            for future in as_completed(future_to_call):
+        if not tool_calls:
+            return []
+        results = [None] * len(tool_calls)
+        with ThreadPoolExecutor(max_workers=min(len(tool_calls), MAX_PARALLEL_TOOLS)) as executor:
+            future_to_index = {executor.submit(self.execute_single_tool, call, job_id): i for i, call in enumerate(tool_calls)}
+            for future in as_completed(future_to_index):
+                index = future_to_index[future]
                 try:
-                    result = future.result()
-                    results.append(result)
+                    results[index] = future.result()
                 except Exception as e:
                     # This catches errors within the future execution itself
-                    call = future_to_call[future]
-                    results.append({
+                    call = tool_calls[index]
+                    results[index] = {
                         "tool_call_id": call.get("id"),
                         "name": call.get("name"),
                         "status": "error",
                         "output": f"An unexpected execution error occurred: {e}"
-                    })
+                    }
         return results
 
 # A single instance to be used by the gRPC servicer
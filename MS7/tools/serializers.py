@@ -44,7 +44,18 @@ class ToolCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("User-defined tools cannot be of type 'internal_function'.")
         else:
             raise serializers.ValidationError(f"Invalid execution type: '{exec_type}'. Must be 'webhook'.")
-            
+
+        # Optional: how much of the tool's output an agent sees before it is truncated or summarized.
+        output_budget = value.get("output_budget")
+        if output_budget is not None:
+            if not isinstance(output_budget, dict):
+                raise serializers.ValidationError("'output_budget' must be an object.")
+            max_tokens = output_budget.get("max_tokens")
+            if max_tokens is not None and (not isinstance(max_tokens, int) or isinstance(max_tokens, bool) or max_tokens < 0):
+                raise serializers.ValidationError("'output_budget.max_tokens' must be a non-negative integer.")
+            if output_budget.get("strategy") not in (None, "truncate", "summarize"):
+                raise serializers.ValidationError("'output_budget.strategy' must be 'truncate' or 'summarize'.")
+
         return value
 
 class ToolUpdateSerializer(ToolCreateSerializer):
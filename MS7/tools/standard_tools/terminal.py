@@ -1,7 +1,10 @@
 # MS7/tools/standard_tools/terminal.py
 
 import docker
+import threading
 import time
+import uuid
+from tools.cancellation import current_cancel_scope
 
 # Get the Docker client from the environment.
 # This will automatically connect to the Docker daemon running on the host.
@@ -58,6 +61,58 @@ def get_or_create_container(session_id: str):
     
     return container
 
+# Runs the command (passed as $0, which avoids quoting problems) in a child shell. The
+# wrapper records its PID for `kill_exec` and removes its files itself when it exits,
+# whether the command finished or was killed; if the cancel marker exists before the
+# command starts, it doesn't run it at all.
+EXEC_WRAPPER = (
+    'trap "rm -f {pid_file} {pid_file}.cancel" EXIT; echo $$ > {pid_file}; '
+    'if [ -e {pid_file}.cancel ]; then exit 130; fi; sh -c "$0"'
+)
+
+# Leaves the cancel marker, waits up to 2s for the wrapper to record its PID (the exec may
+# not have started yet), then kills the wrapper's descendants until the wrapper exits. The
+# descendants are listed before any is killed: a killed process's children are reparented
+# and could no longer be found. If no PID shows up, the marker is kept for a while in case
+# the exec still starts (the wrapper then removes it), and a background job removes it
+# otherwise; its output is detached so the exec returns without waiting for it.
+KILL_SCRIPT = """
+touch {pid_file}.cancel
+i=0
+while [ ! -s {pid_file} ] && [ $i -lt 20 ]; do sleep 0.1; i=$((i+1)); done
+if [ ! -s {pid_file} ]; then
+    {{ sleep {marker_ttl}; rm -f {pid_file}.cancel; }} >/dev/null 2>&1 &
+    exit 0
+fi
+pid=$(cat {pid_file})
+descendants() {{ for child in $(pgrep -P $1); do echo $child; descendants $child; done; }}
+i=0
+while kill -0 $pid 2>/dev/null && [ $i -lt 20 ]; do
+    kill -KILL $(descendants $pid) 2>/dev/null
+    sleep 0.1; i=$((i+1))
+done
+rm -f {pid_file}.cancel
+"""
+
+# How long (seconds) an unused cancel marker is kept for an exec that hasn't started yet.
+CANCEL_MARKER_TTL_SECONDS = 60
+
+def kill_exec(container, pid_file: str):
+    """Kills a running command started by `run_command` (and its child processes)."""
+    print(f"Cancelling command in container '{container.id[:12]}' ({pid_file}).")
+    try:
+        container.exec_run(cmd=["sh", "-c", KILL_SCRIPT.format(pid_file=pid_file, marker_ttl=CANCEL_MARKER_TTL_SECONDS)])
+    except Exception as e:
+        print(f"Could not cancel command in container '{container.id[:12]}': {e}")
+
+def kill_exec_in_background(container, pid_file: str):
+    """
+    Runs `kill_exec` in its own thread: the kill can take a few seconds, and the cancel
+    callback runs on the thread that is cancelling every tool call of the job.
+    """
+    threading.Thread(target=kill_exec, args=(container, pid_file), daemon=True,
+                     name=f"kill-exec-{pid_file.rsplit('/', 1)[-1]}").start()
+
 def run_command(command: str, session_id: str) -> str:
     """
     Executes a shell command inside a secure, sandboxed Docker container
@@ -78,8 +133,19 @@ def run_command(command: str, session_id: str) -> str:
     try:
         container = get_or_create_container(session_id)
         
-        # Execute the command inside the running container.
-        exit_code, output = container.exec_run(cmd=f"sh -c '{command}'")
+        # Execute the command inside the running container, in a wrapper that lets a
+        # cancelled tool call kill the command (and its children).
+        pid_file = f"/tmp/agent-exec-{uuid.uuid4().hex}.pid"
+        finished = threading.Event()
+        scope = current_cancel_scope.get()
+        if scope is not None:
+            scope.on_cancel(lambda: finished.is_set() or kill_exec_in_background(container, pid_file))
+        try:
+            exit_code, output = container.exec_run(
+                cmd=["sh", "-c", EXEC_WRAPPER.format(pid_file=pid_file), command]
+            )
+        finally:
+            finished.set()
         
         # Decode the output from bytes to a string.
         result = output.decode('utf-8').strip()
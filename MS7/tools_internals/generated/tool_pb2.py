@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import struct_pb2 as google_dot_protobuf_dot_struct__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ntool.proto\x12\x04tool\x1a\x1cgoogle/protobuf/struct.proto\"9\n\x14ValidateToolsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08tool_ids\x18\x02 \x03(\t\"B\n\x15ValidateToolsResponse\x12\x12\n\nauthorized\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\">\n\x19GetToolDefinitionsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08tool_ids\x18\x02 \x03(\t\"J\n\x1aGetToolDefinitionsResponse\x12,\n\x0b\x64\x65\x66initions\x18\x01 \x03(\x0b\x32\x17.google.protobuf.Struct\"P\n\x08ToolCall\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12*\n\targuments\x18\x03 \x01(\x0b\x32\x17.google.protobuf.Struct\"A\n\x1b\x45xecuteMultipleToolsRequest\x12\"\n\ntool_calls\x18\x01 \x03(\x0b\x32\x0e.tool.ToolCall\"P\n\nToolResult\x12\x14\n\x0ctool_call_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06status\x18\x03 \x01(\t\x12\x0e\n\x06output\x18\x04 \x01(\t\"A\n\x1c\x45xecuteMultipleToolsResponse\x12!\n\x07results\x18\x01 \x03(\x0b\x32\x10.tool.ToolResult2\x8f\x02\n\x0bToolService\x12H\n\rValidateTools\x12\x1a.tool.ValidateToolsRequest\x1a\x1b.tool.ValidateToolsResponse\x12W\n\x12GetToolDefinitions\x12\x1f.tool.GetToolDefinitionsRequest\x1a .tool.GetToolDefinitionsResponse\x12]\n\x14\x45xecuteMultipleTools\x12!.tool.ExecuteMultipleToolsRequest\x1a\".tool.ExecuteMultipleToolsResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ntool.proto\x12\x04tool\x1a\x1cgoogle/protobuf/struct.proto\"9\n\x14ValidateToolsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08tool_ids\x18\x02 \x03(\t\"B\n\x15ValidateToolsResponse\x12\x12\n\nauthorized\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\">\n\x19GetToolDefinitionsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08tool_ids\x18\x02 \x03(\t\"J\n\x1aGetToolDefinitionsResponse\x12,\n\x0b\x64\x65\x66initions\x18\x01 \x03(\x0b\x32\x17.google.protobuf.Struct\"P\n\x08ToolCall\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12*\n\targuments\x18\x03 \x01(\x0b\x32\x17.google.protobuf.Struct\"Q\n\x1b\x45xecuteMultipleToolsRequest\x12\"\n\ntool_calls\x18\x01 \x03(\x0b\x32\x0e.tool.ToolCall\x12\x0e\n\x06job_id\x18\x02 \x01(\t\"P\n\nToolResult\x12\x14\n\x0ctool_call_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06status\x18\x03 \x01(\t\x12\x0e\n\x06output\x18\x04 \x01(\t\"A\n\x1c\x45xecuteMultipleToolsResponse\x12!\n\x07results\x18\x01 \x03(\x0b\x32\x10.tool.ToolResult\"?\n\x16\x43\x61ncelToolCallsRequest\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x15\n\rtool_call_ids\x18\x02 \x03(\t\">\n\x17\x43\x61ncelToolCallsResponse\x12\x11\n\tcancelled\x18\x01 \x01(\x05\x12\x10\n\x08released\x18\x02 \x01(\x05\x32\xdf\x02\n\x0bToolService\x12H\n\rValidateTools\x12\x1a.tool.ValidateToolsRequest\x1a\x1b.tool.ValidateToolsResponse\x12W\n\x12GetToolDefinitions\x12\x1f.tool.GetToolDefinitionsRequest\x1a .tool.GetToolDefinitionsResponse\x12]\n\x14\x45xecuteMultipleTools\x12!.tool.ExecuteMultipleToolsRequest\x1a\".tool.ExecuteMultipleToolsResponse\x12N\n\x0f\x43\x61ncelToolCalls\x12\x1c.tool.CancelToolCallsRequest\x1a\x1d.tool.CancelToolCallsResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -43,11 +43,15 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_TOOLCALL']._serialized_start=317
   _globals['_TOOLCALL']._serialized_end=397
   _globals['_EXECUTEMULTIPLETOOLSREQUEST']._serialized_start=399
-  _globals['_EXECUTEMULTIPLETOOLSREQUEST']._serialized_end=464
-  _globals['_TOOLRESULT']._serialized_start=466
-  _globals['_TOOLRESULT']._serialized_end=546
-  _globals['_EXECUTEMULTIPLETOOLSRESPONSE']._serialized_start=548
-  _globals['_EXECUTEMULTIPLETOOLSRESPONSE']._serialized_end=613
-  _globals['_TOOLSERVICE']._serialized_start=616
-  _globals['_TOOLSERVICE']._serialized_end=887
+  _globals['_EXECUTEMULTIPLETOOLSREQUEST']._serialized_end=480
+  _globals['_TOOLRESULT']._serialized_start=482
+  _globals['_TOOLRESULT']._serialized_end=562
+  _globals['_EXECUTEMULTIPLETOOLSRESPONSE']._serialized_start=564
+  _globals['_EXECUTEMULTIPLETOOLSRESPONSE']._serialized_end=629
+  _globals['_CANCELTOOLCALLSREQUEST']._serialized_start=631
+  _globals['_CANCELTOOLCALLSREQUEST']._serialized_end=694
+  _globals['_CANCELTOOLCALLSRESPONSE']._serialized_start=696
+  _globals['_CANCELTOOLCALLSRESPONSE']._serialized_end=758
+  _globals['_TOOLSERVICE']._serialized_start=761
+  _globals['_TOOLSERVICE']._serialized_end=1112
 # @@protoc_insertion_point(module_scope)
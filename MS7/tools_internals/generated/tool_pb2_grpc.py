@@ -49,6 +49,11 @@ class ToolServiceStub(object):
                 request_serializer=tool__pb2.ExecuteMultipleToolsRequest.SerializeToString,
                 response_deserializer=tool__pb2.ExecuteMultipleToolsResponse.FromString,
                 _registered_method=True)
+        self.CancelToolCalls = channel.unary_unary(
+                '/tool.ToolService/CancelToolCalls',
+                request_serializer=tool__pb2.CancelToolCallsRequest.SerializeToString,
+                response_deserializer=tool__pb2.CancelToolCallsResponse.FromString,
+                _registered_method=True)
 
 
 class ToolServiceServicer(object):
@@ -76,6 +81,13 @@ class ToolServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def CancelToolCalls(self, request, context):
+        """For Inference P2: Aborts running tool calls (kills the exec, aborts the webhook request) of a cancelled job.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ToolServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -94,6 +106,11 @@ def add_ToolServiceServicer_to_server(servicer, server):
                     request_deserializer=tool__pb2.ExecuteMultipleToolsRequest.FromString,
                     response_serializer=tool__pb2.ExecuteMultipleToolsResponse.SerializeToString,
             ),
+            'CancelToolCalls': grpc.unary_unary_rpc_method_handler(
+                    servicer.CancelToolCalls,
+                    request_deserializer=tool__pb2.CancelToolCallsRequest.FromString,
+                    response_serializer=tool__pb2.CancelToolCallsResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'tool.ToolService', rpc_method_handlers)
@@ -185,3 +202,30 @@ class ToolService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def CancelToolCalls(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/tool.ToolService/CancelToolCalls',
+            tool__pb2.CancelToolCallsRequest.SerializeToString,
+            tool__pb2.CancelToolCallsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
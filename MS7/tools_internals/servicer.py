@@ -7,6 +7,7 @@ import logging
 from .generated import tool_pb2, tool_pb2_grpc
 from tools.models import Tool
 from tools.executor import tool_executor
+from tools.cancellation import tool_cancellations
 
 # Configure a logger for this servicer
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - MS7-gRPC - %(levelname)s - %(message)s')
@@ -94,8 +95,13 @@ class ToolServicer(tool_pb2_grpc.ToolServiceServicer):
                     'arguments': arguments
                 })
             
+            # If MS6 abandons the RPC (its job was cancelled), stop the calls instead of
+            # finishing work nobody will read. Once the RPC completed normally this is a no-op.
+            call_ids = [call['id'] for call in tool_calls_list]
+            context.add_callback(lambda: tool_cancellations.cancel(request.job_id, call_ids))
+
             # Delegate to the robust, parallel executor
-            results = tool_executor.execute_parallel_tools(tool_calls_list)
+            results = tool_executor.execute_parallel_tools(tool_calls_list, job_id=request.job_id)
             
             proto_results = [tool_pb2.ToolResult(**res) for res in results]
             logger.info(f"Successfully executed {len(proto_results)} tool(s).")
@@ -104,4 +110,20 @@ class ToolServicer(tool_pb2_grpc.ToolServiceServicer):
             logger.error(f"INTERNAL ERROR during ExecuteMultipleTools: {e}", exc_info=True)
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details('An internal error occurred in the Tool Service executor.')
-            return tool_pb2.ExecuteMultipleToolsResponse()
\ No newline at end of file
+            return tool_pb2.ExecuteMultipleToolsResponse()
+
+    def CancelToolCalls(self, request, context):
+        tool_call_ids = list(request.tool_call_ids)
+        logger.info(f"Received CancelToolCalls request for job '{request.job_id}' ({len(tool_call_ids) or 'all'} call(s)).")
+        if not request.job_id and not tool_call_ids:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Either job_id or tool_call_ids is required.")
+            return tool_pb2.CancelToolCallsResponse()
+
+        cancelled = tool_cancellations.cancel(request.job_id, tool_call_ids)
+        # Answer once the resources are actually released (or the wait times out), so the
+        # caller can tell how long the cancellation really took.
+        released = tool_cancellations.wait_released(cancelled)
+        if released < len(cancelled):
+            logger.warning(f"{len(cancelled) - released} cancelled tool call(s) of job '{request.job_id}' are still running.")
+        return tool_pb2.CancelToolCallsResponse(cancelled=len(cancelled), released=released)
@@ -0,0 +1,77 @@
+# MS8/app/messaging/codec.py
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib encoder.
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional: 'msgpack' is unavailable without it.
+    msgpack = None
+
+# Message codecs are selected by the publisher (MESSAGE_CODEC) and announced in the
+# AMQP content_type, so consumers can decode either format during a rollout:
+# - "json":    stdlib json, content_type application/json (the historical format)
+# - "orjson":  the same JSON on the wire, encoded/decoded much faster
+# - "msgpack": binary MessagePack, content_type application/msgpack
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+MSGPACK_CONTENT_TYPES = (CONTENT_TYPE_MSGPACK, "application/x-msgpack")
+
+
+class MessageDecodeError(ValueError):
+    """Raised when a message body can't be decoded with the codec its content_type names."""
+
+
+def _json_encode(body: Any) -> bytes:
+    return json.dumps(body, default=str).encode("utf-8")
+
+
+def _orjson_encode(body: Any) -> bytes:
+    # Passing datetimes through `default=str` keeps the output identical to stdlib json.
+    return orjson.dumps(body, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def _msgpack_encode(body: Any) -> bytes:
+    return msgpack.packb(body, default=str, use_bin_type=True)
+
+
+# Structure: { codec_name: (content_type, encode_function) }
+CODECS = {"json": (CONTENT_TYPE_JSON, _json_encode)}
+if orjson is not None:
+    CODECS["orjson"] = (CONTENT_TYPE_JSON, _orjson_encode)
+if msgpack is not None:
+    CODECS["msgpack"] = (CONTENT_TYPE_MSGPACK, _msgpack_encode)
+
+
+def resolve_codec(name: str | None) -> str:
+    """Returns `name` if that codec is installed, otherwise "json"."""
+    name = (name or "json").lower()
+    return name if name in CODECS else "json"
+
+
+def encode(body: Any, codec: str = None) -> tuple[bytes, str]:
+    """Serializes `body` with `codec`. Returns (bytes, content_type) for the AMQP message."""
+    content_type, encode_function = CODECS[resolve_codec(codec)]
+    return encode_function(body), content_type
+
+
+def decode(body: bytes, content_type: str = None) -> Any:
+    """Deserializes a message body according to its content_type (JSON when absent)."""
+    try:
+        if content_type in MSGPACK_CONTENT_TYPES:
+            if msgpack is None:
+                raise MessageDecodeError("Received a msgpack message but msgpack is not installed.")
+            return msgpack.unpackb(body, raw=False)
+        if orjson is not None:
+            return orjson.loads(body)
+        return json.loads(body)
+    except MessageDecodeError:
+        raise
+    except (ValueError, TypeError) as e:
+        # json/orjson decode errors, UnicodeDecodeError and msgpack's unpack errors are all ValueErrors.
+        raise MessageDecodeError(f"Could not decode {content_type or CONTENT_TYPE_JSON} message: {e}") from e
@@ -4,6 +4,7 @@ import aio_pika
 from app import config
 from app.logging_config import logger
 from app.server.connection_manager import manager
+from app.messaging import codec
 
 class RabbitMQConsumer:
     """
@@ -39,8 +40,13 @@ class RabbitMQConsumer:
         """Callback for processing a message from the results queue."""
         async with message.process():
             try:
-                message_body_bytes = message.body
-                body = json.loads(message.body.decode())
+                body = codec.decode(message.body, message.content_type)
+                # The replay cache is read back as JSON (see routes.replay_cached_results),
+                # so only non-JSON (msgpack) messages need re-encoding.
+                if message.content_type in codec.MSGPACK_CONTENT_TYPES:
+                    message_body_bytes = json.dumps(body).encode()
+                else:
+                    message_body_bytes = message.body
                 job_id = body.get("job_id")
                 
                 if not job_id:
@@ -64,7 +70,7 @@ class RabbitMQConsumer:
                 if body.get("status") in ["success", "error"]:
                     await manager.close_connection(job_id)
 
-            except json.JSONDecodeError:
-                logger.error(f"Could not decode result message body: {message.body.decode()[:200]}")
+            except codec.MessageDecodeError as e:
+                logger.error(f"Could not decode result message body: {e}. Body: {message.body[:200]!r}")
             except Exception as e:
                 logger.error("Error processing result message", exc_info=True)
\ No newline at end of file
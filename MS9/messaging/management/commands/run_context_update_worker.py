@@ -1,13 +1,13 @@
 # MS9/messaging/management/commands/run_context_update_worker.py
 
 import pika
-import json
 import time
 import logging
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.db import transaction, IntegrityError
 from memory.models import Message, MemoryBucket
+from messaging import codec
 
 # Configure logging for this worker
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - MS9-UpdateWorker - %(levelname)s - %(message)s')
@@ -52,7 +52,8 @@ class Command(BaseCommand):
     def callback(self, ch, method, properties, body):
         logger.info(f"\n--- Context Update Event Received ---")
         try:
-            payload = json.loads(body)
+            # MS6 may publish JSON or msgpack; the content_type says which.
+            payload = codec.decode(body, properties.content_type)
             idempotency_key = payload.get("idempotency_key")
             bucket_id = payload.get("memory_bucket_id")
             